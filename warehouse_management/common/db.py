@@ -0,0 +1,53 @@
+import functools
+import random
+import time
+
+from django.db import OperationalError, connection
+
+LOCK_ERROR_CODES = {
+    "40001",  # serialization_failure
+    "40P01",  # deadlock_detected
+    "55P03",  # lock_not_available
+}
+LOCK_ERROR_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "lock wait timeout",
+    "deadlock",
+)
+
+
+def is_lock_error(ex: Exception) -> bool:
+    code = getattr(ex.__cause__, "pgcode", None) or getattr(
+        ex.__cause__, "sqlstate", None
+    )
+    if code in LOCK_ERROR_CODES:
+        return True
+    message = str(ex).lower()
+    return any(text in message for text in LOCK_ERROR_MESSAGES)
+
+
+def retry_on_lock(func=None, *, attempts: int = 3, delay: float = 0.05):
+    """
+    Re-runs a transactional function when the database gives up waiting for a
+    lock. Retrying only happens at the outermost transaction; inside an outer
+    atomic block the error is raised to the caller that owns the transaction.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, attempts=attempts, delay=delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as ex:
+                if (
+                    attempt == attempts - 1
+                    or connection.in_atomic_block
+                    or not is_lock_error(ex)
+                ):
+                    raise
+                time.sleep(delay * 2**attempt * (1 + random.random()))
+
+    return wrapper
@@ -0,0 +1,204 @@
+"""
+Per-view request metrics in the Prometheus text format.
+
+MetricsMiddleware records the latency, the number of SQL queries and the
+time spent in SQL of every request under the URL name of its view. The
+counters live in the memory of the process, so every worker of a
+multi-process server exposes its own series and Prometheus sums them.
+
+Queries are timed by a wrapper on every database connection, which finds
+the timer of the request through a context variable. Under ASGI the sync
+views run in other threads than the middleware, with their own
+connections, and the context follows them there.
+"""
+
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_requests = defaultdict(int)
+_latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+_latency_sum = defaultdict(float)
+_queries = defaultdict(int)
+_query_seconds = defaultdict(float)
+_collectors = {}
+_timer = contextvars.ContextVar("query_timer", default=None)
+
+
+def register_collector(prefix: str, collect):
+    """
+    Exposes the counters returned by `collect()` as `<prefix>_<name>_total`,
+    e.g. the hit and miss counts of a cache.
+    """
+    _collectors[prefix] = collect
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _watch(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_watch)
+
+
+def record(*, view: str, method: str, status: int, seconds: float, queries: QueryTimer):
+    bucket = next(
+        (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+        len(LATENCY_BUCKETS),
+    )
+    with _lock:
+        _requests[view, method, status] += 1
+        _latency[view][bucket] += 1
+        _latency_sum[view] += seconds
+        _queries[view] += queries.count
+        _query_seconds[view] += queries.seconds
+
+
+def reset():
+    with _lock:
+        for series in (_requests, _latency, _latency_sum, _queries, _query_seconds):
+            series.clear()
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    with _lock:
+        requests = dict(_requests)
+        latency = {view: list(counts) for view, counts in _latency.items()}
+        latency_sum = dict(_latency_sum)
+        queries = dict(_queries)
+        query_seconds = dict(_query_seconds)
+
+    lines = [
+        "# HELP http_requests_total Requests handled, by view, method and status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(
+            f'http_requests_total{{view="{_label(view)}",method="{method}",'
+            f'status="{status}"}} {count}'
+        )
+
+    lines += [
+        "# HELP http_request_duration_seconds Request latency, by view.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for view, counts in sorted(latency.items()):
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), counts):
+            cumulative += count
+            lines.append(
+                f'http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f'http_request_duration_seconds_sum{{view="{label}"}} {latency_sum[view]}'
+        )
+        lines.append(
+            f'http_request_duration_seconds_count{{view="{label}"}} {cumulative}'
+        )
+
+    lines += [
+        "# HELP db_queries_total SQL queries executed while handling requests, by view.",
+        "# TYPE db_queries_total counter",
+    ]
+    for view, count in sorted(queries.items()):
+        lines.append(f'db_queries_total{{view="{_label(view)}"}} {count}')
+
+    lines += [
+        "# HELP db_query_duration_seconds_total Time spent in SQL queries, by view.",
+        "# TYPE db_query_duration_seconds_total counter",
+    ]
+    for view, seconds in sorted(query_seconds.items()):
+        lines.append(
+            f'db_query_duration_seconds_total{{view="{_label(view)}"}} {seconds}'
+        )
+
+    for prefix, collect in sorted(_collectors.items()):
+        for name, value in sorted(collect().items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryTimer()
+        started = time.perf_counter()
+        token = _timer.set(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timer.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryTimer()
+        started = time.perf_counter()
+        token = _timer.set(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timer.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, seconds: float, queries: QueryTimer):
+        # Streaming responses are timed until the view returns, not until
+        # their body has been sent.
+        match = getattr(request, "resolver_match", None)
+        record(
+            view=match.url_name if match and match.url_name else "unmatched",
+            method=request.method,
+            status=response.status_code,
+            seconds=seconds,
+            queries=queries,
+        )
@@ -0,0 +1,126 @@
+from django.db.models import QuerySet
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Fields whose representation of a database value is the value itself.
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _decimal_format(field: serializers.DecimalField):
+    """
+    DecimalField.to_representation for values the database already returns
+    with the field's decimal places, which skips the quantize.
+    """
+    places = field.decimal_places
+    if (
+        not getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+        or field.localize
+        or field.normalize_output
+        or not places
+    ):
+        return field.to_representation
+
+    def format(value):
+        text = f"{value:f}"
+        if len(text) > places and text[-places - 1] == ".":
+            return text
+        return field.to_representation(value)
+
+    return format
+
+
+def _datetime_format(field: serializers.DateTimeField):
+    """
+    DateTimeField.to_representation for aware values and ISO 8601 output,
+    resolving the field's time zone once instead of per value.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return field.to_representation
+
+    def format(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(zone).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return format
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer made of plain model fields.
+
+    The rows are fetched with values() for exactly the serializer's fields,
+    and only the fields that format their value (decimals, dates) run any
+    code per value. The result equals the serializer's .data for the same
+    rows, without building a model instance and walking every field per row.
+    """
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer]):
+        self.serializer_class = serializer_class
+        self._fields = None
+
+    @property
+    def fields(self) -> list[tuple[str, str, serializers.Field]]:
+        """
+        (name, values() lookup, field) per readable serializer field.
+        """
+        if self._fields is None:
+            fields = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if "." in field.source or field.source == "*":
+                    raise ValueError(f"Field {name!r} is not a plain model field.")
+                fields.append((name, field.source, field))
+            self._fields = fields
+        return self._fields
+
+    @property
+    def lookups(self) -> list[str]:
+        return [lookup for _, lookup, _ in self.fields]
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        return queryset.values(*self.lookups)
+
+    def formats(self) -> list[tuple[str, str, object]]:
+        formats = []
+        for name, lookup, field in self.fields:
+            if isinstance(field, PLAIN_FIELDS):
+                format = None
+            elif isinstance(field, serializers.DecimalField):
+                format = _decimal_format(field)
+            elif isinstance(field, serializers.DateTimeField):
+                format = _datetime_format(field)
+            else:
+                format = field.to_representation
+            formats.append((name, lookup, format))
+        return formats
+
+    def to_representation(self, rows) -> list[dict]:
+        formats = self.formats()
+        return [
+            {
+                name: (
+                    row[lookup]
+                    if format is None or row[lookup] is None
+                    else format(row[lookup])
+                )
+                for name, lookup, format in formats
+            }
+            for row in rows
+        ]
+
+    def get(self, queryset: QuerySet, **lookup) -> dict:
+        return self.to_representation([self.values(queryset).get(**lookup)])[0]
+
+    async def aget(self, queryset: QuerySet, **lookup) -> dict:
+        return self.to_representation([await self.values(queryset).aget(**lookup)])[0]
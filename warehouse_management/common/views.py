@@ -0,0 +1,92 @@
+from abc import ABC, abstractmethod
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import serializers, status
+from rest_framework.request import Request
+
+from common.renderers import FastJSONRenderer
+
+
+class AsyncReadView(ABC, View):
+    """
+    Serves GET with a coroutine, so a request waiting on the database or on
+    a slow client does not hold a worker thread under ASGI. Every other
+    method is handed to `sync_view`, the regular APIView of the same URL,
+    whose authentication, permission and throttle checks also guard GET.
+
+    Responses are rendered with FastJSONRenderer, the renderer of the sync
+    views, so both views return the same bytes for the same data.
+    """
+
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        request, response = await sync_to_async(self.initial)(request, *args, **kwargs)
+        if response is not None:
+            return response
+        # Mirrors django.views.decorators.http.condition, whose validator
+        # functions can not use the async ORM.
+        etag, last_modified = await self.conditions(request, *args, **kwargs)
+        etag = quote_etag(etag) if etag else None
+        last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            try:
+                response = await self.get(request, *args, **kwargs)
+            except serializers.ValidationError as ex:
+                response = self.render(ex.detail, status=status.HTTP_400_BAD_REQUEST)
+        if last_modified and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault("ETag", etag)
+        return response
+
+    async def conditions(self, request, *args, **kwargs) -> tuple:
+        """
+        The ETag and Last-Modified of the resource, or None for either.
+        """
+        return None, None
+
+    def initial(self, request, *args, **kwargs) -> tuple[Request, HttpResponse | None]:
+        """
+        Runs APIView.initial of the sync view, which authenticates the
+        request and checks its permissions and throttles. Returns the DRF
+        request, and the rendered error response when a check failed.
+        """
+        view = self.sync_view.view_class(**self.sync_view.view_initkwargs)
+        view.args, view.kwargs = args, kwargs
+        request = view.initialize_request(request, *args, **kwargs)
+        view.request = request
+        view.headers = view.default_response_headers
+        try:
+            view.initial(request, *args, **kwargs)
+        except Exception as ex:
+            response = view.handle_exception(ex)
+            response = view.finalize_response(request, response, *args, **kwargs)
+            return request, response.render()
+        return request, None
+
+    @abstractmethod
+    async def get(self, request, *args, **kwargs):
+        pass
+
+    def render(self, data, status: int = status.HTTP_200_OK) -> HttpResponse:
+        return HttpResponse(
+            FastJSONRenderer().render(data),
+            status=status,
+            content_type="application/json",
+        )
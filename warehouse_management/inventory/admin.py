@@ -1,5 +1,138 @@
 from django.contrib import admin
-from inventory.models import Ware, Factor
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
 
-admin.site.register(Ware)
-admin.site.register(Factor)
+from common.pagination import EstimatedCountPaginator
+from inventory.models import DailyMovement, Factor, Ware
+from inventory.services.factor import create_factor, delete_factor, update_factor
+from inventory.services.ware import create_ware, delete_ware, update_ware
+
+
+class RollupDatesQuerySet(QuerySet):
+    """
+    Factor queryset whose datetimes() for the date hierarchy is answered
+    from the daily movement rollups, instead of a DISTINCT over every
+    factor in the listed range. The range itself comes from MIN/MAX of
+    created_at, which the database reads off the index. Rollups do not
+    know about types, searches or wares, so a filtered list takes the
+    DISTINCT.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):
+        if (
+            field_name != "created_at"
+            or kind not in ("year", "month", "day")
+            or self.query.has_filters()
+        ):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        bounds = self.aggregate(first=Min("created_at"), last=Max("created_at"))
+        if bounds["first"] is None:
+            return []
+        return (
+            DailyMovement.objects.filter(
+                day__gte=timezone.localdate(bounds["first"]),
+                day__lte=timezone.localdate(bounds["last"]),
+            )
+            .exclude(qty_in=0, qty_out=0, value_in=0, cogs=0)
+            .dates("day", kind, order)
+        )
+
+
+@admin.register(Ware)
+class WareAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "cost_method")
+    list_filter = ("cost_method",)
+    search_fields = ("name",)
+    ordering = ("id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Wares are written through the services, which keep their balance,
+    # cost layers and change feed in step.
+    def save_model(self, request, obj, form, change):
+        if change:
+            update_ware(obj.id, name=obj.name, cost_method=obj.cost_method)
+        else:
+            obj.pk = create_ware(name=obj.name, cost_method=obj.cost_method).pk
+
+    def delete_model(self, request, obj):
+        delete_ware(obj.id)
+
+    def delete_queryset(self, request, queryset):
+        for ware in queryset:
+            delete_ware(ware.id)
+
+
+@admin.register(Factor)
+class FactorAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "ware",
+        "type",
+        "quantity",
+        "purchase_price",
+        "total_cost",
+        "created_at",
+    )
+    list_select_related = ("ware",)
+    list_filter = ("type", "created_at")
+    date_hierarchy = "created_at"
+    autocomplete_fields = ("ware",)
+    # Served by factor_created_idx and factor_type_created_idx.
+    ordering = ("-created_at", "-id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Factors are written through the services like wares; a plain model
+    # save would leave balances, cost layers, rollups and the change feed
+    # behind. The services refuse to touch opening balances, and re-cost
+    # outputs from the ledger.
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and (
+            obj is None or obj.type != "opening"
+        )
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and (
+            obj is None or obj.type != "opening"
+        )
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None and obj.type == "output":
+            return ("total_cost",)
+        return ()
+
+    def formfield_for_choice_field(self, db_field, request, **kwargs):
+        if db_field.name == "type":
+            kwargs["choices"] = [
+                (type, label) for type, label in db_field.choices if type != "opening"
+            ]
+        return super().formfield_for_choice_field(db_field, request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            fields = {name: getattr(obj, name) for name in form.changed_data}
+            if "ware" in fields:
+                fields["ware_id"] = fields.pop("ware").id
+            update_factor(obj.id, **fields)
+        else:
+            obj.pk = create_factor(
+                ware_id=obj.ware_id,
+                quantity=obj.quantity,
+                purchase_price=obj.purchase_price,
+                type=obj.type,
+                total_cost=obj.total_cost,
+            ).pk
+
+    def delete_model(self, request, obj):
+        delete_factor(obj.id)
+
+    def delete_queryset(self, request, queryset):
+        for factor in queryset:
+            delete_factor(factor.id)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return RollupDatesQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset.db
+        )
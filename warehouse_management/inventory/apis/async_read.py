@@ -0,0 +1,165 @@
+"""
+Async variants of the read endpoints, used in place of the sync views when
+INVENTORY_ASYNC_READS is set. They validate and serialize with the sync
+views' serializers, so both modes answer with the same JSON.
+"""
+
+from rest_framework import serializers, status
+
+from common.views import AsyncReadView
+from inventory import cache
+from inventory.apis.conditional import version_etag, version_last_modified
+from inventory.apis.factor import (
+    FactorApi,
+    FactorDetailApi,
+    ValuationApi,
+    ValuationListApi,
+)
+from inventory.apis.ware import WareApi, WareDetailApi
+from inventory.selectors.factor import (
+    avaluation_as_of,
+    avaluation_list,
+    avaluation_stock,
+    factor_list,
+    factor_version,
+)
+from inventory.selectors.ware import ware_list, ware_valuation_list, ware_version
+
+
+class VersionedMixin:
+    """
+    Conditional GET of apis.conditional.versioned for the async views.
+    """
+
+    get_version = None
+    version_key = None
+
+    async def conditions(self, request, id, **kwargs):
+        version = await cache.aget_or_compute(
+            self.version_key(id), lambda: self.get_version(id).afirst()
+        )
+        return version_etag(version), version_last_modified(version)
+
+
+class AsyncWareApi(AsyncReadView):
+    async def get(self, request):
+        filters = WareApi.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            query, next_cursor = await WareApi.pagination.apaginate(
+                WareApi.fast.values(ware_list(**filters.validated_data)), request
+            )
+        except serializers.ValidationError:
+            raise
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render(
+            {
+                "next": next_cursor,
+                "results": WareApi.fast.to_representation(query),
+            }
+        )
+
+
+class AsyncWareDetailApi(VersionedMixin, AsyncReadView):
+    get_version = staticmethod(ware_version)
+    version_key = staticmethod(cache.ware_version_key)
+
+    async def get(self, request, id):
+        try:
+            data = await cache.aget_or_compute(
+                cache.ware_key(id), lambda: WareDetailApi.fast.aget(ware_list(), id=id)
+            )
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render(data)
+
+
+class AsyncFactorApi(AsyncReadView):
+    async def get(self, request):
+        filters = FactorApi.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            query, next_cursor = await FactorApi.pagination.apaginate(
+                FactorApi.fast.values(factor_list(**filters.validated_data)),
+                request,
+            )
+        except serializers.ValidationError:
+            raise
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render(
+            {
+                "next": next_cursor,
+                "results": FactorApi.fast.to_representation(query),
+            }
+        )
+
+
+class AsyncFactorDetailApi(VersionedMixin, AsyncReadView):
+    get_version = staticmethod(factor_version)
+    version_key = staticmethod(cache.factor_version_key)
+
+    async def get(self, request, id):
+        try:
+            data = await cache.aget_or_compute(
+                cache.factor_key(id),
+                lambda: FactorDetailApi.fast.aget(factor_list(), id=id),
+            )
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render(data)
+
+
+class AsyncValuationApi(VersionedMixin, AsyncReadView):
+    get_version = staticmethod(ware_version)
+    version_key = staticmethod(cache.ware_version_key)
+
+    async def get(self, request, id: int):
+        filters = ValuationApi.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            if "as_of" in filters.validated_data:
+                query = await avaluation_as_of(id, filters.validated_data["as_of"])
+            else:
+                query = await cache.aget_or_compute(
+                    cache.valuation_key(id), lambda: avaluation_stock(id)
+                )
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render(query)
+
+
+class AsyncValuationListApi(AsyncReadView):
+    async def get(self, request):
+        filters = ValuationListApi.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            wares, next_cursor = await ValuationListApi.pagination.apaginate(
+                ware_valuation_list(ware_ids=filters.validated_data.get("ware_id")),
+                request,
+            )
+            query = await avaluation_list(wares)
+        except serializers.ValidationError:
+            raise
+        except Exception as ex:
+            return self.render(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.render({"next": next_cursor, "results": query})
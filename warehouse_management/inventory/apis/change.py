@@ -0,0 +1,61 @@
+from rest_framework import status, views
+from rest_framework.response import Response
+from inventory.models import Change
+
+from rest_framework import serializers
+from drf_spectacular.utils import extend_schema
+
+from common.serialization import ValuesSerializer
+
+from inventory.selectors.change import change_list
+
+
+class ChangeApi(views.APIView):
+    """
+    The change feed. Consumers keep the `next` of every page, which is set
+    even when the page is empty, and pass it back as `since` to receive only
+    the changes written after it.
+
+    The feed lags CHANGE_FEED_LAG behind the writers, so nothing is
+    committed behind a cursor after a page handed it out.
+    """
+
+    class FilterSerializer(serializers.Serializer):
+        since = serializers.IntegerField(required=False, min_value=0, default=0)
+        limit = serializers.IntegerField(
+            required=False, min_value=1, max_value=1000, default=100
+        )
+
+    class OutputSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Change
+            fields = ["id", "ware_id", "factor_id", "action", "created_at"]
+
+    class PageSerializer(serializers.Serializer):
+        next = serializers.IntegerField()
+        has_more = serializers.BooleanField()
+        results = serializers.ListField()
+
+    fast = ValuesSerializer(OutputSerializer)
+
+    @extend_schema(parameters=[FilterSerializer], responses=PageSerializer)
+    def get(self, request):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        since = filters.validated_data["since"]
+        limit = filters.validated_data["limit"]
+        try:
+            rows = list(self.fast.values(change_list(since=since))[: limit + 1])
+        except Exception as ex:
+            return Response(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows, has_more = rows[:limit], len(rows) > limit
+        return Response(
+            {
+                "next": rows[-1]["id"] if rows else since,
+                "has_more": has_more,
+                "results": self.fast.to_representation(rows),
+            }
+        )
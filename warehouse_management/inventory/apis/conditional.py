@@ -0,0 +1,45 @@
+"""
+Conditional GET for the resources of a ware. Their ETag and Last-Modified
+come from the version of the ware's stock balance, which every write to
+the ware or its ledger bumps, so a matching If-None-Match is answered with
+304 before the view computes or serializes anything.
+"""
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from inventory import cache
+
+
+def version_etag(version: dict | None) -> str | None:
+    if version is None:
+        return None
+    return f"{version['ware_id']}-{version['version']}"
+
+
+def version_last_modified(version: dict | None):
+    return version["changed_at"] if version else None
+
+
+def versioned(get_version, cache_key):
+    """
+    condition() for an APIView method taking `id`, where `get_version(id)`
+    is a values() query like ware_version. The row is read once per request,
+    through the inventory cache under `cache_key(id)`.
+    """
+
+    def version(request, id):
+        if not hasattr(request, "inventory_version"):
+            request.inventory_version = cache.get_or_compute(
+                cache_key(id), lambda: get_version(id).first()
+            )
+        return request.inventory_version
+
+    return method_decorator(
+        condition(
+            etag_func=lambda request, id: version_etag(version(request, id)),
+            last_modified_func=lambda request, id: version_last_modified(
+                version(request, id)
+            ),
+        )
+    )
@@ -1,20 +1,46 @@
+import csv
+import json
+
 from rest_framework import status, views
 from rest_framework.response import Response
 from inventory.models import Factor
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Sum
+from django.http import StreamingHttpResponse
 
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema
 
+from common.pagination import KeysetPagination
+from common.serialization import ValuesSerializer
+from inventory import cache, coalesce
+from inventory.apis.conditional import versioned
+
 from inventory.services.factor import (
-    create_input,
-    create_output,
+    OUTPUT_COST_ERROR,
+    create_inputs,
+    create_outputs,
     create_factor,
     update_factor,
     delete_factor,
 )
 
-from inventory.selectors.factor import factor_list, factor_detail, valuation_stock
+from inventory.selectors.factor import (
+    EXPORT_FIELDS,
+    factor_export,
+    factor_list,
+    factor_version,
+    valuation_as_of,
+    valuation_list,
+    valuation_stock,
+)
+from inventory.selectors.ware import ware_valuation_list, ware_version
+
+# Opening balances are only written by compact_ledger.
+WRITABLE_TYPES = [
+    (type, label) for type, label in Factor.FACTOR_TYPE_CHOICES if type != "opening"
+]
 
 
 class InputApi(views.APIView):
@@ -43,7 +69,7 @@ class InputApi(views.APIView):
         serializer = self.InputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
-            query = create_input(
+            query = coalesce.create_input(
                 ware_id=serializer.validated_data.get("ware_id"),
                 quantity=serializer.validated_data.get("quantity"),
                 purchase_price=serializer.validated_data.get("purchase_price"),
@@ -59,6 +85,62 @@ class InputApi(views.APIView):
         )
 
 
+class BulkInputApi(views.APIView):
+    class InputSerializer(serializers.Serializer):
+        lines = serializers.ListField(
+            child=serializers.DictField(), min_length=1, max_length=1000
+        )
+
+    class LineSerializer(serializers.Serializer):
+        ware_id = serializers.IntegerField()
+        quantity = serializers.IntegerField(min_value=1)
+        purchase_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    class OutputSerializer(serializers.Serializer):
+        index = serializers.IntegerField()
+        factor = InputApi.OutputSerializer(required=False)
+        errors = serializers.DictField(required=False)
+
+    @extend_schema(
+        responses=OutputSerializer(many=True),
+        request=InputSerializer,
+    )
+    def post(self, request):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = {}
+        lines = {}
+        for index, line in enumerate(serializer.validated_data["lines"]):
+            line_serializer = self.LineSerializer(data=line)
+            if line_serializer.is_valid():
+                lines[index] = line_serializer.validated_data
+            else:
+                results[index] = {"index": index, "errors": line_serializer.errors}
+
+        try:
+            created = create_inputs(lines=list(lines.values()))
+        except Exception as ex:
+            return Response(
+                {"detail": "Database Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        for index, (factor, error) in zip(lines, created):
+            if factor is None:
+                results[index] = {"index": index, "errors": {"ware_id": [error]}}
+            else:
+                results[index] = {
+                    "index": index,
+                    "factor": InputApi.OutputSerializer(factor).data,
+                }
+
+        failed = any("errors" in result for result in results.values())
+        return Response(
+            [results[index] for index in sorted(results)],
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED,
+        )
+
+
 class OutputApi(views.APIView):
     class InputSerializer(serializers.Serializer):
         ware_id = serializers.IntegerField()
@@ -84,7 +166,7 @@ class OutputApi(views.APIView):
         serializer = self.InputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
-            query = create_output(
+            query = coalesce.create_output(
                 ware_id=serializer.validated_data.get("ware_id"),
                 quantity=serializer.validated_data.get("quantity"),
             )
@@ -99,12 +181,82 @@ class OutputApi(views.APIView):
         )
 
 
+class BulkOutputApi(views.APIView):
+    class InputSerializer(serializers.Serializer):
+        lines = serializers.ListField(
+            child=serializers.DictField(), min_length=1, max_length=1000
+        )
+        partial = serializers.BooleanField(default=False)
+
+    class LineSerializer(serializers.Serializer):
+        ware_id = serializers.IntegerField()
+        quantity = serializers.IntegerField(min_value=1)
+
+    class OutputSerializer(serializers.Serializer):
+        index = serializers.IntegerField()
+        factor = OutputApi.OutputSerializer(required=False)
+        errors = serializers.DictField(required=False)
+
+    @extend_schema(
+        responses=OutputSerializer(many=True),
+        request=InputSerializer,
+    )
+    def post(self, request):
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        partial = serializer.validated_data["partial"]
+
+        results = {}
+        lines = {}
+        for index, line in enumerate(serializer.validated_data["lines"]):
+            line_serializer = self.LineSerializer(data=line)
+            if line_serializer.is_valid():
+                lines[index] = line_serializer.validated_data
+            else:
+                results[index] = {"index": index, "errors": line_serializer.errors}
+
+        if results and not partial:
+            return Response(
+                [results[index] for index in sorted(results)],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            created = create_outputs(lines=list(lines.values()), partial=partial)
+        except Exception as ex:
+            return Response(
+                {"detail": "Database Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        for index, (factor, error) in zip(lines, created):
+            if error is not None:
+                results[index] = {"index": index, "errors": {"detail": [error]}}
+            elif factor is not None:
+                results[index] = {
+                    "index": index,
+                    "factor": OutputApi.OutputSerializer(factor).data,
+                }
+            else:
+                results[index] = {"index": index}
+
+        failed = any("errors" in result for result in results.values())
+        if failed and not partial:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(
+            [results[index] for index in sorted(results)], status=response_status
+        )
+
+
 class FactorApi(views.APIView):
     class InputSerializer(serializers.Serializer):
         ware_id = serializers.IntegerField()
         quantity = serializers.IntegerField()
         purchase_price = serializers.DecimalField(max_digits=10, decimal_places=2)
-        type = serializers.CharField(max_length=10)
+        type = serializers.ChoiceField(choices=WRITABLE_TYPES)
         total_cost = serializers.DecimalField(max_digits=10, decimal_places=2)
 
     class OutputSerializer(serializers.ModelSerializer):
@@ -112,6 +264,21 @@ class FactorApi(views.APIView):
             model = Factor
             fields = "__all__"
 
+    class FilterSerializer(serializers.Serializer):
+        ware_id = serializers.IntegerField(required=False)
+        type = serializers.ChoiceField(
+            choices=Factor.FACTOR_TYPE_CHOICES, required=False
+        )
+        created_after = serializers.DateTimeField(required=False)
+        created_before = serializers.DateTimeField(required=False)
+
+    class PageSerializer(serializers.Serializer):
+        next = serializers.CharField(allow_null=True)
+        results = serializers.ListField()
+
+    pagination = KeysetPagination(ordering=("created_at", "id"))
+    fast = ValuesSerializer(OutputSerializer)
+
     @extend_schema(
         responses=OutputSerializer,
         request=InputSerializer,
@@ -129,17 +296,119 @@ class FactorApi(views.APIView):
         return Response(status=status.HTTP_201_CREATED)
 
     @extend_schema(
-        responses=OutputSerializer,
+        parameters=[FilterSerializer, KeysetPagination.FilterSerializer],
+        responses=PageSerializer,
     )
     def get(self, request):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
         try:
-            query = factor_list()
+            query, next_cursor = self.pagination.paginate(
+                self.fast.values(factor_list(**filters.validated_data)), request
+            )
+        except serializers.ValidationError:
+            raise
         except Exception as ex:
             return Response(
                 {"detail": "Filter Error - " + str(ex)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        return Response(self.OutputSerializer(query, many=True).data)
+        return Response(
+            {"next": next_cursor, "results": self.fast.to_representation(query)}
+        )
+
+
+class FactorExportApi(views.APIView):
+    """
+    Streams the matching factors page by page. Under ASGI the body is an
+    async iterator that fetches every page through sync_to_async, since
+    Django reads a sync iterator into memory before serving it there.
+    """
+
+    class FilterSerializer(FactorApi.FilterSerializer):
+        export_format = serializers.ChoiceField(
+            choices=["ndjson", "csv"], default="ndjson"
+        )
+
+    class Echo:
+        def write(self, value):
+            return value
+
+    page_size = 2000
+    datetime_field = serializers.DateTimeField()
+    id_position = EXPORT_FIELDS.index("id")
+    created_at_position = EXPORT_FIELDS.index("created_at")
+
+    def position(self, page: list[tuple]) -> tuple:
+        return page[-1][self.created_at_position], page[-1][self.id_position]
+
+    def pages(self, filters):
+        page = factor_export(limit=self.page_size, **filters)
+        while page:
+            yield page
+            page = factor_export(
+                after=self.position(page), limit=self.page_size, **filters
+            )
+
+    async def apages(self, filters):
+        fetch = sync_to_async(factor_export)
+        page = await fetch(limit=self.page_size, **filters)
+        while page:
+            yield page
+            page = await fetch(
+                after=self.position(page), limit=self.page_size, **filters
+            )
+
+    def rows(self, page):
+        for row in page:
+            row = list(row)
+            row[self.created_at_position] = self.datetime_field.to_representation(
+                row[self.created_at_position]
+            )
+            yield row
+
+    def ndjson(self, page) -> str:
+        return "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + "\n"
+            for row in self.rows(page)
+        )
+
+    def csv(self, page) -> str:
+        writer = csv.writer(self.Echo())
+        return "".join(writer.writerow(row) for row in self.rows(page))
+
+    def content(self, filters, export_format):
+        if export_format == "csv":
+            yield csv.writer(self.Echo()).writerow(EXPORT_FIELDS)
+        for page in self.pages(filters):
+            yield getattr(self, export_format)(page)
+
+    async def acontent(self, filters, export_format):
+        if export_format == "csv":
+            yield csv.writer(self.Echo()).writerow(EXPORT_FIELDS)
+        async for page in self.apages(filters):
+            yield getattr(self, export_format)(page)
+
+    @extend_schema(parameters=[FilterSerializer])
+    def get(self, request):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        export_format = filters.validated_data.pop("export_format")
+
+        if isinstance(request._request, ASGIRequest):
+            content = self.acontent(filters.validated_data, export_format)
+        else:
+            content = self.content(filters.validated_data, export_format)
+        response = StreamingHttpResponse(
+            content,
+            content_type=(
+                "text/csv" if export_format == "csv" else "application/x-ndjson"
+            ),
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="factors.{export_format}"'
+        )
+        return response
 
 
 class FactorDetailApi(views.APIView):
@@ -149,28 +418,38 @@ class FactorDetailApi(views.APIView):
         purchase_price = serializers.DecimalField(
             max_digits=10, decimal_places=2, required=False
         )
-        type = serializers.CharField(max_length=10, required=False)
+        type = serializers.ChoiceField(choices=WRITABLE_TYPES, required=False)
         total_cost = serializers.DecimalField(
             max_digits=10, decimal_places=2, required=False
         )
 
+        def validate(self, data):
+            if data.get("type") == "output" and "total_cost" in data:
+                raise serializers.ValidationError({"total_cost": OUTPUT_COST_ERROR})
+            return data
+
     class OutputSerializer(serializers.ModelSerializer):
         class Meta:
             model = Factor
             fields = "__all__"
 
+    fast = ValuesSerializer(OutputSerializer)
+
     @extend_schema(
         responses=OutputSerializer,
     )
+    @versioned(factor_version, cache.factor_version_key)
     def get(self, request, id):
         try:
-            query = factor_detail(id)
+            data = cache.get_or_compute(
+                cache.factor_key(id), lambda: self.fast.get(factor_list(), id=id)
+            )
         except Exception as ex:
             return Response(
                 {"detail": "Filter Error - " + str(ex)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        return Response(self.OutputSerializer(query).data)
+        return Response(data)
 
     def delete(self, request, id):
         try:
@@ -209,15 +488,74 @@ class ValuationApi(views.APIView):
             max_digits=10, decimal_places=2, required=False
         )
 
+    class FilterSerializer(serializers.Serializer):
+        as_of = serializers.DateTimeField(required=False)
+
     @extend_schema(
+        parameters=[FilterSerializer],
         responses=OutputSerializer,
     )
+    @versioned(ware_version, cache.ware_version_key)
     def get(self, request, id: int):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
         try:
-            query = valuation_stock(id)
+            if "as_of" in filters.validated_data:
+                query = valuation_as_of(id, filters.validated_data["as_of"])
+            else:
+                query = cache.get_or_compute(
+                    cache.valuation_key(id), lambda: valuation_stock(id)
+                )
         except Exception as ex:
             return Response(
                 {"detail": "Filter Error - " + str(ex)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         return Response(query)
+
+
+class ValuationListApi(views.APIView):
+    class FilterSerializer(serializers.Serializer):
+        ware_id = serializers.ListField(
+            child=serializers.IntegerField(), required=False, max_length=1000
+        )
+
+    class PageSerializer(serializers.Serializer):
+        next = serializers.CharField(allow_null=True)
+        results = ValuationApi.OutputSerializer(many=True)
+
+    pagination = KeysetPagination(ordering=("id",))
+
+    @extend_schema(
+        parameters=[FilterSerializer, KeysetPagination.FilterSerializer],
+        responses=PageSerializer,
+    )
+    def get(self, request):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            wares, next_cursor = self.pagination.paginate(
+                ware_valuation_list(ware_ids=filters.validated_data.get("ware_id")),
+                request,
+            )
+            query = valuation_list(wares)
+        except serializers.ValidationError:
+            raise
+        except Exception as ex:
+            return Response(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"next": next_cursor, "results": query})
+
+
+class CacheStatsApi(views.APIView):
+    class OutputSerializer(serializers.Serializer):
+        enabled = serializers.BooleanField()
+        hits = serializers.IntegerField()
+        misses = serializers.IntegerField()
+        invalidations = serializers.IntegerField()
+
+    @extend_schema(responses=OutputSerializer)
+    def get(self, request):
+        return Response({"enabled": cache.enabled(), **cache.stats()})
@@ -0,0 +1,60 @@
+from rest_framework import status, views
+from rest_framework.response import Response
+
+from rest_framework import serializers
+from drf_spectacular.utils import extend_schema
+
+from inventory.selectors.movement import BUCKETS, movement_report
+
+# A report returns every bucket of its range in one response, so the range
+# is capped at a year of daily rows.
+MAX_REPORT_DAYS = 366
+
+
+class MovementReportApi(views.APIView):
+    class FilterSerializer(serializers.Serializer):
+        ware = serializers.IntegerField()
+        from_ = serializers.DateField()
+        to = serializers.DateField()
+        bucket = serializers.ChoiceField(choices=list(BUCKETS), default="day")
+
+        def get_fields(self):
+            # "from" is a keyword, so the field is declared as from_.
+            fields = super().get_fields()
+            fields["from"] = fields.pop("from_")
+            return fields
+
+        def validate(self, data):
+            if data["from"] > data["to"]:
+                raise serializers.ValidationError("from must not be after to.")
+            if (data["to"] - data["from"]).days >= MAX_REPORT_DAYS:
+                raise serializers.ValidationError(
+                    f"The range must not span more than {MAX_REPORT_DAYS} days."
+                )
+            return data
+
+    class OutputSerializer(serializers.Serializer):
+        period = serializers.DateField()
+        qty_in = serializers.IntegerField()
+        qty_out = serializers.IntegerField()
+        value_in = serializers.DecimalField(max_digits=18, decimal_places=2)
+        cogs = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+    @extend_schema(parameters=[FilterSerializer], responses=OutputSerializer(many=True))
+    def get(self, request):
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        try:
+            query = movement_report(
+                ware_id=filters.validated_data["ware"],
+                since=filters.validated_data["from"],
+                until=filters.validated_data["to"],
+                bucket=filters.validated_data["bucket"],
+            )
+            data = self.OutputSerializer(query, many=True).data
+        except Exception as ex:
+            return Response(
+                {"detail": "Filter Error - " + str(ex)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(data)
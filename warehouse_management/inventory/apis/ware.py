@@ -6,8 +6,13 @@ from django.db.models import Sum
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema
 
+from common.pagination import KeysetPagination
+from common.serialization import ValuesSerializer
+from inventory import cache, cost_methods
+from inventory.apis.conditional import versioned
+
 from inventory.services.ware import create_ware, delete_ware, update_ware
-from inventory.selectors.ware import ware_list, ware_detail
+from inventory.selectors.ware import ware_list, ware_version
 
 
 class WareApi(views.APIView):
@@ -20,6 +25,20 @@ class WareApi(views.APIView):
             model = Ware
             fields = "__all__"
 
+    class FilterSerializer(serializers.Serializer):
+        cost_method = serializers.ChoiceField(choices=[], required=False)
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.fields["cost_method"].choices = cost_methods.choices()
+
+    class PageSerializer(serializers.Serializer):
+        next = serializers.CharField(allow_null=True)
+        results = serializers.ListField()
+
+    pagination = KeysetPagination(ordering=("id",))
+    fast = ValuesSerializer(OutputSerializer)
+
     @extend_schema(
         responses=OutputSerializer,
         request=InputSerializer,
@@ -39,17 +58,27 @@ class WareApi(views.APIView):
             )
         return Response(status=status.HTTP_201_CREATED)
 
-    @extend_schema(responses=OutputSerializer)
+    @extend_schema(
+        parameters=[FilterSerializer, KeysetPagination.FilterSerializer],
+        responses=PageSerializer,
+    )
     def get(self, request):
-
+        filters = self.FilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
         try:
-            query = ware_list()
+            query, next_cursor = self.pagination.paginate(
+                self.fast.values(ware_list(**filters.validated_data)), request
+            )
+        except serializers.ValidationError:
+            raise
         except Exception as ex:
             return Response(
                 {"detail": "Filter Error - " + str(ex)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        return Response(self.OutputSerializer(query, many=True).data)
+        return Response(
+            {"next": next_cursor, "results": self.fast.to_representation(query)}
+        )
 
 
 class WareDetailApi(views.APIView):
@@ -62,18 +91,23 @@ class WareDetailApi(views.APIView):
             model = Ware
             fields = "__all__"
 
+    fast = ValuesSerializer(OutputSerializer)
+
     @extend_schema(
         responses=OutputSerializer,
     )
+    @versioned(ware_version, cache.ware_version_key)
     def get(self, request, id):
         try:
-            query = ware_detail(id)
+            data = cache.get_or_compute(
+                cache.ware_key(id), lambda: self.fast.get(ware_list(), id=id)
+            )
         except Exception as ex:
             return Response(
                 {"detail": "Filter Error - " + str(ex)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        return Response(self.OutputSerializer(query).data)
+        return Response(data)
 
     def delete(self, request, id):
 
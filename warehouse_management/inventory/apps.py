@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from common.metrics import register_collector
+        from inventory import cache, coalesce
+        from inventory.signals import stock_changed
+
+        stock_changed.connect(cache.on_stock_changed, dispatch_uid="inventory.cache")
+        register_collector("inventory_cache", cache.stats)
+        register_collector("inventory_coalescing", coalesce.stats)
@@ -0,0 +1,677 @@
+"""
+Timing helpers for comparing the request paths of the inventory API.
+
+Every benchmark creates its own wares through the services, runs against
+the configured database and deletes what it created the same way, so it
+can be pointed at a copy of a production database:
+
+    python manage.py shell -c "from inventory.benchmarks import *; print(bench_bulk_input())"
+
+`python manage.py bench_inventory` seeds a ledger of a configurable size and
+runs bench_services against it.
+"""
+
+import asyncio
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from common.renderers import FastJSONRenderer
+
+from inventory import coalesce, cost_methods
+from inventory.apis.factor import FactorApi
+from inventory.models import CostLayer, Factor, FifoCursor, StockBalance, Ware
+from inventory.selectors.factor import valuation_stock
+from inventory.services.balance import apply_delta, lock_balance, weighted_cost
+from inventory.services.change import record_changes
+from inventory.services.factor import (
+    create_input,
+    create_inputs,
+    create_output,
+    create_outputs,
+)
+from inventory.services.layers import consume_cost_layers, take_from_layers
+from inventory.services.movement import backfill_movements
+from inventory.services.ware import create_ware, delete_ware
+from inventory.urls import get_urlpatterns
+
+
+def _client() -> Client:
+    return Client(HTTP_HOST="localhost")
+
+
+def _ware(cost_method: str = "fifo") -> Ware:
+    return create_ware(name=f"bench-{uuid.uuid4().hex}", cost_method=cost_method)
+
+
+def drop_wares(wares: list[Ware]):
+    for ware in wares:
+        delete_ware(ware.id)
+
+
+def bench_bulk_input(*, lines: int = 500) -> dict:
+    """
+    Restocks `lines` lines once through POST input/ per line and once through
+    a single POST input/bulk/, and returns the wall time of both paths.
+    """
+    client = _client()
+    ware = _ware()
+    payload = [
+        {"ware_id": ware.id, "quantity": 10, "purchase_price": Decimal("1.50")}
+        for _ in range(lines)
+    ]
+    try:
+        started = time.perf_counter()
+        for line in payload:
+            client.post("/api/inventory/input/", line, content_type="application/json")
+        per_request = time.perf_counter() - started
+
+        started = time.perf_counter()
+        client.post(
+            "/api/inventory/input/bulk/",
+            {"lines": payload},
+            content_type="application/json",
+        )
+        bulk = time.perf_counter() - started
+    finally:
+        drop_wares([ware])
+
+    return {
+        "lines": lines,
+        "per_request_seconds": round(per_request, 4),
+        "bulk_seconds": round(bulk, 4),
+        "speedup": round(per_request / bulk, 1) if bulk else None,
+    }
+
+
+def bench_bulk_output(*, wares: int = 20, lines_per_ware: int = 25) -> dict:
+    """
+    Fulfills the same order batch once through POST output/ per line and once
+    through a single POST output/bulk/, and returns the wall time of both.
+    """
+    client = _client()
+    created = [_ware("fifo" if i % 2 else "weighted_mean") for i in range(wares)]
+    for ware in created:
+        client.post(
+            "/api/inventory/input/bulk/",
+            {
+                "lines": [
+                    {"ware_id": ware.id, "quantity": 2, "purchase_price": "1.50"}
+                    for _ in range(2 * lines_per_ware)
+                ]
+            },
+            content_type="application/json",
+        )
+    payload = [
+        {"ware_id": ware.id, "quantity": 1}
+        for _ in range(lines_per_ware)
+        for ware in created
+    ]
+    try:
+        started = time.perf_counter()
+        for line in payload:
+            client.post("/api/inventory/output/", line, content_type="application/json")
+        per_request = time.perf_counter() - started
+
+        started = time.perf_counter()
+        client.post(
+            "/api/inventory/output/bulk/",
+            {"lines": payload},
+            content_type="application/json",
+        )
+        bulk = time.perf_counter() - started
+    finally:
+        drop_wares(created)
+
+    return {
+        "lines": len(payload),
+        "per_request_seconds": round(per_request, 4),
+        "bulk_seconds": round(bulk, 4),
+        "speedup": round(per_request / bulk, 1) if bulk else None,
+    }
+
+
+def bench_contention(
+    *, threads: int = 8, operations: int = 50, cold_wares: int = 8, stock: int = 100
+) -> dict:
+    """
+    Runs `threads` workers that each withdraw one unit `operations` times,
+    alternating between one hot ware and a cold ware of their own. The hot
+    ware holds less stock than is requested in total, so workers race for
+    the last units; the result reports throughput and whether any balance
+    went negative or disagrees with the ledger.
+    """
+    hot = _ware()
+    cold = [_ware("weighted_mean") for _ in range(cold_wares)]
+    for ware in [hot, *cold]:
+        create_input(ware_id=ware.id, quantity=stock, purchase_price=Decimal("1.00"))
+
+    counts = {"succeeded": 0, "insufficient": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def worker(number: int):
+        try:
+            for operation in range(operations):
+                if operation % 2:
+                    ware = cold[number % len(cold)] if cold else hot
+                else:
+                    ware = hot
+                try:
+                    create_output(ware_id=ware.id, quantity=1)
+                    outcome = "succeeded"
+                except ValueError:
+                    outcome = "insufficient"
+                except Exception:
+                    outcome = "failed"
+                with lock:
+                    counts[outcome] += 1
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    try:
+        consistent = True
+        lowest = None
+        for ware in [hot, *cold]:
+            balance = StockBalance.objects.get(ware=ware)
+            withdrawn = sum(
+                Factor.objects.filter(ware=ware, type="output").values_list(
+                    "quantity", flat=True
+                )
+            )
+            consistent &= balance.quantity == stock - withdrawn
+            lowest = (
+                balance.quantity if lowest is None else min(lowest, balance.quantity)
+            )
+    finally:
+        drop_wares([hot, *cold])
+
+    return {
+        "threads": threads,
+        "operations": threads * operations,
+        **counts,
+        "seconds": round(elapsed, 4),
+        "operations_per_second": round(threads * operations / elapsed, 1),
+        "lowest_balance": lowest,
+        "consistent": consistent,
+    }
+
+
+def seed_wares(
+    *,
+    wares: int = 100,
+    factors_per_ware: int = 100,
+    fifo_ratio: float = 0.5,
+    rng: random.Random | None = None,
+    batch_size: int = 1000,
+) -> list[Ware]:
+    """
+    Creates `wares` wares with `factors_per_ware` factors each, two restocks
+    for every withdrawal, together with the balances, cost layers, FIFO
+    cursors, daily movements and change feed entries the services would have
+    written. Everything is inserted in bulk, so seeding large ledgers takes
+    seconds rather than hours.
+    """
+    rng = rng or random.Random()
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    Ware.objects.bulk_create(
+        [
+            Ware(
+                name=f"{prefix}-{number}",
+                cost_method="fifo" if rng.random() < fifo_ratio else "weighted_mean",
+            )
+            for number in range(wares)
+        ],
+        batch_size=batch_size,
+    )
+    created = list(Ware.objects.filter(name__startswith=f"{prefix}-").order_by("id"))
+
+    wares_per_batch = max(1, batch_size // max(1, factors_per_ware))
+    for start in range(0, len(created), wares_per_batch):
+        factors, layers, balances, cursors = [], [], [], []
+        for ware in created[start : start + wares_per_batch]:
+            balance = StockBalance(ware=ware, value=Decimal(0))
+            open_layers = deque()
+            for number in range(factors_per_ware):
+                if number % 3 == 2:
+                    factor = Factor(ware=ware, type="output", quantity=5)
+                    if ware.cost_method == "fifo":
+                        factor.total_cost = take_from_layers(
+                            layers=open_layers, quantity=5
+                        )
+                    else:
+                        factor.total_cost = weighted_cost(balance=balance, quantity=5)
+                    apply_delta(balance=balance, quantity=-5, value=-factor.total_cost)
+                else:
+                    price = Decimal(rng.randint(100, 1000)) / 100
+                    factor = Factor(
+                        ware=ware, type="input", quantity=10, purchase_price=price
+                    )
+                    apply_delta(balance=balance, quantity=10, value=10 * price)
+                    if ware.cost_method == "fifo":
+                        layer = CostLayer(
+                            ware=ware,
+                            factor=factor,
+                            unit_cost=price,
+                            quantity=10,
+                            remaining_quantity=10,
+                        )
+                        layers.append(layer)
+                        open_layers.append(layer)
+                factors.append(factor)
+            balances.append(balance)
+            if ware.cost_method == "fifo":
+                cursors.append(
+                    FifoCursor(ware=ware, head=open_layers[0] if open_layers else None)
+                )
+
+        Factor.objects.bulk_create(factors, batch_size=batch_size)
+        for layer in layers:
+            layer.created_at = layer.factor.created_at
+        CostLayer.objects.bulk_create(layers, batch_size=batch_size)
+        last_ids = {factor.ware_id: factor.id for factor in factors}
+        for balance in balances:
+            balance.last_factor_id = last_ids.get(balance.ware_id)
+        StockBalance.objects.bulk_create(balances, batch_size=batch_size)
+        FifoCursor.objects.bulk_create(cursors, batch_size=batch_size)
+        record_changes(
+            action="created",
+            changes=[
+                (ware.id, None) for ware in created[start : start + wares_per_batch]
+            ]
+            + [(factor.ware_id, factor.id) for factor in factors],
+        )
+    backfill_movements(ware_ids=[ware.id for ware in created])
+    return created
+
+
+def percentiles(samples: list[float]) -> dict:
+    """
+    Returns the p50, p95 and p99 of `samples` in milliseconds.
+    """
+    if len(samples) == 1:
+        cuts = samples * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+def measure(operation, *, repeat: int) -> dict:
+    """
+    Calls `operation(number)` `repeat` times and returns its latency
+    percentiles and the average number of queries per call.
+    """
+    samples, queries = [], 0
+    for number in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            operation(number)
+            samples.append(time.perf_counter() - started)
+        queries += len(captured.captured_queries)
+    return {
+        "calls": repeat,
+        **percentiles(samples),
+        "queries_per_call": round(queries / repeat, 2),
+    }
+
+
+def _rolled_back(function):
+    def run(*args, **kwargs):
+        with transaction.atomic():
+            function(*args, **kwargs)
+            transaction.set_rollback(True)
+
+    return run
+
+
+def bench_services(*, wares: list[Ware], operations: int = 100, rng=None) -> dict:
+    """
+    Times the write services, both cost calculations, the valuation selector
+    and the list endpoints against already seeded `wares`. The cost
+    calculations run in rolled back transactions so they always start from
+    the seeded state.
+    """
+    rng = rng or random.Random()
+    client = _client()
+    by_method = {
+        method: [ware for ware in wares if ware.cost_method == method]
+        for method, _ in cost_methods.choices()
+    }
+    every = [ware.id for ware in wares]
+    today = timezone.localdate()
+    year_ago = today - timedelta(days=365)
+
+    def pick(method=None):
+        return rng.choice(by_method[method] if method else wares)
+
+    @_rolled_back
+    def fifo_cost(number):
+        consume_cost_layers(ware=pick("fifo"), quantity=5)
+
+    @_rolled_back
+    def weighted_mean_cost(number):
+        balance = lock_balance(ware=pick("weighted_mean"))
+        weighted_cost(balance=balance, quantity=5)
+
+    suite = {
+        "create_input": lambda number: create_input(
+            ware_id=pick().id, quantity=1, purchase_price=Decimal("1.00")
+        ),
+        "fifo_cost": fifo_cost,
+        "weighted_mean_cost": weighted_mean_cost,
+        **{
+            f"create_output[{method}]": (
+                lambda number, method=method: create_output(
+                    ware_id=pick(method).id, quantity=1
+                )
+            )
+            for method, seeded in by_method.items()
+            if seeded
+        },
+        "valuation_stock": lambda number: valuation_stock(pick().id),
+        "GET wares/": lambda number: client.get("/api/inventory/wares/"),
+        "GET factor/": lambda number: client.get(
+            "/api/inventory/factor/", {"ware_id": pick().id}
+        ),
+        "GET inventory/valuation/": lambda number: client.get(
+            "/api/inventory/inventory/valuation/",
+            {"ware_id": rng.sample(every, min(len(every), 50))},
+        ),
+        "GET reports/movements/": lambda number: client.get(
+            "/api/inventory/reports/movements/",
+            {"ware": pick().id, "from": year_ago, "to": today, "bucket": "week"},
+        ),
+    }
+
+    results = {}
+    for name, operation in suite.items():
+        if "fifo" in name and not by_method["fifo"]:
+            continue
+        if "weighted_mean" in name and not by_method["weighted_mean"]:
+            continue
+        results[name] = measure(operation, repeat=operations)
+    return results
+
+
+async def _asgi_get(handler: ASGIHandler, url: str) -> tuple[int, float]:
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    received = False
+    response = {}
+
+    async def receive():
+        nonlocal received
+        if received:
+            # The client stays connected until the response is sent.
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    started = time.perf_counter()
+    await handler(scope, receive, send)
+    return response.get("status"), time.perf_counter() - started
+
+
+async def _asgi_load(urls: list[str], *, connections: int, requests: int) -> dict:
+    handler = ASGIHandler()
+    limit = asyncio.Semaphore(connections)
+
+    async def one(number):
+        async with limit:
+            return await _asgi_get(handler, urls[number % len(urls)])
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(number) for number in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": sum(1 for code, _ in results if code != 200),
+        "requests_per_second": round(requests / elapsed, 1),
+        **percentiles([seconds for _, seconds in results]),
+    }
+
+
+def bench_async_reads(*, connections: int = 100, requests: int = 1000) -> dict:
+    """
+    Sends `requests` GETs to the read endpoints through the ASGI handler,
+    `connections` at a time, once with the sync views and once with the
+    async ones, and returns throughput and latency of both modes.
+    """
+    ware = _ware()
+    factor = create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal("1"))
+    create_output(ware_id=ware.id, quantity=3)
+    urls = [
+        "/api/inventory/wares/?limit=20",
+        f"/api/inventory/wares/{ware.id}/",
+        f"/api/inventory/factor/?ware_id={ware.id}",
+        f"/api/inventory/factor/{factor.id}/",
+        f"/api/inventory/inventory/valuation/{ware.id}/",
+        f"/api/inventory/inventory/valuation/?ware_id={ware.id}",
+    ]
+
+    result = {"connections": connections}
+    try:
+        for mode, async_reads in (("sync", False), ("async", True)):
+
+            class Urls:
+                urlpatterns = [
+                    path(
+                        "api/inventory/",
+                        include(get_urlpatterns(async_reads=async_reads)),
+                    )
+                ]
+
+            with override_settings(ROOT_URLCONF=Urls):
+                result[mode] = asyncio.run(
+                    _asgi_load(urls, connections=connections, requests=requests)
+                )
+    finally:
+        drop_wares([ware])
+    return result
+
+
+def bench_serialization(*, rows: int = 10000, repeat: int = 5) -> dict:
+    """
+    Renders `rows` factors as the factor list does, once through the
+    ModelSerializer and JSONRenderer and once through the values() fast path
+    and FastJSONRenderer, and returns the best CPU time of each per 10k rows.
+    """
+    (ware,) = seed_wares(wares=1, factors_per_ware=rows)
+    factors = Factor.objects.filter(ware=ware).order_by("created_at", "id")
+    serializer, fast = FactorApi.OutputSerializer, FactorApi.fast
+
+    def model_serializer():
+        return JSONRenderer().render(serializer(list(factors), many=True).data)
+
+    def values_serializer():
+        return FastJSONRenderer().render(
+            fast.to_representation(list(fast.values(factors)))
+        )
+
+    try:
+        timings = {}
+        for name, render in (
+            ("serializer", model_serializer),
+            ("fast", values_serializer),
+        ):
+            best = None
+            for _ in range(repeat):
+                started = time.process_time()
+                content = render()
+                elapsed = time.process_time() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, content)
+    finally:
+        drop_wares([ware])
+
+    per_10k = 10000 / rows * 1000
+    return {
+        "rows": rows,
+        "serializer_cpu_ms_per_10k": round(timings["serializer"][0] * per_10k, 1),
+        "fast_cpu_ms_per_10k": round(timings["fast"][0] * per_10k, 1),
+        "speedup": (
+            round(timings["serializer"][0] / timings["fast"][0], 1)
+            if timings["fast"][0]
+            else None
+        ),
+        "identical": timings["serializer"][1] == timings["fast"][1],
+    }
+
+
+def _hot_ware_load(*, threads: int, operations: int) -> dict:
+    """
+    Runs `threads` workers that each withdraw one unit of a single ware
+    `operations` times through coalesce.create_output, and checks that every
+    successful call left exactly one output behind.
+    """
+    ware = _ware("weighted_mean")
+    stock = threads * operations
+    create_input(ware_id=ware.id, quantity=stock, purchase_price=Decimal("1.00"))
+    samples, failed = [], 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal failed
+        try:
+            for _ in range(operations):
+                started = time.perf_counter()
+                try:
+                    coalesce.create_output(ware_id=ware.id, quantity=1)
+                except Exception:
+                    with lock:
+                        failed += 1
+                    continue
+                with lock:
+                    samples.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    before = coalesce.stats()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    try:
+        balance = StockBalance.objects.get(ware=ware)
+        outputs = Factor.objects.filter(ware=ware, type="output").count()
+    finally:
+        drop_wares([ware])
+    return {
+        "failed": failed,
+        "seconds": round(elapsed, 4),
+        "operations_per_second": round(threads * operations / elapsed, 1),
+        **(percentiles(samples) if samples else {}),
+        "batches": coalesce.stats()["batches"] - before["batches"],
+        "consistent": balance.quantity == stock - outputs and outputs == len(samples),
+    }
+
+
+def bench_coalescing(
+    *, concurrency: tuple[int, ...] = (1, 8, 32), operations: int = 50
+) -> dict:
+    """
+    Sends single outputs for one hot ware from 1, 8 and 32 threads at once,
+    with write coalescing off and on, and returns throughput and latency of
+    both modes per concurrency level.
+    """
+    result = {}
+    for threads in concurrency:
+        result[threads] = {}
+        for mode, enabled in (("per_request", False), ("coalesced", True)):
+            with override_settings(
+                INVENTORY_COALESCING={"ENABLED": enabled, "WINDOW_MS": 2}
+            ):
+                result[threads][mode] = _hot_ware_load(
+                    threads=threads, operations=operations
+                )
+    return result
+
+
+def bench_cost_methods(
+    *, history: tuple[int, ...] = (100, 1000, 10000), operations: int = 50
+) -> dict:
+    """
+    Builds a ware per registered cost method and ledger length in `history`,
+    every third factor an output, and times single outputs of one unit
+    against it in rolled back transactions. The latency and queries of an
+    output should not grow with the ledger.
+    """
+    result = {}
+    for method, _ in cost_methods.choices():
+        result[method] = {}
+        for length in history:
+            ware = _ware(method)
+            try:
+                outputs = length // 3
+                for start in range(0, length - outputs, 1000):
+                    create_inputs(
+                        lines=[
+                            {
+                                "ware_id": ware.id,
+                                "quantity": 3,
+                                "purchase_price": Decimal(1 + index % 7),
+                            }
+                            for index in range(
+                                start, min(start + 1000, length - outputs)
+                            )
+                        ]
+                    )
+                for start in range(0, outputs, 1000):
+                    create_outputs(
+                        lines=[{"ware_id": ware.id, "quantity": 2}]
+                        * min(1000, outputs - start)
+                    )
+                result[method][length] = measure(
+                    _rolled_back(
+                        lambda number: create_output(ware_id=ware.id, quantity=1)
+                    ),
+                    repeat=operations,
+                )
+            finally:
+                drop_wares([ware])
+    return result
@@ -0,0 +1,141 @@
+"""
+Opt-in cache for the valuation, ware detail and factor detail reads, and
+for the versions their conditional GETs compare against.
+
+Entries are keyed per ware (and per factor) and on the current generation
+of that ware or factor, which the stock_changed signal replaces once the
+writing transaction commits. A read that computed its value before the
+commit stores it under the old generation, where no later read looks, so
+an invalidation can not be overwritten by a stale value. Enable it with
+INVENTORY_CACHE["ENABLED"]; the backend is any alias from CACHES.
+"""
+
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+_MISSING = object()
+
+
+def _config() -> dict:
+    return {"ENABLED": False, "ALIAS": "default", "TIMEOUT": 300} | getattr(
+        settings, "INVENTORY_CACHE", {}
+    )
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def enabled() -> bool:
+    return _config()["ENABLED"]
+
+
+def valuation_key(ware_id: int) -> str:
+    return f"inventory:ware:{ware_id}:valuation"
+
+
+def ware_key(ware_id: int) -> str:
+    return f"inventory:ware:{ware_id}:detail"
+
+
+def factor_key(factor_id: int) -> str:
+    return f"inventory:factor:{factor_id}:detail"
+
+
+def ware_version_key(ware_id: int) -> str:
+    return f"inventory:ware:{ware_id}:version"
+
+
+def factor_version_key(factor_id: int) -> str:
+    return f"inventory:factor:{factor_id}:version"
+
+
+def _generation_key(key: str) -> str:
+    # The ware or factor a key belongs to, e.g. "inventory:ware:1".
+    return key.rsplit(":", 1)[0] + ":generation"
+
+
+def _generation(cache, key: str) -> str:
+    generation_key = _generation_key(key)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid.uuid4().hex, None)
+        generation = cache.get(generation_key)
+    return f"{key}:{generation}"
+
+
+async def _ageneration(cache, key: str) -> str:
+    generation_key = _generation_key(key)
+    generation = await cache.aget(generation_key)
+    if generation is None:
+        await cache.aadd(generation_key, uuid.uuid4().hex, None)
+        generation = await cache.aget(generation_key)
+    return f"{key}:{generation}"
+
+
+def get_or_compute(key: str, compute):
+    """
+    Returns the cached value of `key`, computing and storing it on a miss.
+    Without the cache enabled this is just compute().
+    """
+    config = _config()
+    if not config["ENABLED"]:
+        return compute()
+
+    cache = caches[config["ALIAS"]]
+    key = _generation(cache, key)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count("hits")
+        return value
+    _count("misses")
+    value = compute()
+    cache.set(key, value, config["TIMEOUT"])
+    return value
+
+
+async def aget_or_compute(key: str, compute):
+    """
+    get_or_compute for async views; `compute` is a coroutine function.
+    """
+    config = _config()
+    if not config["ENABLED"]:
+        return await compute()
+
+    cache = caches[config["ALIAS"]]
+    key = await _ageneration(cache, key)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _count("hits")
+        return value
+    _count("misses")
+    value = await compute()
+    await cache.aset(key, value, config["TIMEOUT"])
+    return value
+
+
+def invalidate(*, ware_ids=(), factor_ids=()):
+    config = _config()
+    if not config["ENABLED"]:
+        return
+    keys = [_generation_key(ware_key(id)) for id in ware_ids]
+    keys += [_generation_key(factor_key(id)) for id in factor_ids]
+    if keys:
+        # Entries of the old generations expire with their timeout.
+        caches[config["ALIAS"]].set_many({key: uuid.uuid4().hex for key in keys}, None)
+        _count("invalidations", len(keys))
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def on_stock_changed(sender, *, ware_ids, factor_ids, **kwargs):
+    invalidate(ware_ids=ware_ids, factor_ids=factor_ids)
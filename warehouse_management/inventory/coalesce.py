@@ -0,0 +1,150 @@
+"""
+Opt-in group commit of single inputs and outputs.
+
+With INVENTORY_COALESCING["ENABLED"], the first request for a ware waits
+up to WINDOW_MS for more requests to the same ware. It then writes all of
+them in one transaction with create_inputs and create_outputs, so a hot
+ware pays for one lock wait and one commit per batch rather than per
+request. Every caller still gets its own factor and total_cost, or its
+own error.
+
+Batches are formed per process. Requests made inside an atomic block are
+never coalesced, because the batch commits in another transaction.
+"""
+
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from common.db import retry_on_lock
+
+from inventory.models import Factor, Ware
+from inventory.services.factor import (
+    create_input as _create_input,
+    create_inputs,
+    create_output as _create_output,
+    create_outputs,
+)
+
+_stats = {"requests": 0, "batches": 0}
+_lock = threading.Lock()
+_pending = {}
+
+
+def _config() -> dict:
+    return {"ENABLED": False, "WINDOW_MS": 2, "MAX_BATCH": 100} | getattr(
+        settings, "INVENTORY_COALESCING", {}
+    )
+
+
+def enabled() -> bool:
+    return _config()["ENABLED"]
+
+
+class _Batch:
+    def __init__(self):
+        self.lines = []
+        self.results = None
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+@retry_on_lock
+@transaction.atomic
+def _write(lines: list[dict]) -> list[tuple[Factor | None, str | None]]:
+    """
+    Writes a batch of input and output lines as one transaction. Inputs go
+    first: the requests raced each other, so any order is one they could
+    have committed in, and this one lets outputs use the restocked units.
+    """
+    inputs = [index for index, line in enumerate(lines) if line["type"] == "input"]
+    outputs = [index for index, line in enumerate(lines) if line["type"] == "output"]
+    results = [None] * len(lines)
+    if inputs:
+        created = create_inputs(lines=[lines[index] for index in inputs])
+        for index, result in zip(inputs, created):
+            results[index] = result
+    if outputs:
+        created = create_outputs(
+            lines=[lines[index] for index in outputs], partial=True
+        )
+        for index, result in zip(outputs, created):
+            results[index] = result
+    return results
+
+
+def _submit(line: dict) -> Factor:
+    config = _config()
+    with _lock:
+        _stats["requests"] += 1
+        batch = _pending.get(line["ware_id"])
+        leader = batch is None
+        if leader:
+            batch = _pending[line["ware_id"]] = _Batch()
+        position = len(batch.lines)
+        batch.lines.append(line)
+        if len(batch.lines) >= config["MAX_BATCH"]:
+            # Later requests start the next batch.
+            del _pending[line["ware_id"]]
+            batch.full.set()
+
+    if leader:
+        batch.full.wait(config["WINDOW_MS"] / 1000)
+        with _lock:
+            if _pending.get(line["ware_id"]) is batch:
+                del _pending[line["ware_id"]]
+            _stats["batches"] += 1
+        try:
+            batch.results = _write(batch.lines)
+        except Exception as ex:
+            batch.error = ex
+        finally:
+            batch.done.set()
+    else:
+        batch.done.wait()
+
+    if batch.error is not None:
+        raise batch.error
+    factor, error = batch.results[position]
+    if error == "Ware not found.":
+        raise Ware.DoesNotExist(error)
+    if error is not None:
+        raise ValueError(error)
+    return factor
+
+
+def create_input(*, ware_id: int, quantity: int, purchase_price: Decimal) -> Factor:
+    """
+    services.factor.create_input, coalesced with concurrent writes to the
+    same ware when enabled.
+    """
+    if not enabled() or transaction.get_connection().in_atomic_block:
+        return _create_input(
+            ware_id=ware_id, quantity=quantity, purchase_price=purchase_price
+        )
+    return _submit(
+        {
+            "type": "input",
+            "ware_id": ware_id,
+            "quantity": quantity,
+            "purchase_price": purchase_price,
+        }
+    )
+
+
+def create_output(*, ware_id: int, quantity: int) -> Factor:
+    """
+    services.factor.create_output, coalesced with concurrent writes to the
+    same ware when enabled.
+    """
+    if not enabled() or transaction.get_connection().in_atomic_block:
+        return _create_output(ware_id=ware_id, quantity=quantity)
+    return _submit({"type": "output", "ware_id": ware_id, "quantity": quantity})
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats)
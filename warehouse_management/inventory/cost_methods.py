@@ -0,0 +1,278 @@
+"""
+Cost methods, looked up by Ware.cost_method.
+
+A method costs the outputs of a ware from incremental state: the balance
+row of the ware plus whatever the method keeps on its own, such as the
+cost layers of FIFO and LIFO. An output never reads the history of its
+ware; it costs at most an index lookup per cost layer it consumes. The
+balance the methods keep up to date is also what valuations read, so
+valuations need nothing per method.
+
+New methods subclass CostMethod and are added with `register`. The ware
+APIs validate against, and Ware.cost_method offers, whatever is
+registered here.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from inventory.models import (
+    ArchivedFactor,
+    CostLayer,
+    DailyMovement,
+    Factor,
+    StockBalance,
+    Ware,
+)
+from inventory.services.balance import weighted_cost
+from inventory.services.layers import (
+    before,
+    consume_cost_layers,
+    consume_newest_layers,
+    lock_open_layers,
+    open_layers_before,
+    replay_layers,
+    save_open_layers,
+    take_from_layers,
+)
+
+_methods = {}
+
+
+class CostMethod(ABC):
+    """
+    The interface of a cost method. Outputs are costed in three ways, all
+    through `cost`:
+
+    - a batch of outputs loads the state of its wares with `load`, costs
+      every line in memory and writes the state back with `save`;
+    - a single output goes through `cost_one`, which methods override when
+      they can cost it without loading their whole state;
+    - re-costing starts from `state_before` a point of the ledger and
+      replays the factors after it, adding inputs with `receive`.
+
+    The callers hold the balance locks of the wares and apply the costs to
+    the balances themselves.
+    """
+
+    name = None
+    label = None
+    # Whether inputs of the ware open cost layers.
+    layered = False
+
+    def load(self, *, wares: list[Ware]) -> dict[int, object]:
+        return {ware.id: None for ware in wares}
+
+    def save(self, *, states: dict[int, object]):
+        pass
+
+    @abstractmethod
+    def cost(
+        self, *, state, balance: StockBalance, quantity: int, at: datetime
+    ) -> Decimal:
+        """
+        Cost of taking `quantity` units out of a ware whose stock is
+        `balance`, at `at`. Takes the units out of `state` too.
+        """
+
+    def cost_one(self, *, ware: Ware, balance: StockBalance, quantity: int) -> Decimal:
+        states = self.load(wares=[ware])
+        total_cost = self.cost(
+            state=states[ware.id],
+            balance=balance,
+            quantity=quantity,
+            at=timezone.now(),
+        )
+        self.save(states=states)
+        return total_cost
+
+    def state_before(self, *, ware: Ware, since, quantity: int):
+        """
+        The state right before the ledger position `since`, when the ware
+        held `quantity` units; the empty state without `since`.
+        """
+        return None
+
+    def receive(self, *, state, layer: CostLayer | None):
+        """
+        Adds the layer of an input to `state` while re-costing. Only layered
+        methods get one.
+        """
+
+
+class LayeredMethod(CostMethod):
+    """
+    Costs outputs from the cost layers of the inputs, consuming the oldest
+    units first or with `newest_first` the newest ones.
+    """
+
+    layered = True
+    newest_first = False
+
+    def load(self, *, wares):
+        return lock_open_layers(ware_ids=[ware.id for ware in wares])
+
+    def save(self, *, states):
+        save_open_layers(open_layers=states)
+
+    def cost(self, *, state, balance, quantity, at):
+        return take_from_layers(
+            layers=state, quantity=quantity, newest_first=self.newest_first
+        )
+
+    def state_before(self, *, ware, since, quantity):
+        if since is None:
+            return deque()
+        _, open_layers = replay_layers(
+            ware=ware, since=since, newest_first=self.newest_first
+        )
+        return open_layers
+
+    def receive(self, *, state, layer):
+        state.append(layer)
+
+
+def register(method: type[CostMethod]) -> type[CostMethod]:
+    _methods[method.name] = method()
+    return method
+
+
+def get(name: str) -> CostMethod:
+    try:
+        return _methods[name]
+    except KeyError:
+        raise ValueError(f"Unknown cost method {name!r}.") from None
+
+
+def choices() -> list[tuple[str, str]]:
+    return [(method.name, method.label) for method in _methods.values()]
+
+
+@register
+class WeightedMean(CostMethod):
+    """
+    Moving average: every output costs the average cost of the units on
+    hand, which the balance keeps.
+    """
+
+    name = "weighted_mean"
+    label = "Weighted Mean"
+
+    def cost(self, *, state, balance, quantity, at):
+        return weighted_cost(balance=balance, quantity=quantity)
+
+    def cost_one(self, *, ware, balance, quantity):
+        return weighted_cost(balance=balance, quantity=quantity)
+
+
+@register
+class Fifo(LayeredMethod):
+    name = "fifo"
+    label = "FIFO"
+
+    def cost_one(self, *, ware, balance, quantity):
+        return consume_cost_layers(ware=ware, quantity=quantity)
+
+    def state_before(self, *, ware, since, quantity):
+        if since is None:
+            return super().state_before(ware=ware, since=since, quantity=quantity)
+        return open_layers_before(ware=ware, since=since, quantity=quantity)
+
+
+@register
+class Lifo(LayeredMethod):
+    """
+    The units on hand before a point of the ledger depend on every output
+    before it, so re-costing a LIFO ware replays the ledger up to the point
+    of the edit.
+    """
+
+    name = "lifo"
+    label = "LIFO"
+    newest_first = True
+
+    def cost_one(self, *, ware, balance, quantity):
+        return consume_newest_layers(ware=ware, quantity=quantity)
+
+
+def _period_start(at: datetime) -> datetime:
+    return timezone.make_aware(
+        datetime.combine(timezone.localdate(at).replace(day=1), time.min)
+    )
+
+
+@register
+class PeriodicAverage(CostMethod):
+    """
+    Outputs cost the average of the calendar month so far: the stock the
+    month opened with plus its inputs, at their value. That is the stock on
+    hand plus what the month's outputs took, so the state is the month's
+    output quantity and cost, read from the daily movement rollups. An
+    output never costs more than the value on hand.
+    """
+
+    name = "periodic_average"
+    label = "Periodic Average"
+
+    def load(self, *, wares):
+        start = _period_start(timezone.now())
+        states = {
+            ware.id: {"start": start, "quantity": 0, "cogs": Decimal(0)}
+            for ware in wares
+        }
+        rows = (
+            DailyMovement.objects.filter(
+                ware_id__in=list(states), day__gte=timezone.localdate(start)
+            )
+            .values("ware_id")
+            .annotate(quantity=Sum("qty_out"), cogs=Sum("cogs"))
+        )
+        for row in rows:
+            states[row["ware_id"]].update(quantity=row["quantity"], cogs=row["cogs"])
+        return states
+
+    def cost(self, *, state, balance, quantity, at):
+        start = _period_start(at)
+        if state["start"] != start:
+            state.update(start=start, quantity=0, cogs=Decimal(0))
+        if quantity >= balance.quantity:
+            total_cost = Decimal(balance.value)
+        else:
+            average = (balance.value + state["cogs"]) / (
+                balance.quantity + state["quantity"]
+            )
+            total_cost = min(
+                (quantity * average).quantize(Decimal("0.01")),
+                Decimal(balance.value),
+            )
+        state["quantity"] += quantity
+        state["cogs"] += total_cost
+        return total_cost
+
+    def state_before(self, *, ware, since, quantity):
+        if since is None:
+            # From the first factor, so outputs archived earlier in its month
+            # still count.
+            first = Factor.objects.filter(ware=ware).order_by("created_at", "id")
+            first = first.first()
+            if first is None:
+                return {"start": None, "quantity": 0, "cogs": Decimal(0)}
+            since = (first.created_at, first.id)
+        start = _period_start(since[0])
+        state = {"start": start, "quantity": 0, "cogs": Decimal(0)}
+        outputs = {"ware": ware, "type": "output", "created_at__gte": start}
+        # Archived factors all come before the ledger left, though the opening
+        # balance that replaced them shares the position of the newest one.
+        for query in (
+            Factor.objects.filter(before(since), **outputs),
+            ArchivedFactor.objects.filter(created_at__lte=since[0], **outputs),
+        ):
+            totals = query.aggregate(quantity=Sum("quantity"), cogs=Sum("total_cost"))
+            state["quantity"] += totals["quantity"] or 0
+            state["cogs"] += totals["cogs"] or 0
+        return state
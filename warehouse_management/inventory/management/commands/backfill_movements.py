@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventory.services.movement import backfill_movements
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily movement rollups from the factor ledger and its "
+        "archive, for all days or a range of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ware", type=int, action="append", help="Only these ware ids."
+        )
+        parser.add_argument("--since", help="First day to rebuild, inclusive.")
+        parser.add_argument("--until", help="Last day to rebuild, inclusive.")
+
+    def handle(self, *args, **options):
+        days = {}
+        for name in ("since", "until"):
+            if options[name]:
+                days[name] = parse_date(options[name])
+                if days[name] is None:
+                    raise CommandError(f"Invalid --{name} value: {options[name]}")
+
+        written = backfill_movements(ware_ids=options["ware"], **days)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily movement(s)."))
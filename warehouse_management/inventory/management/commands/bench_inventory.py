@@ -0,0 +1,114 @@
+import json
+import random
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory import benchmarks
+
+SCENARIOS = {
+    "async_reads": benchmarks.bench_async_reads,
+    "bulk_input": benchmarks.bench_bulk_input,
+    "bulk_output": benchmarks.bench_bulk_output,
+    "coalescing": benchmarks.bench_coalescing,
+    "contention": benchmarks.bench_contention,
+    "cost_methods": benchmarks.bench_cost_methods,
+    "serialization": benchmarks.bench_serialization,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a ledger of the given size, times the inventory services and "
+        "list endpoints against it and reports latency percentiles and queries "
+        "per operation. Seeded wares are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wares", type=int, default=100)
+        parser.add_argument(
+            "--factors-per-ware",
+            type=int,
+            default=100,
+            help="Ledger length of every seeded ware; every third factor is an output.",
+        )
+        parser.add_argument(
+            "--fifo-ratio",
+            type=float,
+            default=0.5,
+            help="Share of seeded wares that use FIFO instead of weighted mean.",
+        )
+        parser.add_argument(
+            "--operations", type=int, default=100, help="Calls per timed operation."
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            default=[],
+            help="Also run one of the end to end benchmarks; may be repeated.",
+        )
+        parser.add_argument("--seed", type=int, help="Seed for repeatable runs.")
+        parser.add_argument(
+            "--format", choices=["text", "json"], default="text", dest="output"
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded wares."
+        )
+
+    def handle(self, *args, **options):
+        if options["wares"] < 1 or options["operations"] < 1:
+            raise CommandError("--wares and --operations must be at least 1.")
+        if not 0 <= options["fifo_ratio"] <= 1:
+            raise CommandError("--fifo-ratio must be between 0 and 1.")
+
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        wares = benchmarks.seed_wares(
+            wares=options["wares"],
+            factors_per_ware=options["factors_per_ware"],
+            fifo_ratio=options["fifo_ratio"],
+            rng=rng,
+        )
+        seeded = time.perf_counter() - started
+        try:
+            operations = benchmarks.bench_services(
+                wares=wares, operations=options["operations"], rng=rng
+            )
+            scenarios = {name: SCENARIOS[name]() for name in options["scenario"]}
+        finally:
+            if not options["keep"]:
+                benchmarks.drop_wares(wares)
+
+        report = {
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "wares": options["wares"],
+            "factors_per_ware": options["factors_per_ware"],
+            "fifo_ratio": options["fifo_ratio"],
+            "seed_seconds": round(seeded, 3),
+            "operations": operations,
+            "scenarios": scenarios,
+        }
+        if options["output"] == "json":
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['database']}, {report['wares']} wares x "
+            f"{report['factors_per_ware']} factors, seeded in "
+            f"{report['seed_seconds']}s"
+        )
+        self.stdout.write(
+            f"{'operation':<32}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'queries':>9}"
+        )
+        for name, row in operations.items():
+            self.stdout.write(
+                f"{name:<32}{row['calls']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                f"{row['p99_ms']:>10}{row['queries_per_call']:>9}"
+            )
+        for name, result in scenarios.items():
+            self.stdout.write(f"{name}: {json.dumps(result)}")
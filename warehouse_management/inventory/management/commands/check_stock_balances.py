@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import StockBalance, Ware
+from inventory.selectors.factor import ledger_totals
+from inventory.services.balance import AVERAGE_COST_PLACES, touch
+
+
+class Command(BaseCommand):
+    help = "Verifies the stock balance of every ware against the factor ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Overwrite mismatching balances with the values from the ledger.",
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        stored = StockBalance.objects.select_for_update().in_bulk()
+        expected = {
+            ware_id: StockBalance(ware_id=ware_id, value=Decimal(0))
+            for ware_id in Ware.objects.values_list("id", flat=True)
+        }
+        for totals in ledger_totals():
+            balance = expected[totals["ware_id"]]
+            balance.quantity = totals["quantity_in_stock"]
+            balance.value = totals["total_inventory_value"]
+            balance.last_factor_id = totals["last_factor_id"]
+            if balance.quantity > 0:
+                balance.average_cost = (balance.value / balance.quantity).quantize(
+                    AVERAGE_COST_PLACES
+                )
+
+        mismatches = []
+        for ware_id, balance in expected.items():
+            current = stored.get(ware_id)
+            # The average drives weighted mean costs, so it has to match too.
+            if current is None or (
+                current.quantity,
+                current.value,
+                current.average_cost,
+                current.last_factor_id,
+            ) != (
+                balance.quantity,
+                balance.value,
+                balance.average_cost,
+                balance.last_factor_id,
+            ):
+                mismatches.append(balance)
+                stored_totals = (
+                    (current.quantity, current.value, current.average_cost)
+                    if current
+                    else None
+                )
+                self.stdout.write(
+                    f"ware {ware_id}: stored {stored_totals}, ledger "
+                    f"{(balance.quantity, balance.value, balance.average_cost)}"
+                )
+
+        if options["repair"] and mismatches:
+            for balance in mismatches:
+                current = stored.get(balance.ware_id)
+                balance.version = current.version if current else 0
+                touch(balance=balance)
+            StockBalance.objects.bulk_create(
+                mismatches,
+                update_conflicts=True,
+                unique_fields=["ware"],
+                update_fields=[
+                    "quantity",
+                    "value",
+                    "average_cost",
+                    "last_factor_id",
+                    "version",
+                    "changed_at",
+                ],
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Repaired {len(mismatches)} balance(s).")
+            )
+        elif mismatches:
+            self.stdout.write(
+                self.style.WARNING(f"{len(mismatches)} balance(s) do not match.")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("All balances match the ledger."))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.models import Ware
+from inventory.services.compaction import compact_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the factors created before a point in time to the archive and "
+        "replaces them with opening-balance factors per ware, keeping the FIFO "
+        "layers and weighted average that were still open."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            required=True,
+            help="Date or datetime; factors created before it are archived.",
+        )
+        parser.add_argument(
+            "--ware", type=int, action="append", help="Only these ware ids."
+        )
+
+    def handle(self, *args, **options):
+        before = parse_datetime(options["before"])
+        if before is None and parse_date(options["before"]):
+            before = parse_datetime(f"{options['before']}T00:00:00")
+        if before is None:
+            raise CommandError(f"Invalid --before value: {options['before']}")
+        if timezone.is_naive(before):
+            before = timezone.make_aware(before)
+
+        wares = Ware.objects.order_by("id")
+        if options["ware"]:
+            wares = wares.filter(id__in=options["ware"])
+
+        archived = failed = 0
+        for ware in wares:
+            try:
+                moved = compact_ledger(ware=ware, before=before)
+            except ValueError as ex:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"ware {ware.id}: {ex}"))
+                continue
+            archived += moved
+            if moved:
+                self.stdout.write(f"ware {ware.id}: {moved} factor(s) archived")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} factor(s)."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} ware(s) left unchanged."))
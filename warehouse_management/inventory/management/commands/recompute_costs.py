@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.models import Ware
+from inventory.services.costing import recompute_costs
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-costs the outputs of wares from a point in time onwards and "
+        "rewrites their balances, FIFO layers and snapshots to match."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ware", type=int, action="append", help="Only these ware ids."
+        )
+        parser.add_argument(
+            "--since",
+            help="Date or datetime of the earliest factor to re-cost; "
+            "defaults to the start of the ledger.",
+        )
+        parser.add_argument(
+            "--clamp",
+            action="store_true",
+            help="Cost outputs the ledger can not cover with the stock that was "
+            "left instead of stopping at the ware.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None and parse_date(options["since"]):
+                since = parse_datetime(f"{options['since']}T00:00:00")
+            if since is None:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        wares = Ware.objects.order_by("id")
+        if options["ware"]:
+            wares = wares.filter(id__in=options["ware"])
+
+        recosted = failed = 0
+        for ware in wares:
+            try:
+                changed = recompute_costs(
+                    ware=ware,
+                    since=(since, 0) if since else None,
+                    strict=not options["clamp"],
+                )
+            except ValueError as ex:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"ware {ware.id}: {ex}"))
+                continue
+            recosted += changed
+            if changed:
+                self.stdout.write(f"ware {ware.id}: {changed} output(s) re-costed")
+
+        self.stdout.write(self.style.SUCCESS(f"Re-costed {recosted} output(s)."))
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{failed} ware(s) left unchanged; rerun with --clamp to force."
+                )
+            )
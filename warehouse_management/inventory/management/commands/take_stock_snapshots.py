@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services.snapshot import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores the current stock balance of every ware as a snapshot for "
+        "as-of valuation. Meant to run on a schedule, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ware", type=int, action="append", help="Only snapshot these ware ids."
+        )
+
+    def handle(self, *args, **options):
+        count = take_snapshots(ware_ids=options["ware"])
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} snapshot(s)."))
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:42
+
+from collections import deque
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_cost_layers(apps, schema_editor):
+    Ware = apps.get_model("inventory", "Ware")
+    Factor = apps.get_model("inventory", "Factor")
+    CostLayer = apps.get_model("inventory", "CostLayer")
+    FifoCursor = apps.get_model("inventory", "FifoCursor")
+
+    for ware in Ware.objects.filter(cost_method="fifo"):
+        layers = []
+        open_layers = deque()
+        factors = Factor.objects.filter(ware=ware).order_by("created_at", "id")
+        for factor in factors.iterator():
+            if factor.type == "input":
+                layer = CostLayer(
+                    ware=ware,
+                    factor=factor,
+                    unit_cost=factor.purchase_price or 0,
+                    quantity=factor.quantity,
+                    remaining_quantity=factor.quantity,
+                    created_at=factor.created_at,
+                )
+                layers.append(layer)
+                open_layers.append(layer)
+            elif factor.type == "output":
+                quantity = factor.quantity
+                while quantity > 0 and open_layers:
+                    layer = open_layers[0]
+                    taken = min(quantity, layer.remaining_quantity)
+                    layer.remaining_quantity -= taken
+                    quantity -= taken
+                    if layer.remaining_quantity == 0:
+                        open_layers.popleft()
+
+        CostLayer.objects.bulk_create(layers)
+        head = open_layers[0] if open_layers else None
+        FifoCursor.objects.create(ware=ware, head_id=head.id if head else None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_alter_factor_purchase_price_alter_factor_total_cost_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.IntegerField()),
+                ('remaining_quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('factor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layer', to='inventory.factor')),
+                ('ware', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.ware')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FifoCursor',
+            fields=[
+                ('ware', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fifo_cursor', serialize=False, to='inventory.ware')),
+                ('head', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.costlayer')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(condition=models.Q(('remaining_quantity__gt', 0)), fields=['ware', 'created_at', 'id'], name='costlayer_open_idx'),
+        ),
+        migrations.RunPython(backfill_cost_layers, migrations.RunPython.noop),
+    ]
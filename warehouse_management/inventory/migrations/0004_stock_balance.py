@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_stock_balances(apps, schema_editor):
+    Ware = apps.get_model("inventory", "Ware")
+    Factor = apps.get_model("inventory", "Factor")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+
+    balances = {
+        ware_id: StockBalance(ware_id=ware_id)
+        for ware_id in Ware.objects.values_list("id", flat=True)
+    }
+    factors = Factor.objects.values_list(
+        "id", "ware_id", "type", "quantity", "purchase_price", "total_cost"
+    )
+    for id, ware_id, type, quantity, purchase_price, total_cost in factors.iterator():
+        balance = balances[ware_id]
+        if type == "input":
+            balance.quantity += quantity
+            balance.value += quantity * (purchase_price or Decimal(0))
+        elif type == "output":
+            balance.quantity -= quantity
+            balance.value -= total_cost or Decimal(0)
+        balance.last_factor_id = max(balance.last_factor_id or 0, id)
+    StockBalance.objects.bulk_create(balances.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_cost_layers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('ware', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='inventory.ware')),
+                ('quantity', models.IntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('last_factor_id', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stock_balances, migrations.RunPython.noop),
+    ]
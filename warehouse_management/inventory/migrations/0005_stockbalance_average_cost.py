@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:44
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_average_cost(apps, schema_editor):
+    StockBalance = apps.get_model("inventory", "StockBalance")
+
+    balances = list(StockBalance.objects.filter(quantity__gt=0))
+    for balance in balances:
+        balance.average_cost = (balance.value / balance.quantity).quantize(
+            Decimal("0.000001")
+        )
+    StockBalance.objects.bulk_update(balances, ["average_cost"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stock_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockbalance',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=6, default=0, max_digits=18),
+        ),
+        migrations.RunPython(backfill_average_cost, migrations.RunPython.noop),
+    ]
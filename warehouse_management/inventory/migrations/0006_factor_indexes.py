@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stockbalance_average_cost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factor',
+            index=models.Index(fields=['ware', 'type', 'created_at', 'id'], name='factor_ware_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factor',
+            index=models.Index(fields=['ware', 'created_at', 'id'], name='factor_ware_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_factor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factor',
+            index=models.Index(fields=['created_at', 'id'], name='factor_created_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_factor_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("taken_at", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+                ("value", models.DecimalField(decimal_places=2, max_digits=18)),
+                ("average_cost", models.DecimalField(decimal_places=6, max_digits=18)),
+                ("last_factor_id", models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="factor",
+            name="ware",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventory.ware",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="factor",
+            index=models.Index(fields=["ware", "id"], name="factor_ware_id_idx"),
+        ),
+        migrations.AddField(
+            model_name="stocksnapshot",
+            name="ware",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventory.ware",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocksnapshot",
+            index=models.Index(
+                fields=["ware", "taken_at"], name="snapshot_ware_taken_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_stock_snapshots"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockbalance",
+            name="changed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="stockbalance",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_change_feed"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="factor",
+            name="type",
+            field=models.CharField(
+                choices=[
+                    ("input", "Input (Restock)"),
+                    ("output", "Output (Fulfillment)"),
+                    ("opening", "Opening Balance"),
+                ],
+                max_length=10,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedFactor",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("factor_id", models.IntegerField()),
+                ("quantity", models.IntegerField()),
+                (
+                    "purchase_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("input", "Input (Restock)"),
+                            ("output", "Output (Fulfillment)"),
+                            ("opening", "Opening Balance"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "total_cost",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "ware",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="inventory.ware",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["ware", "created_at", "factor_id"],
+                        name="archive_ware_created_idx",
+                    )
+                ],
+            },
+        ),
+    ]
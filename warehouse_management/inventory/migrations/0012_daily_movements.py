@@ -0,0 +1,102 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:18
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_movements(apps, schema_editor):
+    """
+    Fills the rollups from the ledger and the archive as they stand, with
+    the grouped query of services.movement.backfill_movements.
+    """
+    DailyMovement = apps.get_model("inventory", "DailyMovement")
+    money = DecimalField(max_digits=18, decimal_places=2)
+    fields = ["qty_in", "qty_out", "value_in", "cogs"]
+    totals = {}
+    for name in ("Factor", "ArchivedFactor"):
+        rows = (
+            apps.get_model("inventory", name)
+            .objects.filter(type__in=["input", "output"])
+            .annotate(day=TruncDate("created_at"))
+            .values("ware_id", "day")
+            .order_by("ware_id", "day")
+            .annotate(
+                qty_in=Coalesce(Sum("quantity", filter=Q(type="input")), 0),
+                qty_out=Coalesce(Sum("quantity", filter=Q(type="output")), 0),
+                value_in=Coalesce(
+                    Sum(
+                        F("quantity") * F("purchase_price"),
+                        filter=Q(type="input"),
+                        output_field=money,
+                    ),
+                    Value(Decimal(0)),
+                    output_field=money,
+                ),
+                cogs=Coalesce(
+                    Sum("total_cost", filter=Q(type="output"), output_field=money),
+                    Value(Decimal(0)),
+                    output_field=money,
+                ),
+            )
+        )
+        for row in rows.iterator():
+            total = totals.setdefault(
+                (row["ware_id"], row["day"]), dict.fromkeys(fields, 0)
+            )
+            for field in fields:
+                total[field] += row[field]
+
+    DailyMovement.objects.bulk_create(
+        [
+            DailyMovement(ware_id=ware_id, day=day, **total)
+            for (ware_id, day), total in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_archived_factors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyMovement",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField()),
+                ("qty_in", models.IntegerField(default=0)),
+                ("qty_out", models.IntegerField(default=0)),
+                (
+                    "value_in",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                (
+                    "cogs",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                (
+                    "ware",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="inventory.ware",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ware", "day"), name="dailymovement_ware_day_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_movements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0012_daily_movements"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="factor",
+            index=models.Index(
+                fields=["type", "created_at", "id"], name="factor_type_created_idx"
+            ),
+        ),
+    ]
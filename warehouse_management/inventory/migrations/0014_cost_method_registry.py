@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:26
+
+import inventory.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0013_factor_type_created_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ware",
+            name="cost_method",
+            field=models.CharField(
+                choices=inventory.models.cost_method_choices, max_length=50
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+def create_row(apps, schema_editor):
+    apps.get_model("inventory", "ChangeSequence").objects.create(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0014_cost_method_registry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0015_change_sequence"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="ChangeSequence",
+        ),
+    ]
@@ -1,15 +1,17 @@
 from django.db import models
 
 
-class Ware(models.Model):
-    COST_METHOD_CHOICES = [
-        ("weighted_mean", "Weighted Mean"),
-        ("fifo", "FIFO"),
-    ]
+def cost_method_choices() -> list[tuple[str, str]]:
+    from inventory import cost_methods
+
+    return cost_methods.choices()
+
 
+class Ware(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255, unique=True)
-    cost_method = models.CharField(max_length=50, choices=COST_METHOD_CHOICES)
+    # The methods registered in inventory.cost_methods.
+    cost_method = models.CharField(max_length=50, choices=cost_method_choices)
 
     def __str__(self):
         return self.name
@@ -19,10 +21,13 @@ class Factor(models.Model):
     FACTOR_TYPE_CHOICES = [
         ("input", "Input (Restock)"),
         ("output", "Output (Fulfillment)"),
+        # Written by compact_ledger in place of archived history: the stock
+        # it carries is `quantity`, worth `total_cost`.
+        ("opening", "Opening Balance"),
     ]
 
     id = models.AutoField(primary_key=True)
-    ware = models.ForeignKey(Ware, on_delete=models.CASCADE)
+    ware = models.ForeignKey(Ware, on_delete=models.CASCADE, db_index=False)
     quantity = models.IntegerField()
     purchase_price = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True
@@ -33,5 +38,180 @@ class Factor(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["ware", "type", "created_at", "id"],
+                name="factor_ware_type_created_idx",
+            ),
+            models.Index(
+                fields=["ware", "created_at", "id"],
+                name="factor_ware_created_idx",
+            ),
+            models.Index(fields=["created_at", "id"], name="factor_created_idx"),
+            models.Index(fields=["ware", "id"], name="factor_ware_id_idx"),
+            models.Index(
+                fields=["type", "created_at", "id"], name="factor_type_created_idx"
+            ),
+        ]
+
+    def __str__(self):
+        # The ware id rather than its name, so listing factors does not load
+        # every ware.
+        return f"{self.type.capitalize()} - {self.ware_id} ({self.quantity})"
+
+
+class ArchivedFactor(models.Model):
+    """
+    A factor moved out of the ledger by compact_ledger, as it was when
+    archived. factor_id is the id it had in the ledger.
+    """
+
+    id = models.AutoField(primary_key=True)
+    factor_id = models.IntegerField()
+    ware = models.ForeignKey(Ware, on_delete=models.CASCADE, db_index=False)
+    quantity = models.IntegerField()
+    purchase_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    created_at = models.DateTimeField()
+    type = models.CharField(max_length=10, choices=Factor.FACTOR_TYPE_CHOICES)
+    total_cost = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["ware", "created_at", "factor_id"],
+                name="archive_ware_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type.capitalize()} - {self.ware_id} ({self.quantity})"
+
+
+class CostLayer(models.Model):
+    id = models.AutoField(primary_key=True)
+    ware = models.ForeignKey(Ware, on_delete=models.CASCADE, related_name="cost_layers")
+    factor = models.OneToOneField(
+        Factor, on_delete=models.CASCADE, related_name="cost_layer"
+    )
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.IntegerField()
+    remaining_quantity = models.IntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["ware", "created_at", "id"],
+                condition=models.Q(remaining_quantity__gt=0),
+                name="costlayer_open_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ware_id} - {self.remaining_quantity}/{self.quantity} @ {self.unit_cost}"
+
+
+class FifoCursor(models.Model):
+    ware = models.OneToOneField(
+        Ware, primary_key=True, on_delete=models.CASCADE, related_name="fifo_cursor"
+    )
+    head = models.ForeignKey(
+        CostLayer,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    def __str__(self):
+        return f"{self.ware_id} -> {self.head_id}"
+
+
+class StockBalance(models.Model):
+    ware = models.OneToOneField(
+        Ware, primary_key=True, on_delete=models.CASCADE, related_name="balance"
+    )
+    quantity = models.IntegerField(default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    average_cost = models.DecimalField(max_digits=18, decimal_places=6, default=0)
+    last_factor_id = models.IntegerField(null=True, blank=True)
+    # Bumped by every write to the ware or its ledger; drives ETag and
+    # Last-Modified of the ware's resources.
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.ware_id} - {self.quantity} ({self.value})"
+
+
+class StockSnapshot(models.Model):
+    id = models.AutoField(primary_key=True)
+    ware = models.ForeignKey(Ware, on_delete=models.CASCADE, db_index=False)
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+    value = models.DecimalField(max_digits=18, decimal_places=2)
+    average_cost = models.DecimalField(max_digits=18, decimal_places=6)
+    last_factor_id = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ware", "taken_at"], name="snapshot_ware_taken_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ware_id} @ {self.taken_at} - {self.quantity} ({self.value})"
+
+
+class Change(models.Model):
+    """
+    Append-only feed of writes to wares and factors, recorded in the writing
+    transaction. Ids are the feed's cursor; a row names a factor when
+    factor_id is set and the ware otherwise.
+    """
+
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    ware_id = models.IntegerField()
+    factor_id = models.IntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        subject = f"factor {self.factor_id}" if self.factor_id else "ware"
+        return f"{self.id}: {self.ware_id} {subject} {self.action}"
+
+
+class DailyMovement(models.Model):
+    """
+    Stock moved in and out of a ware per day of factor creation, kept up to
+    date by the factor services. Opening balances are not movements.
+    """
+
+    id = models.AutoField(primary_key=True)
+    ware = models.ForeignKey(Ware, on_delete=models.CASCADE, db_index=False)
+    day = models.DateField()
+    qty_in = models.IntegerField(default=0)
+    qty_out = models.IntegerField(default=0)
+    value_in = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    cogs = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ware", "day"], name="dailymovement_ware_day_uniq"
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.type.capitalize()} - {self.ware.name} ({self.quantity})"
+        return f"{self.ware_id} @ {self.day} +{self.qty_in} -{self.qty_out}"
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+from inventory.models import Change
+
+
+def change_list(*, since: int = 0) -> QuerySet[Change]:
+    """
+    The changes after the cursor `since`, oldest first; a primary key range,
+    so tailing the feed never scans what a consumer has already read.
+
+    Writers take their ids from the table's sequence but commit in any
+    order, so a lower id can still be in flight when a higher one is
+    visible. Only changes older than CHANGE_FEED_LAG are returned, by when
+    the writers that took ids before them have committed.
+    """
+    changes = Change.objects.filter(id__gt=since).order_by("id")
+    if settings.CHANGE_FEED_LAG:
+        horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_LAG)
+        changes = changes.filter(created_at__lte=horizon)
+    return changes
@@ -1,33 +1,251 @@
-from django.db.models import QuerySet
-from inventory.models import Factor, Ware
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Max, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from inventory.models import ArchivedFactor, Factor, StockSnapshot, Ware
 
 
 def factor_detail(id: int) -> Factor:
     return Factor.objects.get(id=id)
 
 
-def factor_list() -> QuerySet[Factor]:
-    return Factor.objects.all()
+def factor_version(factor_id: int) -> QuerySet:
+    """
+    The change version of the ware a factor belongs to, shaped like
+    ware_version.
+    """
+    return Factor.objects.filter(id=factor_id, ware__balance__isnull=False).values(
+        "ware_id",
+        version=F("ware__balance__version"),
+        changed_at=F("ware__balance__changed_at"),
+    )
+
+
+def factor_list(
+    *,
+    ware_id: int = None,
+    type: str = None,
+    created_after=None,
+    created_before=None,
+) -> QuerySet[Factor]:
+    factors = Factor.objects.all()
+    if ware_id is not None:
+        factors = factors.filter(ware_id=ware_id)
+    if type is not None:
+        factors = factors.filter(type=type)
+    if created_after is not None:
+        factors = factors.filter(created_at__gte=created_after)
+    if created_before is not None:
+        factors = factors.filter(created_at__lt=created_before)
+    return factors
+
+
+EXPORT_FIELDS = [
+    "id",
+    "ware",
+    "quantity",
+    "purchase_price",
+    "created_at",
+    "type",
+    "total_cost",
+]
+
+
+def factor_export(
+    *, after: tuple | None = None, limit: int = 2000, **filters
+) -> list[tuple]:
+    """
+    The next `limit` matching factors in ledger order after the position
+    `after` = (created_at, id), as value tuples of EXPORT_FIELDS. Exports
+    read page by page, so no cursor stays open while a slow client reads.
+    """
+    factors = factor_list(**filters)
+    if after is not None:
+        created_at, id = after
+        factors = factors.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=id)
+        )
+    return list(
+        factors.order_by("created_at", "id").values_list(*EXPORT_FIELDS)[:limit]
+    )
+
+
+def ledger_totals(
+    ware_ids: list[int] = None, factors: QuerySet[Factor] = None
+) -> QuerySet:
+    """
+    Quantity on hand, inventory value and last factor id per ware, aggregated
+    by the database in one grouped query. `factors` narrows the aggregate to
+    a part of the ledger.
+    """
+    money = DecimalField(max_digits=18, decimal_places=2)
+    if factors is None:
+        factors = Factor.objects.all()
+    if ware_ids is not None:
+        factors = factors.filter(ware_id__in=ware_ids)
+    return (
+        factors.values("ware_id")
+        .order_by("ware_id")
+        .annotate(
+            quantity_in_stock=Coalesce(
+                Sum("quantity", filter=Q(type__in=["input", "opening"])), 0
+            )
+            - Coalesce(Sum("quantity", filter=Q(type="output")), 0),
+            total_inventory_value=Coalesce(
+                Sum(
+                    F("quantity") * F("purchase_price"),
+                    filter=Q(type="input"),
+                    output_field=money,
+                ),
+                Value(Decimal(0)),
+                output_field=money,
+            )
+            + Coalesce(
+                Sum("total_cost", filter=Q(type="opening"), output_field=money),
+                Value(Decimal(0)),
+                output_field=money,
+            )
+            - Coalesce(
+                Sum("total_cost", filter=Q(type="output"), output_field=money),
+                Value(Decimal(0)),
+                output_field=money,
+            ),
+            last_factor_id=Max("id"),
+        )
+    )
+
+
+def _missing_balances(wares: list[Ware]) -> set[int]:
+    return {ware.id for ware in wares if not hasattr(ware, "balance")}
+
+
+def _valuation_rows(wares: list[Ware], totals: dict) -> list[dict]:
+    result = []
+    for ware in wares:
+        if not hasattr(ware, "balance"):
+            row = totals.get(ware.id, {})
+            quantity = row.get("quantity_in_stock", 0)
+            value = row.get("total_inventory_value", Decimal(0))
+        else:
+            quantity, value = ware.balance.quantity, ware.balance.value
+        result.append(
+            {
+                "ware": ware.id,
+                "quantity_in_stock": quantity,
+                "total_inventory_value": value,
+            }
+        )
+    return result
+
+
+def valuation_list(wares: list[Ware]) -> list[dict]:
+    """
+    Valuation of the given wares, which must be loaded with
+    select_related("balance"). Wares without a balance row are aggregated from
+    the ledger together in one grouped query.
+    """
+    missing = _missing_balances(wares)
+    totals = {row["ware_id"]: row for row in ledger_totals(missing)} if missing else {}
+    return _valuation_rows(wares, totals)
+
+
+async def avaluation_list(wares: list[Ware]) -> list[dict]:
+    missing = _missing_balances(wares)
+    totals = (
+        {row["ware_id"]: row async for row in ledger_totals(missing)} if missing else {}
+    )
+    return _valuation_rows(wares, totals)
 
 
 def valuation_stock(ware_id: int):
-    ware = Ware.objects.get(id=ware_id)
-    factors = Factor.objects.filter(ware=ware)
+    ware = Ware.objects.select_related("balance").get(id=ware_id)
+    return valuation_list([ware])[0]
+
+
+async def avaluation_stock(ware_id: int):
+    ware = await Ware.objects.select_related("balance").aget(id=ware_id)
+    return (await avaluation_list([ware]))[0]
+
+
+def _archived_after(ware: Ware, as_of) -> QuerySet:
+    return ArchivedFactor.objects.filter(ware=ware, created_at__gt=as_of)
+
+
+def _as_of_snapshots(ware: Ware, as_of) -> tuple[QuerySet, QuerySet]:
+    snapshots = StockSnapshot.objects.filter(ware=ware)
+    return (
+        snapshots.filter(taken_at__lte=as_of).order_by("-taken_at"),
+        snapshots.filter(taken_at__gt=as_of).order_by("taken_at"),
+    )
 
-    total_quantity = 0
-    total_value = 0
 
-    for factor in factors:
-        if factor.type == "input":
-            total_quantity += factor.quantity
-            total_value += factor.quantity * factor.purchase_price
-        elif factor.type == "output":
-            total_quantity -= factor.quantity
-            total_value -= factor.quantity * factor.purchase_price
+def _live_snapshot(ware: Ware, current: dict) -> StockSnapshot:
+    balance = getattr(ware, "balance", None)
+    return StockSnapshot(
+        ware=ware,
+        taken_at=timezone.now(),
+        quantity=current["quantity_in_stock"],
+        value=current["total_inventory_value"],
+        last_factor_id=balance.last_factor_id if balance else None,
+    )
 
-    result = {
+
+def _as_of_delta(
+    ware: Ware, as_of, before, after
+) -> tuple[QuerySet, StockSnapshot, int]:
+    """
+    Picks the snapshot nearer to `as_of` and returns the aggregate of the
+    factors between it and `as_of`, the snapshot, and the sign to apply.
+    """
+    if before is not None and as_of - before.taken_at <= after.taken_at - as_of:
+        # Factors committed after the snapshot carry larger ids, but may have
+        # been stamped slightly before it, so the boundary is the id.
+        delta = Factor.objects.filter(
+            ware=ware, id__gt=before.last_factor_id or 0, created_at__lte=as_of
+        )
+        return ledger_totals(factors=delta), before, 1
+    delta = Factor.objects.filter(
+        ware=ware, created_at__gt=as_of, created_at__lte=after.taken_at
+    )
+    if after.last_factor_id is not None:
+        delta = delta.filter(id__lte=after.last_factor_id)
+    return ledger_totals(factors=delta), after, -1
+
+
+def _as_of_row(ware_id: int, base: StockSnapshot, sign: int, totals: dict) -> dict:
+    return {
         "ware": ware_id,
-        "quantity_in_stock": total_quantity,
-        "total_inventory_value": total_value,
+        "quantity_in_stock": base.quantity + sign * totals.get("quantity_in_stock", 0),
+        "total_inventory_value": base.value
+        + sign * totals.get("total_inventory_value", Decimal(0)),
     }
-    return result
+
+
+def valuation_as_of(ware_id: int, as_of):
+    """
+    Valuation of the ware at `as_of`, starting from the nearest snapshot (or
+    the live balance) and replaying only the factors between the two. Raises
+    ValueError when compact_ledger archived factors from after `as_of`.
+    """
+    ware = Ware.objects.select_related("balance").get(id=ware_id)
+    if _archived_after(ware, as_of).exists():
+        raise ValueError("The ledger before as_of has been compacted.")
+    before, after = _as_of_snapshots(ware, as_of)
+    before, after = before.first(), after.first()
+    if after is None:
+        after = _live_snapshot(ware, valuation_list([ware])[0])
+    totals, base, sign = _as_of_delta(ware, as_of, before, after)
+    return _as_of_row(ware_id, base, sign, totals.first() or {})
+
+
+async def avaluation_as_of(ware_id: int, as_of):
+    ware = await Ware.objects.select_related("balance").aget(id=ware_id)
+    if await _archived_after(ware, as_of).aexists():
+        raise ValueError("The ledger before as_of has been compacted.")
+    before, after = _as_of_snapshots(ware, as_of)
+    before, after = await before.afirst(), await after.afirst()
+    if after is None:
+        after = _live_snapshot(ware, (await avaluation_list([ware]))[0])
+    totals, base, sign = _as_of_delta(ware, as_of, before, after)
+    return _as_of_row(ware_id, base, sign, await totals.afirst() or {})
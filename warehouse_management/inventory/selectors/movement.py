@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.db.models import F, QuerySet, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from inventory.models import DailyMovement
+
+# Expression of the period a daily row falls into, per report bucket.
+BUCKETS = {"day": F, "week": TruncWeek, "month": TruncMonth}
+
+
+def movement_report(
+    *, ware_id: int, since: date, until: date, bucket: str = "day"
+) -> QuerySet:
+    """
+    In and out quantities, purchase value and cost of goods sold of the ware
+    per day, week or month from `since` to `until`, inclusive. Only the daily
+    rollups are read, so a year is at most 366 rows whatever the volume.
+    """
+    return (
+        DailyMovement.objects.filter(ware_id=ware_id, day__gte=since, day__lte=until)
+        .annotate(period=BUCKETS[bucket]("day"))
+        .values("period")
+        .order_by("period")
+        .annotate(
+            qty_in=Sum("qty_in"),
+            qty_out=Sum("qty_out"),
+            value_in=Sum("value_in"),
+            cogs=Sum("cogs"),
+        )
+    )
@@ -1,10 +1,30 @@
 from django.db.models import QuerySet
-from inventory.models import Ware
+from inventory.models import StockBalance, Ware
 
 
 def ware_detail(id: int) -> Ware:
     return Ware.objects.get(id=id)
 
 
-def ware_list() -> QuerySet[Ware]:
-    return Ware.objects.all()
+def ware_version(ware_id: int) -> QuerySet:
+    """
+    The change version of a ware as a one-row values() query of ware_id,
+    version and changed_at; empty for unknown wares.
+    """
+    return StockBalance.objects.filter(ware_id=ware_id).values(
+        "ware_id", "version", "changed_at"
+    )
+
+
+def ware_list(*, cost_method: str = None) -> QuerySet[Ware]:
+    wares = Ware.objects.all()
+    if cost_method is not None:
+        wares = wares.filter(cost_method=cost_method)
+    return wares
+
+
+def ware_valuation_list(*, ware_ids: list[int] = None) -> QuerySet[Ware]:
+    wares = Ware.objects.select_related("balance")
+    if ware_ids is not None:
+        wares = wares.filter(id__in=ware_ids)
+    return wares
@@ -0,0 +1,115 @@
+from decimal import Decimal
+
+from django.db.models import Max
+from django.utils import timezone
+
+from inventory.models import Factor, StockBalance, Ware
+from inventory.selectors.factor import ledger_totals
+
+AVERAGE_COST_PLACES = Decimal("0.000001")
+
+
+def factor_delta(*, factor: Factor) -> tuple[int, Decimal]:
+    """
+    Returns the (quantity, value) a factor adds to the stock of its ware.
+    """
+    if factor.type == "input":
+        return factor.quantity, factor.quantity * Decimal(factor.purchase_price or 0)
+    if factor.type == "output":
+        return -factor.quantity, -Decimal(factor.total_cost or 0)
+    if factor.type == "opening":
+        return factor.quantity, Decimal(factor.total_cost or 0)
+    return 0, Decimal(0)
+
+
+def balance_from_ledger(*, ware_id: int) -> StockBalance:
+    totals = ledger_totals([ware_id]).first() or {}
+    balance = StockBalance(
+        ware_id=ware_id,
+        quantity=totals.get("quantity_in_stock", 0),
+        value=totals.get("total_inventory_value", Decimal(0)),
+        last_factor_id=totals.get("last_factor_id"),
+    )
+    if balance.quantity > 0:
+        balance.average_cost = (balance.value / balance.quantity).quantize(
+            AVERAGE_COST_PLACES
+        )
+    return balance
+
+
+def lock_balance(*, ware: Ware) -> StockBalance:
+    """
+    Returns the locked balance row of the ware, seeding it from the ledger
+    when the ware has none yet.
+    """
+    balance = StockBalance.objects.select_for_update().filter(ware=ware).first()
+    if balance is None:
+        balance = balance_from_ledger(ware_id=ware.id)
+        balance.save(force_insert=True)
+    return balance
+
+
+def lock_balances(*, ware_ids: list[int]) -> dict[int, StockBalance]:
+    """
+    Locks the balance rows of many wares in ware id order, so concurrent
+    batches over overlapping wares can not deadlock each other.
+    """
+    balances = {
+        balance.ware_id: balance
+        for balance in StockBalance.objects.select_for_update()
+        .filter(ware_id__in=ware_ids)
+        .order_by("ware_id")
+    }
+    for ware_id in set(ware_ids) - balances.keys():
+        balance = balance_from_ledger(ware_id=ware_id)
+        balance.save(force_insert=True)
+        balances[ware_id] = balance
+    return balances
+
+
+def apply_delta(*, balance: StockBalance, quantity: int, value: Decimal):
+    balance.quantity += quantity
+    balance.value += value
+    if balance.quantity > 0:
+        balance.average_cost = (balance.value / balance.quantity).quantize(
+            AVERAGE_COST_PLACES
+        )
+    else:
+        balance.average_cost = Decimal(0)
+
+
+def touch(*, balance: StockBalance):
+    """
+    Marks the ware of the balance as changed, so conditional GETs on its
+    resources stop matching.
+    """
+    balance.version += 1
+    balance.changed_at = timezone.now()
+
+
+def apply_factor(
+    *, balance: StockBalance, factor: Factor, sign: int = 1, save: bool = True
+):
+    quantity, value = factor_delta(factor=factor)
+    apply_delta(balance=balance, quantity=sign * quantity, value=sign * value)
+    if sign > 0:
+        balance.last_factor_id = max(balance.last_factor_id or 0, factor.id)
+    elif balance.last_factor_id == factor.id:
+        balance.last_factor_id = (
+            Factor.objects.filter(ware_id=balance.ware_id)
+            .exclude(id=factor.id)
+            .aggregate(last=Max("id"))["last"]
+        )
+    touch(balance=balance)
+    if save:
+        balance.save()
+
+
+def weighted_cost(*, balance: StockBalance, quantity: int) -> Decimal:
+    """
+    Cost of taking `quantity` units at the current moving average of the ware.
+    Emptying the stock takes exactly the remaining value so no rounding is left.
+    """
+    if quantity >= balance.quantity:
+        return Decimal(balance.value)
+    return (quantity * balance.average_cost).quantize(Decimal("0.01"))
@@ -0,0 +1,20 @@
+from typing import Iterable
+
+from inventory.models import Change
+
+
+def record_changes(*, action: str, changes: Iterable[tuple[int, int | None]]):
+    """
+    Appends (ware_id, factor_id) pairs to the change feed, where a factor_id
+    of None stands for the ware itself. Call it inside the writing
+    transaction so the feed never shows a write that was rolled back, and
+    as late in it as possible: the feed holds back changes younger than
+    CHANGE_FEED_LAG, and a writer has to commit within it.
+    """
+    changes = [
+        Change(ware_id=ware_id, factor_id=factor_id, action=action)
+        for ware_id, factor_id in changes
+    ]
+    if not changes:
+        return
+    Change.objects.bulk_create(changes, batch_size=1000)
@@ -0,0 +1,163 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+
+from common.db import retry_on_lock
+
+from inventory import cost_methods
+from inventory.models import (
+    ArchivedFactor,
+    CostLayer,
+    Factor,
+    FifoCursor,
+    StockSnapshot,
+    Ware,
+)
+from inventory.selectors.factor import ledger_totals
+from inventory.services.balance import lock_balance, touch
+from inventory.services.change import record_changes
+from inventory.signals import send_stock_changed
+
+# Factor.total_cost holds 10 digits, 2 of them decimal places.
+MAX_TOTAL_COST = Decimal("99999999.99")
+
+
+def _openings(
+    *, ware: Ware, before: datetime, totals: dict
+) -> tuple[list[Factor], list[CostLayer]]:
+    """
+    The opening-balance rows that stand in for the factors of the ware
+    created before `before`. A ware with cost layers gets one per layer
+    still open at that point, reusing the id of the input behind the layer so the layer
+    stays attached; any other ware gets a single row, reusing the id of the
+    newest archived factor. Also returns the kept layers, sized to what was
+    left of them at `before`.
+    """
+    quantity = totals["quantity_in_stock"]
+    value = totals["total_inventory_value"]
+    layers = []
+    method = cost_methods.get(ware.cost_method)
+    if method.layered:
+        layers = list(
+            method.state_before(ware=ware, since=(before, 0), quantity=quantity)
+        )
+        openings = [
+            Factor(
+                id=layer.factor_id,
+                quantity=layer.remaining_quantity,
+                purchase_price=layer.unit_cost,
+                total_cost=layer.remaining_quantity * layer.unit_cost,
+            )
+            for layer in layers
+        ]
+        if sum(opening.quantity for opening in openings) != quantity or sum(
+            opening.total_cost for opening in openings
+        ) != Decimal(value):
+            raise ValueError(
+                "Cost layers disagree with the ledger; run recompute_costs first."
+            )
+    elif quantity or value:
+        openings = [
+            Factor(
+                id=totals["last_factor_id"],
+                quantity=quantity,
+                purchase_price=(
+                    (value / quantity).quantize(Decimal("0.01")) if quantity else 0
+                ),
+                total_cost=value,
+            )
+        ]
+    else:
+        openings = []
+
+    for opening in openings:
+        if abs(opening.total_cost) > MAX_TOTAL_COST:
+            raise ValueError("Opening balance is too large for a factor.")
+        opening.ware = ware
+        opening.type = "opening"
+    for layer in layers:
+        layer.quantity = layer.remaining_quantity
+    return openings, layers
+
+
+@retry_on_lock
+@transaction.atomic
+def compact_ledger(*, ware: Ware, before: datetime, batch_size: int = 2000) -> int:
+    """
+    Moves the factors of the ware created before `before` to ArchivedFactor
+    and folds them into opening-balance factors, returning how many were
+    archived.
+
+    The openings carry exactly the quantity and value of what they replace,
+    and the cost layers they keep are the ones still open at `before`, so
+    balances, valuations, the costs of later outputs and re-costing from
+    any later point come out the same. Valuations as of a time before the
+    newest archived factor are refused from then on.
+    """
+    balance = lock_balance(ware=ware)
+    archived = Factor.objects.filter(ware=ware, created_at__lt=before)
+    totals = ledger_totals(factors=archived).first()
+    if totals is None:
+        return 0
+    openings, layers = _openings(ware=ware, before=before, totals=totals)
+    opening_ids = [opening.id for opening in openings]
+
+    archived_ids = []
+    rows = []
+    for factor in archived.order_by("created_at", "id").iterator(chunk_size=batch_size):
+        archived_ids.append(factor.id)
+        rows.append(
+            ArchivedFactor(
+                factor_id=factor.id,
+                ware_id=factor.ware_id,
+                quantity=factor.quantity,
+                purchase_price=factor.purchase_price,
+                created_at=factor.created_at,
+                type=factor.type,
+                total_cost=factor.total_cost,
+            )
+        )
+        if len(rows) == batch_size:
+            ArchivedFactor.objects.bulk_create(rows)
+            rows = []
+    ArchivedFactor.objects.bulk_create(rows)
+
+    # The openings take over the rows they reuse, so their layers are kept;
+    # the layers of every other archived input were closed at `before`.
+    Factor.objects.bulk_update(
+        openings, ["type", "quantity", "purchase_price", "total_cost"]
+    )
+    CostLayer.objects.bulk_update(layers, ["quantity"], batch_size=1000)
+    CostLayer.objects.filter(ware=ware, factor__in=archived).exclude(
+        factor_id__in=opening_ids
+    ).delete()
+    archived.exclude(id__in=opening_ids).delete()
+    if cost_methods.get(ware.cost_method).layered:
+        FifoCursor.objects.update_or_create(
+            ware=ware,
+            defaults={
+                "head": CostLayer.objects.filter(ware=ware, remaining_quantity__gt=0)
+                .order_by("created_at", "id")
+                .first()
+            },
+        )
+
+    # Older snapshots count archived factors by id, which the openings reuse.
+    StockSnapshot.objects.filter(ware=ware, taken_at__lt=before).delete()
+
+    last = Factor.objects.filter(ware=ware).aggregate(last=Max("id"))
+    balance.last_factor_id = last["last"]
+    touch(balance=balance)
+    balance.save()
+    # Mirrors of the ledger see the archived rows go and the reused ones
+    # turn into openings.
+    kept = set(opening_ids)
+    record_changes(
+        action="deleted",
+        changes=[(ware.id, id) for id in archived_ids if id not in kept],
+    )
+    record_changes(action="updated", changes=[(ware.id, id) for id in opening_ids])
+    send_stock_changed(ware_ids=[ware.id], factor_ids=archived_ids)
+    return len(archived_ids)
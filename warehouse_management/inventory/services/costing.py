@@ -0,0 +1,157 @@
+import bisect
+from copy import copy
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+
+from inventory import cost_methods
+from inventory.models import CostLayer, Factor, FifoCursor, StockSnapshot, Ware
+from inventory.selectors.factor import ledger_totals
+from inventory.services.balance import (
+    AVERAGE_COST_PLACES,
+    apply_delta,
+    factor_delta,
+    lock_balance,
+    touch,
+)
+from inventory.services.change import record_changes
+from inventory.services.layers import before, drop_cost_layers
+from inventory.services.movement import apply_movements
+from inventory.signals import send_stock_changed
+
+
+def _shift_snapshots(*, ware: Ware, changes: list[tuple[int, Decimal]]):
+    """
+    Adds the value deltas of re-costed outputs, given as sorted (factor id,
+    delta) pairs, to the snapshots of the ware that include them.
+    """
+    ids = [id for id, _ in changes]
+    running = Decimal(0)
+    totals = []
+    for _, delta in changes:
+        running += delta
+        totals.append(running)
+
+    snapshots = list(
+        StockSnapshot.objects.filter(ware=ware, last_factor_id__gte=ids[0])
+    )
+    for snapshot in snapshots:
+        snapshot.value += totals[bisect.bisect_right(ids, snapshot.last_factor_id) - 1]
+        snapshot.average_cost = (
+            (snapshot.value / snapshot.quantity).quantize(AVERAGE_COST_PLACES)
+            if snapshot.quantity > 0
+            else Decimal(0)
+        )
+    StockSnapshot.objects.bulk_update(
+        snapshots, ["value", "average_cost"], batch_size=1000
+    )
+
+
+@transaction.atomic
+def recompute_costs(
+    *,
+    ware: Ware,
+    since: tuple[datetime, int] = None,
+    strict: bool = True,
+) -> int:
+    """
+    Re-costs the outputs of the ware from the ledger position
+    `since` = (created_at, id) onwards and rewrites its balance, cost layers
+    and snapshots to match, returning how many outputs changed cost. Only the
+    state at `since` is read from before that point, so editing a recent
+    factor stays cheap however long the ledger is. Without `since` the whole
+    ledger is replayed. How the state at `since` is found is up to the cost
+    method of the ware; LIFO has to replay the ledger up to that point.
+
+    With `strict`, an output that the edited
+    history can no longer cover raises "Insufficient Stock."; otherwise it is
+    costed with whatever stock was left.
+    """
+    balance = lock_balance(ware=ware)
+    factors = Factor.objects.filter(ware=ware)
+    totals = {}
+    if since is not None:
+        totals = ledger_totals(factors=factors.filter(before(since))).first() or {}
+        factors = factors.exclude(before(since))
+
+    balance.quantity, balance.value = 0, Decimal(0)
+    apply_delta(
+        balance=balance,
+        quantity=totals.get("quantity_in_stock", 0),
+        value=totals.get("total_inventory_value", Decimal(0)),
+    )
+    balance.last_factor_id = totals.get("last_factor_id")
+
+    method = cost_methods.get(ware.cost_method)
+    state = method.state_before(ware=ware, since=since, quantity=balance.quantity)
+    kept = list(state) if method.layered else []
+
+    created = []
+    recosted = []
+    previous = []
+    changes = []
+    for factor in factors.order_by("created_at", "id").iterator(chunk_size=2000):
+        if factor.type == "output":
+            if strict and factor.quantity > balance.quantity:
+                raise ValueError("Insufficient Stock.")
+            total_cost = method.cost(
+                state=state,
+                balance=balance,
+                quantity=factor.quantity,
+                at=factor.created_at,
+            )
+            if total_cost != factor.total_cost:
+                changes.append(
+                    (factor.id, Decimal(factor.total_cost or 0) - total_cost)
+                )
+                previous.append(copy(factor))
+                factor.total_cost = total_cost
+                recosted.append(factor)
+        elif factor.type in ("input", "opening") and method.layered:
+            layer = CostLayer(
+                ware=ware,
+                factor=factor,
+                unit_cost=factor.purchase_price or 0,
+                quantity=factor.quantity,
+                remaining_quantity=factor.quantity,
+                created_at=factor.created_at,
+            )
+            created.append(layer)
+            method.receive(state=state, layer=layer)
+        quantity, value = factor_delta(factor=factor)
+        apply_delta(balance=balance, quantity=quantity, value=value)
+        balance.last_factor_id = max(balance.last_factor_id or 0, factor.id)
+
+    Factor.objects.bulk_update(recosted, ["total_cost"], batch_size=1000)
+    apply_movements(factors=previous, sign=-1)
+    apply_movements(factors=recosted)
+    if changes:
+        _shift_snapshots(ware=ware, changes=sorted(changes))
+    touch(balance=balance)
+    balance.save()
+
+    if method.layered:
+        layers = CostLayer.objects.filter(ware=ware)
+        if since is None:
+            layers.delete()
+        else:
+            layers.exclude(before(since, "factor_id")).delete()
+            layers.filter(before(since, "factor_id"), remaining_quantity__gt=0).exclude(
+                id__in=[layer.id for layer in kept]
+            ).update(remaining_quantity=0)
+            CostLayer.objects.bulk_update(kept, ["remaining_quantity"], batch_size=1000)
+        CostLayer.objects.bulk_create(created, batch_size=1000)
+        FifoCursor.objects.update_or_create(
+            ware=ware, defaults={"head": state[0] if state else None}
+        )
+    elif since is None:
+        # Left over from a layered method the ware switched from.
+        drop_cost_layers(ware=ware)
+    record_changes(
+        action="updated", changes=[(ware.id, factor.id) for factor in recosted]
+    )
+    send_stock_changed(
+        ware_ids=[ware.id], factor_ids=[factor.id for factor in recosted]
+    )
+    return len(recosted)
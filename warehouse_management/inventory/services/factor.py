@@ -1,35 +1,118 @@
+from copy import copy
 from django.db import transaction
 from decimal import Decimal
 
-from inventory.models import Factor, Ware
+from django.utils import timezone
 
+from common.db import retry_on_lock
 
+from inventory import cost_methods
+from inventory.models import Factor, StockBalance, Ware
+from inventory.signals import send_stock_changed
+from inventory.services.balance import (
+    apply_delta,
+    apply_factor,
+    lock_balance,
+    lock_balances,
+    touch,
+)
+from inventory.services.change import record_changes
+from inventory.services.costing import recompute_costs
+from inventory.services.movement import apply_movements
+from inventory.services.snapshot import shift_snapshots
+from inventory.services.layers import push_cost_layer, push_cost_layers
+
+# Outputs are re-costed from the ledger after every edit, which would
+# overwrite a given cost.
+OUTPUT_COST_ERROR = "The cost of an output is computed from the ledger."
+
+BALANCE_FIELDS = [
+    "quantity",
+    "value",
+    "average_cost",
+    "last_factor_id",
+    "version",
+    "changed_at",
+]
+
+
+@retry_on_lock
 @transaction.atomic
 def create_input(*, ware_id: int, quantity: int, purchase_price: Decimal) -> Factor:
     ware = Ware.objects.get(id=ware_id)
+    balance = lock_balance(ware=ware)
     input_ware = Factor.objects.create(
         ware=ware, quantity=quantity, purchase_price=purchase_price, type="input"
     )
+    if cost_methods.get(ware.cost_method).layered:
+        push_cost_layer(factor=input_ware)
+    apply_factor(balance=balance, factor=input_ware)
+    apply_movements(factors=[input_ware])
+    record_changes(action="created", changes=[(ware.id, input_ware.id)])
+    send_stock_changed(ware_ids=[ware.id])
     return input_ware
 
 
+@retry_on_lock
 @transaction.atomic
-def create_output(*, ware_id: int, quantity: int) -> Factor:
+def create_inputs(*, lines: list[dict]) -> list[tuple[Factor | None, str | None]]:
+    """
+    Restocks many lines at once. Every line is a dict with ware_id, quantity
+    and purchase_price; the result holds a (factor, error) pair per line, in
+    order, where lines for unknown wares get an error and no factor.
+    """
+    wares = Ware.objects.in_bulk({line["ware_id"] for line in lines})
+    balances = lock_balances(ware_ids=list(wares))
 
-    ware = Ware.objects.get(id=ware_id)
+    factors = Factor.objects.bulk_create(
+        [
+            Factor(
+                ware=wares[line["ware_id"]],
+                quantity=line["quantity"],
+                purchase_price=line["purchase_price"],
+                type="input",
+            )
+            for line in lines
+            if line["ware_id"] in wares
+        ]
+    )
 
-    factors = Factor.objects.filter(type="input").filter(ware=ware)
-    available = 0
+    layered = [
+        factor
+        for factor in factors
+        if cost_methods.get(factor.ware.cost_method).layered
+    ]
+    if layered:
+        push_cost_layers(factors=layered)
     for factor in factors:
-        available += factor.quantity
+        apply_factor(balance=balances[factor.ware_id], factor=factor, save=False)
+    StockBalance.objects.bulk_update(balances.values(), BALANCE_FIELDS)
+    apply_movements(factors=factors)
+    record_changes(
+        action="created", changes=[(factor.ware_id, factor.id) for factor in factors]
+    )
+    send_stock_changed(ware_ids={factor.ware_id for factor in factors})
+
+    created = iter(factors)
+    return [
+        (next(created), None) if line["ware_id"] in wares else (None, "Ware not found.")
+        for line in lines
+    ]
 
-    if available < quantity:
+
+@retry_on_lock
+@transaction.atomic
+def create_output(*, ware_id: int, quantity: int) -> Factor:
+
+    ware = Ware.objects.get(id=ware_id)
+    balance = lock_balance(ware=ware)
+
+    if balance.quantity < quantity:
         raise ValueError("Insufficient Stock.")
 
-    if ware.cost_method == "fifo":
-        total_cost = calculate_total_cost_fifo(ware_id=ware_id, quantity=quantity)
-    else:
-        total_cost = calculate_total_cost_weighted(ware_id=ware_id, quantity=quantity)
+    total_cost = cost_methods.get(ware.cost_method).cost_one(
+        ware=ware, balance=balance, quantity=quantity
+    )
 
     output_ware = Factor.objects.create(
         ware=ware,
@@ -38,23 +121,131 @@ def create_output(*, ware_id: int, quantity: int) -> Factor:
         total_cost=total_cost,
         purchase_price=0,
     )
+    apply_factor(balance=balance, factor=output_ware)
+    apply_movements(factors=[output_ware])
+    record_changes(action="created", changes=[(ware.id, output_ware.id)])
+    send_stock_changed(ware_ids=[ware.id])
     return output_ware
 
 
+@retry_on_lock
+@transaction.atomic
+def create_outputs(
+    *, lines: list[dict], partial: bool = False
+) -> list[tuple[Factor | None, str | None]]:
+    """
+    Fulfills many lines at once. Every line is a dict with ware_id and
+    quantity; the stock state of all affected wares is locked and loaded up
+    front, costs are allocated in memory in line order and the outputs are
+    written with one bulk_create.
+
+    The result holds a (factor, error) pair per line. Unless `partial` is
+    set, a single failing line leaves every line without a factor and
+    nothing is written.
+    """
+    wares = Ware.objects.in_bulk({line["ware_id"] for line in lines})
+    balances = lock_balances(ware_ids=list(wares))
+    by_method = {}
+    for ware in wares.values():
+        by_method.setdefault(ware.cost_method, []).append(ware)
+    methods = {name: cost_methods.get(name) for name in by_method}
+    states = {
+        name: methods[name].load(wares=method_wares)
+        for name, method_wares in by_method.items()
+    }
+    now = timezone.now()
+
+    outputs = []
+    errors = []
+    for line in lines:
+        ware = wares.get(line["ware_id"])
+        if ware is None:
+            outputs.append(None)
+            errors.append("Ware not found.")
+            continue
+        balance = balances[ware.id]
+        method = methods[ware.cost_method]
+        state = states[ware.cost_method][ware.id]
+        # Layers that hold less than the balance would cost the line short;
+        # a single output refuses them in consume_cost_layers.
+        if balance.quantity < line["quantity"] or (
+            method.layered
+            and sum(layer.remaining_quantity for layer in state) < line["quantity"]
+        ):
+            outputs.append(None)
+            errors.append("Insufficient Stock.")
+            continue
+
+        total_cost = method.cost(
+            state=state,
+            balance=balance,
+            quantity=line["quantity"],
+            at=now,
+        )
+        apply_delta(balance=balance, quantity=-line["quantity"], value=-total_cost)
+        outputs.append(
+            Factor(
+                ware=ware,
+                quantity=line["quantity"],
+                type="output",
+                total_cost=total_cost,
+                purchase_price=0,
+            )
+        )
+        errors.append(None)
+
+    if not partial and any(errors):
+        return [(None, error) for error in errors]
+
+    created = Factor.objects.bulk_create([output for output in outputs if output])
+    for factor in created:
+        balance = balances[factor.ware_id]
+        balance.last_factor_id = max(balance.last_factor_id or 0, factor.id)
+        touch(balance=balance)
+    StockBalance.objects.bulk_update(balances.values(), BALANCE_FIELDS)
+    for name, method in methods.items():
+        method.save(states=states[name])
+    apply_movements(factors=created)
+    record_changes(
+        action="created", changes=[(factor.ware_id, factor.id) for factor in created]
+    )
+    send_stock_changed(ware_ids={factor.ware_id for factor in created})
+
+    return list(zip(outputs, errors))
+
+
+@retry_on_lock
 @transaction.atomic
 def create_factor(
     *, ware_id: int, quantity: int, purchase_price: Decimal, type: str, total_cost: str
-):
+) -> Factor:
+    if type == "opening":
+        raise ValueError("Opening balances can not be edited.")
     ware = Ware.objects.get(id=ware_id)
-    Factor.objects.create(
+    balance = lock_balance(ware=ware)
+    factor = Factor.objects.create(
         ware=ware,
         quantity=quantity,
         purchase_price=purchase_price,
         type=type,
         total_cost=total_cost,
     )
+    method = cost_methods.get(ware.cost_method)
+    if method.layered:
+        if type == "input":
+            push_cost_layer(factor=factor)
+        elif type == "output":
+            # The cost is given, but the units still leave the layers.
+            method.cost_one(ware=ware, balance=balance, quantity=quantity)
+    apply_factor(balance=balance, factor=factor)
+    apply_movements(factors=[factor])
+    record_changes(action="created", changes=[(ware.id, factor.id)])
+    send_stock_changed(ware_ids=[ware.id])
+    return factor
 
 
+@retry_on_lock
+@transaction.atomic
 def update_factor(
     id: int,
     ware_id: int = None,
@@ -63,10 +254,18 @@ def update_factor(
     type: str = None,
     total_cost: str = None,
 ):
-    factor = Factor.objects.get(id=id)
+    factor = Factor.objects.select_related("ware").get(id=id)
+    if "opening" in (factor.type, type):
+        raise ValueError("Opening balances can not be edited.")
+    if total_cost is not None and (type or factor.type) == "output":
+        raise ValueError(OUTPUT_COST_ERROR)
+    old_factor = copy(factor)
+    old_ware = factor.ware
+    lock_balance(ware=old_ware)
     if ware_id is not None:
-        ware = Ware.objects.get(id=ware_id)
-        factor.ware = ware
+        factor.ware = Ware.objects.get(id=ware_id)
+    if factor.ware_id != old_ware.id:
+        lock_balance(ware=factor.ware)
     if quantity is not None:
         factor.quantity = quantity
     if purchase_price is not None:
@@ -78,40 +277,30 @@ def update_factor(
 
     factor.save()
 
-
-def delete_factor(id: int):
-    Factor.objects.filter(id=id).delete()
+    shift_snapshots(factor=old_factor, sign=-1)
+    shift_snapshots(factor=factor)
+    apply_movements(factors=[old_factor], sign=-1)
+    apply_movements(factors=[factor])
+    # Every later output of the affected wares may cost differently now. The
+    # old ware goes first so a moved input releases its cost layer there.
+    for ware in dict.fromkeys([old_ware, factor.ware]):
+        recompute_costs(ware=ware, since=(factor.created_at, factor.id))
+    record_changes(action="updated", changes=[(factor.ware_id, id)])
+    send_stock_changed(ware_ids={old_ware.id, factor.ware_id}, factor_ids=[id])
 
 
-def calculate_total_cost_fifo(*, ware_id: int, quantity: int) -> Decimal:
-    ware = Ware.objects.get(id=ware_id)
-    factors = (
-        Factor.objects.filter(type="input").filter(ware=ware).order_by("created_at")
-    )
-
-    total_cost = Decimal(0)
-
-    for factor in factors:
-        factor_quantity = factor.quantity
-        while factor_quantity > 0:
-            if quantity == 0:
-                return total_cost
-            quantity -= 1
-            factor_quantity -= 1
-            total_cost += factor.purchase_price
-
-    return total_cost
-
-
-def calculate_total_cost_weighted(*, ware_id: int, quantity: int) -> Decimal:
-    ware = Ware.objects.get(id=ware_id)
-    factors = Factor.objects.filter(type="input").filter(ware=ware)
-    if factors.count() == 0:
-        raise ValueError("No factor for this item.")
-    total_quantity = 0
-    total_cost = 0
-    for factor in factors:
-        total_cost += factor.purchase_price * factor.quantity
-        total_quantity += factor.quantity
-    price_per_each = total_cost / total_quantity
-    return quantity * price_per_each
+@retry_on_lock
+@transaction.atomic
+def delete_factor(id: int):
+    factor = Factor.objects.select_related("ware").filter(id=id).first()
+    if factor is None:
+        return
+    if factor.type == "opening":
+        raise ValueError("Opening balances can not be edited.")
+    lock_balance(ware=factor.ware)
+    shift_snapshots(factor=factor, sign=-1)
+    apply_movements(factors=[factor], sign=-1)
+    factor.delete()
+    recompute_costs(ware=factor.ware, since=(factor.created_at, id))
+    record_changes(action="deleted", changes=[(factor.ware_id, id)])
+    send_stock_changed(ware_ids=[factor.ware_id], factor_ids=[id])
@@ -0,0 +1,277 @@
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+
+from inventory.models import CostLayer, Factor, FifoCursor, Ware
+
+
+class OpenLayers(deque):
+    """
+    The open layers of a ware in FIFO order, as loaded by lock_open_layers.
+    `loaded` keeps every layer that was loaded, including the ones emptied
+    and dropped from the queue since, so all of them can be written back.
+    """
+
+    def __init__(self, layers=()):
+        super().__init__(layers)
+        self.loaded = list(self)
+
+
+def before(since: tuple[datetime, int], id_field: str = "id") -> Q:
+    """
+    Rows before the ledger position `since` = (created_at, id).
+    """
+    created_at, id = since
+    return Q(created_at__lt=created_at) | Q(
+        created_at=created_at, **{f"{id_field}__lt": id}
+    )
+
+
+def _after_layer(layer: CostLayer) -> Q:
+    return Q(created_at__gt=layer.created_at) | Q(
+        created_at=layer.created_at, id__gte=layer.id
+    )
+
+
+def push_cost_layer(*, factor: Factor) -> CostLayer:
+    return push_cost_layers(factors=[factor])[0]
+
+
+def push_cost_layers(*, factors: list[Factor]) -> list[CostLayer]:
+    layers = CostLayer.objects.bulk_create(
+        [
+            CostLayer(
+                ware_id=factor.ware_id,
+                factor=factor,
+                unit_cost=factor.purchase_price or 0,
+                quantity=factor.quantity,
+                remaining_quantity=factor.quantity,
+                created_at=factor.created_at,
+            )
+            for factor in factors
+        ]
+    )
+
+    ware_ids = {layer.ware_id for layer in layers}
+    cursors = (
+        FifoCursor.objects.select_for_update().select_related("head").in_bulk(ware_ids)
+    )
+    for layer in layers:
+        cursor = cursors.get(layer.ware_id)
+        if cursor is None:
+            cursor = cursors[layer.ware_id] = FifoCursor.objects.create(
+                ware_id=layer.ware_id, head=layer
+            )
+        head = cursor.head
+        if head is None or (layer.created_at, layer.id) < (head.created_at, head.id):
+            cursor.head = layer
+            cursor.save(update_fields=["head"])
+    return layers
+
+
+def consume_cost_layers(*, ware: Ware, quantity: int) -> Decimal:
+    """
+    Takes `quantity` units from the oldest open layers of the ware and returns
+    their cost. Only the layers that are actually touched are read and written.
+    """
+    cursor, _ = FifoCursor.objects.select_for_update().get_or_create(ware=ware)
+    layers = CostLayer.objects.filter(ware=ware, remaining_quantity__gt=0).order_by(
+        "created_at", "id"
+    )
+    if cursor.head is not None:
+        layers = layers.filter(_after_layer(cursor.head))
+
+    total_cost = Decimal(0)
+    touched = []
+    for layer in layers.iterator(chunk_size=100):
+        taken = min(quantity, layer.remaining_quantity)
+        layer.remaining_quantity -= taken
+        quantity -= taken
+        total_cost += taken * layer.unit_cost
+        touched.append(layer)
+        if quantity == 0:
+            break
+
+    if quantity > 0:
+        raise ValueError("Insufficient Stock.")
+
+    CostLayer.objects.bulk_update(touched, ["remaining_quantity"])
+
+    last = touched[-1] if touched else cursor.head
+    if last is not None and last.remaining_quantity == 0:
+        last = (
+            CostLayer.objects.filter(ware=ware, remaining_quantity__gt=0)
+            .filter(_after_layer(last))
+            .order_by("created_at", "id")
+            .first()
+        )
+    if last != cursor.head:
+        cursor.head = last
+        cursor.save(update_fields=["head"])
+    return total_cost
+
+
+def consume_newest_layers(*, ware: Ware, quantity: int) -> Decimal:
+    """
+    Takes `quantity` units from the newest open layers of the ware and
+    returns their cost. The open layer index is read backwards, so only the
+    layers that are actually touched are read and written.
+    """
+    layers = CostLayer.objects.filter(ware=ware, remaining_quantity__gt=0).order_by(
+        "-created_at", "-id"
+    )
+    total_cost = Decimal(0)
+    touched = []
+    for layer in layers.iterator(chunk_size=100):
+        taken = min(quantity, layer.remaining_quantity)
+        layer.remaining_quantity -= taken
+        quantity -= taken
+        total_cost += taken * layer.unit_cost
+        touched.append(layer)
+        if quantity == 0:
+            break
+
+    if quantity > 0:
+        raise ValueError("Insufficient Stock.")
+
+    CostLayer.objects.bulk_update(touched, ["remaining_quantity"])
+    # The cursor points at the oldest open layer, which is only emptied
+    # together with every newer one.
+    emptied = [layer.id for layer in touched if layer.remaining_quantity == 0]
+    if emptied:
+        FifoCursor.objects.filter(ware=ware, head_id__in=emptied).update(head=None)
+    return total_cost
+
+
+def take_from_layers(
+    *, layers: deque, quantity: int, newest_first: bool = False
+) -> Decimal:
+    """
+    Takes `quantity` units from the front of an in-memory queue of open
+    layers, or from its back with `newest_first`, dropping the layers it
+    empties, and returns their cost.
+    """
+    total_cost = Decimal(0)
+    while quantity > 0 and layers:
+        layer = layers[-1] if newest_first else layers[0]
+        taken = min(quantity, layer.remaining_quantity)
+        layer.remaining_quantity -= taken
+        quantity -= taken
+        total_cost += taken * layer.unit_cost
+        if layer.remaining_quantity == 0:
+            if newest_first:
+                layers.pop()
+            else:
+                layers.popleft()
+    return total_cost
+
+
+def lock_open_layers(*, ware_ids: list[int]) -> dict[int, OpenLayers]:
+    """
+    Locks the FIFO cursors of the wares and loads all their open layers with
+    one query, as a queue per ware from oldest to newest.
+    """
+    list(FifoCursor.objects.select_for_update().filter(ware_id__in=ware_ids))
+    open_layers = {ware_id: OpenLayers() for ware_id in ware_ids}
+    layers = CostLayer.objects.filter(
+        ware_id__in=ware_ids, remaining_quantity__gt=0
+    ).order_by("ware_id", "created_at", "id")
+    for layer in layers:
+        layer.loaded_quantity = layer.remaining_quantity
+        open_layers[layer.ware_id].append(layer)
+        open_layers[layer.ware_id].loaded.append(layer)
+    return open_layers
+
+
+def save_open_layers(*, open_layers: dict[int, OpenLayers]):
+    """
+    Writes back the layers changed since lock_open_layers and points every
+    cursor at the front of its queue.
+    """
+    CostLayer.objects.bulk_update(
+        [
+            layer
+            for layers in open_layers.values()
+            for layer in layers.loaded
+            if layer.remaining_quantity != layer.loaded_quantity
+        ],
+        ["remaining_quantity"],
+    )
+    cursors = [
+        FifoCursor(ware_id=ware_id, head=layers[0] if layers else None)
+        for ware_id, layers in open_layers.items()
+    ]
+    FifoCursor.objects.bulk_create(
+        cursors,
+        update_conflicts=True,
+        unique_fields=["ware"],
+        update_fields=["head"],
+    )
+
+
+def open_layers_before(*, ware: Ware, since, quantity: int) -> deque:
+    """
+    The FIFO queue as it stood right before a point of the ledger. Outputs
+    always consume the oldest units, so the `quantity` units on hand at that
+    point are the newest ones received before it: walking the layers
+    backwards from the point only reads the layers that were still open.
+    """
+    layers = []
+    for layer in (
+        CostLayer.objects.filter(ware=ware)
+        .filter(before(since, "factor_id"))
+        .order_by("-created_at", "-id")
+        .iterator(chunk_size=100)
+    ):
+        if quantity <= 0:
+            break
+        layer.remaining_quantity = min(layer.quantity, quantity)
+        quantity -= layer.remaining_quantity
+        layers.append(layer)
+    return deque(reversed(layers))
+
+
+def replay_layers(
+    *, ware: Ware, since=None, newest_first: bool = False
+) -> tuple[list[CostLayer], deque]:
+    """
+    Replays the ledger of the ware up to the position `since`, or all of it,
+    and returns the layers of its inputs and the queue of those still open
+    at that point. Layers that exist already are reused, the others are
+    built unsaved.
+    """
+    factors = Factor.objects.filter(ware=ware)
+    existing = CostLayer.objects.filter(ware=ware)
+    if since is not None:
+        factors = factors.filter(before(since))
+        existing = existing.filter(before(since, "factor_id"))
+    existing = {layer.factor_id: layer for layer in existing}
+
+    layers = []
+    open_layers = deque()
+    for factor in factors.order_by("created_at", "id").iterator(chunk_size=2000):
+        if factor.type in ("input", "opening"):
+            layer = existing.get(factor.id) or CostLayer(
+                ware=ware,
+                factor=factor,
+                unit_cost=factor.purchase_price or 0,
+                quantity=factor.quantity,
+                created_at=factor.created_at,
+            )
+            layer.remaining_quantity = layer.quantity
+            layers.append(layer)
+            open_layers.append(layer)
+        elif factor.type == "output":
+            take_from_layers(
+                layers=open_layers,
+                quantity=factor.quantity,
+                newest_first=newest_first,
+            )
+    return layers, open_layers
+
+
+def drop_cost_layers(*, ware: Ware):
+    CostLayer.objects.filter(ware=ware).delete()
+    FifoCursor.objects.filter(ware=ware).delete()
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from inventory.models import ArchivedFactor, DailyMovement, Factor
+
+MOVEMENT_FIELDS = ["qty_in", "qty_out", "value_in", "cogs"]
+
+
+def movement_delta(*, factor: Factor) -> tuple[int, int, Decimal, Decimal]:
+    """
+    Returns the (qty_in, qty_out, value_in, cogs) a factor adds to the
+    movements of its day.
+    """
+    if factor.type == "input":
+        return (
+            factor.quantity,
+            0,
+            factor.quantity * Decimal(factor.purchase_price or 0),
+            Decimal(0),
+        )
+    if factor.type == "output":
+        return 0, factor.quantity, Decimal(0), Decimal(factor.total_cost or 0)
+    return 0, 0, Decimal(0), Decimal(0)
+
+
+def apply_movements(*, factors: list[Factor], sign: int = 1):
+    """
+    Adds (or with sign=-1 removes) the factors to the daily movements of
+    their wares. The callers hold the balance locks of those wares, so the
+    rows of a ware can be read, changed and written back without racing
+    another writer.
+    """
+    deltas = defaultdict(lambda: [0, 0, Decimal(0), Decimal(0)])
+    for factor in factors:
+        delta = movement_delta(factor=factor)
+        if any(delta):
+            key = (factor.ware_id, timezone.localdate(factor.created_at))
+            deltas[key] = [old + sign * new for old, new in zip(deltas[key], delta)]
+    if not deltas:
+        return
+
+    keys = Q()
+    for ware_id, day in deltas:
+        keys |= Q(ware_id=ware_id, day=day)
+    rows = {
+        (row.ware_id, row.day): row
+        for row in DailyMovement.objects.select_for_update().filter(keys)
+    }
+    created = []
+    for key, delta in deltas.items():
+        row = rows.get(key)
+        if row is None:
+            row = DailyMovement(ware_id=key[0], day=key[1])
+            created.append(row)
+        for field, value in zip(MOVEMENT_FIELDS, delta):
+            setattr(row, field, getattr(row, field) + value)
+    DailyMovement.objects.bulk_update(rows.values(), MOVEMENT_FIELDS, batch_size=1000)
+    DailyMovement.objects.bulk_create(created, batch_size=1000)
+
+
+def _daily_totals(factors) -> dict:
+    money = DecimalField(max_digits=18, decimal_places=2)
+    rows = (
+        factors.annotate(day=TruncDate("created_at"))
+        .values("ware_id", "day")
+        .order_by("ware_id", "day")
+        .annotate(
+            qty_in=Coalesce(Sum("quantity", filter=Q(type="input")), 0),
+            qty_out=Coalesce(Sum("quantity", filter=Q(type="output")), 0),
+            value_in=Coalesce(
+                Sum(
+                    F("quantity") * F("purchase_price"),
+                    filter=Q(type="input"),
+                    output_field=money,
+                ),
+                Value(Decimal(0)),
+                output_field=money,
+            ),
+            cogs=Coalesce(
+                Sum("total_cost", filter=Q(type="output"), output_field=money),
+                Value(Decimal(0)),
+                output_field=money,
+            ),
+        )
+    )
+    return {(row["ware_id"], row["day"]): row for row in rows}
+
+
+@transaction.atomic
+def backfill_movements(
+    *,
+    ware_ids: list[int] = None,
+    since: date = None,
+    until: date = None,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Rebuilds the daily movements of the wares (all by default) for the days
+    from `since` to `until`, inclusive, from the ledger and the archive with
+    one grouped query each, and returns how many rows were written.
+    """
+    factors = Factor.objects.filter(type__in=["input", "output"])
+    archived = ArchivedFactor.objects.filter(type__in=["input", "output"])
+    movements = DailyMovement.objects.all()
+    if ware_ids is not None:
+        factors = factors.filter(ware_id__in=ware_ids)
+        archived = archived.filter(ware_id__in=ware_ids)
+        movements = movements.filter(ware_id__in=ware_ids)
+    zone = timezone.get_current_timezone()
+    if since is not None:
+        start = datetime.combine(since, datetime.min.time(), tzinfo=zone)
+        factors = factors.filter(created_at__gte=start)
+        archived = archived.filter(created_at__gte=start)
+        movements = movements.filter(day__gte=since)
+    if until is not None:
+        end = datetime.combine(until, datetime.max.time(), tzinfo=zone)
+        factors = factors.filter(created_at__lte=end)
+        archived = archived.filter(created_at__lte=end)
+        movements = movements.filter(day__lte=until)
+
+    totals = _daily_totals(factors)
+    for key, row in _daily_totals(archived).items():
+        if key not in totals:
+            totals[key] = row
+            continue
+        for field in MOVEMENT_FIELDS:
+            totals[key][field] += row[field]
+
+    movements.delete()
+    DailyMovement.objects.bulk_create(
+        [
+            DailyMovement(
+                ware_id=ware_id,
+                day=day,
+                **{field: row[field] for field in MOVEMENT_FIELDS},
+            )
+            for (ware_id, day), row in totals.items()
+        ],
+        batch_size=batch_size,
+    )
+    return len(totals)
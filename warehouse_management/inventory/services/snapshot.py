@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import Factor, StockBalance, StockSnapshot
+from inventory.services.balance import AVERAGE_COST_PLACES, factor_delta
+
+
+@transaction.atomic
+def take_snapshots(*, ware_ids: list[int] = None, batch_size: int = 1000) -> int:
+    """
+    Copies the current balance of every ware (or of `ware_ids`) into a
+    snapshot row and returns how many were written.
+    """
+    balances = StockBalance.objects.all()
+    if ware_ids is not None:
+        balances = balances.filter(ware_id__in=ware_ids)
+    balances = list(balances.order_by("ware_id"))
+    # Stamped after the balances were read, so every factor they include was
+    # created before the snapshot.
+    taken_at = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(
+                ware_id=balance.ware_id,
+                taken_at=taken_at,
+                quantity=balance.quantity,
+                value=balance.value,
+                average_cost=balance.average_cost,
+                last_factor_id=balance.last_factor_id,
+            )
+            for balance in balances
+        ],
+        batch_size=batch_size,
+    )
+    return len(balances)
+
+
+def shift_snapshots(*, factor: Factor, sign: int = 1):
+    """
+    Adds (or with sign=-1 removes) a factor's delta to the snapshots of its
+    ware that already include it, after the factor was edited in place.
+    """
+    quantity, value = factor_delta(factor=factor)
+    snapshots = list(
+        StockSnapshot.objects.filter(
+            ware_id=factor.ware_id, last_factor_id__gte=factor.id
+        )
+    )
+    for snapshot in snapshots:
+        snapshot.quantity += sign * quantity
+        snapshot.value += sign * value
+        snapshot.average_cost = (
+            (snapshot.value / snapshot.quantity).quantize(AVERAGE_COST_PLACES)
+            if snapshot.quantity > 0
+            else Decimal(0)
+        )
+    StockSnapshot.objects.bulk_update(
+        snapshots, ["quantity", "value", "average_cost"], batch_size=1000
+    )
@@ -1,23 +1,55 @@
 from django.db.models import QuerySet
 from django.db import transaction
 
-from inventory.models import Ware
+from inventory import cost_methods
+from inventory.models import Factor, StockBalance, Ware
+from inventory.signals import send_stock_changed
+from inventory.services.balance import lock_balance, touch
+from inventory.services.change import record_changes
+from inventory.services.costing import recompute_costs
 
 
 @transaction.atomic
 def create_ware(*, name: str, cost_method: str) -> QuerySet[Ware]:
+    cost_methods.get(cost_method)
     ware = Ware.objects.create(name=name, cost_method=cost_method)
+    balance = StockBalance(ware=ware)
+    touch(balance=balance)
+    balance.save(force_insert=True)
+    record_changes(action="created", changes=[(ware.id, None)])
+    # Reads of the id before it existed may have cached its absence.
+    send_stock_changed(ware_ids=[ware.id])
     return ware
 
 
+@transaction.atomic
 def delete_ware(id: int):
+    factor_ids = list(Factor.objects.filter(ware_id=id).values_list("id", flat=True))
     Ware.objects.filter(id=id).delete()
+    record_changes(
+        action="deleted",
+        changes=[(id, factor_id) for factor_id in factor_ids] + [(id, None)],
+    )
+    send_stock_changed(ware_ids=[id], factor_ids=factor_ids)
 
 
+@transaction.atomic
 def update_ware(id: int, name: str = None, cost_method: str = None):
     ware = Ware.objects.get(id=id)
+    balance = lock_balance(ware=ware)
     if name is not None:
         ware.name = name
+    method_changed = cost_method is not None and cost_method != ware.cost_method
     if cost_method is not None:
+        cost_methods.get(cost_method)
         ware.cost_method = cost_method
     ware.save()
+    touch(balance=balance)
+    balance.save(update_fields=["version", "changed_at"])
+
+    if method_changed:
+        # The outputs so far were costed by the old method, and the balance
+        # with them; the new one has to start from its own costs.
+        recompute_costs(ware=ware)
+    record_changes(action="updated", changes=[(id, None)])
+    send_stock_changed(ware_ids=[id])
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent after a transaction that changed stock, factors or wares commits, with
+# the ids of the touched wares and of the factors that were updated or
+# deleted.
+stock_changed = Signal()
+
+
+def send_stock_changed(*, ware_ids, factor_ids=()):
+    ware_ids, factor_ids = set(ware_ids), set(factor_ids)
+    transaction.on_commit(
+        lambda: stock_changed.send(
+            sender=None, ware_ids=ware_ids, factor_ids=factor_ids
+        )
+    )
@@ -1,10 +1,66 @@
-from django.test import TestCase
-from django.urls import reverse
+import csv
+import json
+import threading
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
 from decimal import Decimal
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 
-from inventory.models import Ware, Factor
+from common import metrics
+from common.renderers import FastJSONRenderer
+from common.pagination import EstimatedCountPaginator, KeysetPagination
+from inventory import cache, coalesce, cost_methods
+from inventory.benchmarks import (
+    bench_async_reads,
+    bench_serialization,
+    bench_bulk_input,
+    bench_bulk_output,
+    bench_coalescing,
+    bench_contention,
+    seed_wares,
+)
+from inventory.apis.factor import FactorApi, FactorExportApi
+from inventory.apis.ware import WareApi
+from inventory.urls import get_urlpatterns
+from inventory.models import (
+    ArchivedFactor,
+    Ware,
+    Change,
+    Factor,
+    CostLayer,
+    DailyMovement,
+    FifoCursor,
+    StockBalance,
+    StockSnapshot,
+)
+from inventory.selectors.factor import ledger_totals, valuation_stock
+from inventory.services.compaction import compact_ledger
+from inventory.services.movement import backfill_movements
+from inventory.services.costing import recompute_costs
+from inventory.services.snapshot import take_snapshots
+from inventory.services.ware import create_ware, delete_ware, update_ware
+from inventory.services.factor import (
+    create_input,
+    create_inputs,
+    create_output,
+    create_outputs,
+    create_factor,
+    delete_factor,
+    update_factor,
+)
 
 
 class WareModelTest(TestCase):
@@ -32,6 +88,142 @@ class FactorModelTest(TestCase):
         self.assertEqual(self.factor.type, "input")
 
 
+class FactorAdminTest(TestCase):
+    def setUp(self) -> None:
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "admin")
+        )
+        self.wares = [
+            create_ware(name=f"admin {number}", cost_method="fifo")
+            for number in range(3)
+        ]
+
+    def add_factors(self, count: int):
+        create_inputs(
+            lines=[
+                {
+                    "ware_id": self.wares[number % 3].id,
+                    "quantity": 1,
+                    "purchase_price": Decimal(1),
+                }
+                for number in range(count)
+            ]
+        )
+
+    def queries(self, url: str, params=None) -> int:
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(captured.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse("admin:inventory_factor_changelist")
+        filtered = {
+            "type__exact": "input",
+            "created_at__year": str(timezone.localdate().year),
+        }
+        self.add_factors(3)
+        few = [self.queries(url), self.queries(url, filtered)]
+        self.add_factors(30)
+        self.assertEqual([self.queries(url), self.queries(url, filtered)], few)
+
+    def test_date_hierarchy_reads_rollups(self):
+        self.add_factors(3)
+        response = self.client.get(reverse("admin:inventory_factor_changelist"))
+        day = timezone.localdate()
+        self.assertContains(response, f"created_at__day={day.day}")
+
+    def test_filtered_date_hierarchy_only_links_matching_days(self):
+        self.add_factors(3)
+        output = create_output(ware_id=self.wares[0].id, quantity=1)
+        month = timezone.localdate().replace(day=1)
+
+        def day(number):
+            return timezone.make_aware(
+                datetime.combine(month.replace(day=number), time(12))
+            )
+
+        Factor.objects.filter(type="input").update(created_at=day(3))
+        Factor.objects.filter(id=output.id).update(created_at=day(1))
+        DailyMovement.objects.all().delete()
+        backfill_movements()
+        DailyMovement.objects.create(ware=self.wares[1], day=month.replace(day=2))
+
+        url = reverse("admin:inventory_factor_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, "created_at__day=1&")
+        self.assertNotContains(response, "created_at__day=2&")
+        self.assertContains(response, "created_at__day=3&")
+        response = self.client.get(url, {"type__exact": "output"})
+        self.assertContains(response, "created_at__day=1&")
+        self.assertNotContains(response, "created_at__day=3&")
+
+    def test_factor_admin_writes_through_services(self):
+        ware = self.wares[0]
+        response = self.client.post(
+            reverse("admin:inventory_factor_add"),
+            {"ware": ware.id, "type": "input", "quantity": 4, "purchase_price": "2.50"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        factor = Factor.objects.get(ware=ware)
+        self.assertEqual(StockBalance.objects.get(ware=ware).value, Decimal(10))
+        self.assertEqual(CostLayer.objects.get(factor=factor).remaining_quantity, 4)
+
+        response = self.client.post(
+            reverse("admin:inventory_factor_change", args=[factor.id]),
+            {"ware": ware.id, "type": "input", "quantity": 6, "purchase_price": "2.50"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(StockBalance.objects.get(ware=ware).quantity, 6)
+
+        response = self.client.post(
+            reverse("admin:inventory_factor_delete", args=[factor.id]), {"post": "yes"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(StockBalance.objects.get(ware=ware).quantity, 0)
+        self.assertEqual(
+            list(
+                Change.objects.filter(factor_id=factor.id).values_list(
+                    "action", flat=True
+                )
+            ),
+            ["created", "updated", "deleted"],
+        )
+
+    def test_change_form_does_not_list_every_ware(self):
+        self.add_factors(1)
+        factor = Factor.objects.first()
+        response = self.client.get(
+            reverse("admin:inventory_factor_change", args=[factor.id])
+        )
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "admin 2</option>")
+
+    def test_ware_admin_writes_through_services(self):
+        response = self.client.post(
+            reverse("admin:inventory_ware_add"),
+            {"name": "admin added", "cost_method": "lifo"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        ware = Ware.objects.get(name="admin added")
+        self.assertTrue(StockBalance.objects.filter(ware=ware).exists())
+        self.assertTrue(
+            Change.objects.filter(ware_id=ware.id, action="created").exists()
+        )
+
+    def test_str_does_not_load_the_ware(self):
+        self.add_factors(1)
+        factor = Factor.objects.first()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(factor), f"Input - {factor.ware_id} (1)")
+
+    def test_estimated_count_falls_back_to_exact(self):
+        self.add_factors(4)
+        paginator = EstimatedCountPaginator(Factor.objects.order_by("id"), 2)
+        self.assertEqual(paginator.count, 4)
+        self.assertEqual(paginator.num_pages, 2)
+
+
 class FactorApiTest(APITestCase):
     def setUp(self) -> None:
         self.ware_weighted = Ware.objects.create(
@@ -69,6 +261,16 @@ class FactorApiTest(APITestCase):
         self.assertEqual(Factor.objects.count(), 2)
         self.assertEqual(Factor.objects.get(id=response.json()["id"]).quantity, 10)
 
+    def test_output_cost_can_not_be_set(self):
+        create_input(ware_id=self.ware_fifo.id, quantity=10, purchase_price=Decimal(1))
+        output = create_output(ware_id=self.ware_fifo.id, quantity=5)
+        url = f"/api/inventory/factor/{output.id}/"
+        for data in ({"total_cost": "1.00"}, {"type": "output", "total_cost": "1.00"}):
+            response = self.client.put(url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        output.refresh_from_db()
+        self.assertEqual(output.total_cost, Decimal(5))
+
     def test_insufficient_stock_output(self):
         url = "/api/inventory/output/"
         data = {
@@ -165,6 +367,1451 @@ class FactorApiTest(APITestCase):
         self.assertEqual(response.json()["total_inventory_value"], Decimal(3000))
 
 
+class CostLayerTest(TestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(name="layers", cost_method="fifo")
+        self.first = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("100.00")
+        )
+        self.second = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("200.00")
+        )
+
+    def test_outputs_continue_from_previous_consumption(self):
+        first_output = create_output(ware_id=self.ware.id, quantity=15)
+        second_output = create_output(ware_id=self.ware.id, quantity=5)
+        self.assertEqual(first_output.total_cost, Decimal(2000))
+        self.assertEqual(second_output.total_cost, Decimal(1000))
+        self.assertFalse(
+            CostLayer.objects.filter(ware=self.ware, remaining_quantity__gt=0).exists()
+        )
+
+    def test_cursor_points_to_oldest_open_layer(self):
+        cursor = FifoCursor.objects.get(ware=self.ware)
+        self.assertEqual(cursor.head.factor, self.first)
+        create_output(ware_id=self.ware.id, quantity=10)
+        cursor.refresh_from_db()
+        self.assertEqual(cursor.head.factor, self.second)
+
+    def test_delete_input_rebuilds_layers(self):
+        create_output(ware_id=self.ware.id, quantity=5)
+        delete_factor(self.first.id)
+        layer = CostLayer.objects.get(ware=self.ware)
+        self.assertEqual(layer.factor, self.second)
+        self.assertEqual(layer.remaining_quantity, 5)
+
+
+class RecomputeCostsTest(TestCase):
+    def setUp(self) -> None:
+        self.fifo = Ware.objects.create(name="recompute fifo", cost_method="fifo")
+        self.first = create_input(
+            ware_id=self.fifo.id, quantity=10, purchase_price=Decimal("100.00")
+        )
+        create_input(
+            ware_id=self.fifo.id, quantity=10, purchase_price=Decimal("200.00")
+        )
+        self.outputs = [
+            create_output(ware_id=self.fifo.id, quantity=15),
+            create_output(ware_id=self.fifo.id, quantity=3),
+        ]
+
+    def test_backdated_fifo_edit_recosts_later_outputs(self):
+        take_snapshots(ware_ids=[self.fifo.id])
+        update_factor(self.first.id, purchase_price=Decimal("50.00"))
+
+        self.outputs[0].refresh_from_db()
+        self.outputs[1].refresh_from_db()
+        self.assertEqual(self.outputs[0].total_cost, Decimal(1500))
+        self.assertEqual(self.outputs[1].total_cost, Decimal(600))
+        balance = StockBalance.objects.get(ware=self.fifo)
+        self.assertEqual((balance.quantity, balance.value), (2, Decimal(400)))
+        self.assertEqual(StockSnapshot.objects.get(ware=self.fifo).value, 400)
+        layer = CostLayer.objects.get(ware=self.fifo, remaining_quantity__gt=0)
+        self.assertEqual(layer.remaining_quantity, 2)
+        self.assertEqual(FifoCursor.objects.get(ware=self.fifo).head, layer)
+
+    def test_backdated_weighted_edit_recosts_later_outputs(self):
+        ware = Ware.objects.create(
+            name="recompute weighted", cost_method="weighted_mean"
+        )
+        first = create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal("10"))
+        create_output(ware_id=ware.id, quantity=5)
+        create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal("40"))
+        output = create_output(ware_id=ware.id, quantity=5)
+        self.assertEqual(output.total_cost, Decimal(150))
+
+        update_factor(first.id, purchase_price=Decimal("20"))
+        output.refresh_from_db()
+        self.assertEqual(output.total_cost, Decimal("166.67"))
+        self.assertEqual(StockBalance.objects.get(ware=ware).value, Decimal("333.33"))
+
+    def test_edit_that_oversells_history_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Insufficient Stock."):
+            delete_factor(self.first.id)
+        self.assertTrue(Factor.objects.filter(id=self.first.id).exists())
+        self.outputs[0].refresh_from_db()
+        self.assertEqual(self.outputs[0].total_cost, Decimal(2000))
+
+    def test_command_repairs_stale_costs(self):
+        Factor.objects.filter(id=self.outputs[1].id).update(total_cost=1)
+        out = StringIO()
+        call_command(
+            "recompute_costs",
+            f"--ware={self.fifo.id}",
+            "--since=2000-01-01",
+            stdout=out,
+        )
+        self.assertIn("Re-costed 1 output(s).", out.getvalue())
+        self.outputs[1].refresh_from_db()
+        self.assertEqual(self.outputs[1].total_cost, Decimal(600))
+        self.assertEqual(StockBalance.objects.get(ware=self.fifo).value, Decimal(400))
+
+
+class CostMethodTest(TestCase):
+    """
+    Runs against every registered cost method.
+    """
+
+    def build(self, method: str, name: str, *, price=Decimal(2), batched=False):
+        ware = create_ware(name=f"{method} {name}", cost_method=method)
+        create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal(1))
+        second = create_input(ware_id=ware.id, quantity=10, purchase_price=price)
+        create_output(ware_id=ware.id, quantity=5)
+        create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal(4))
+        if batched:
+            create_outputs(
+                lines=[{"ware_id": ware.id, "quantity": q} for q in (12, 3, 4)]
+            )
+        else:
+            for quantity in (12, 3, 4):
+                create_output(ware_id=ware.id, quantity=quantity)
+        create_input(ware_id=ware.id, quantity=5, purchase_price=Decimal(3))
+        create_output(ware_id=ware.id, quantity=11)
+        return ware, second
+
+    def state(self, ware) -> tuple:
+        balance = StockBalance.objects.get(ware=ware)
+        return (
+            balance.quantity,
+            balance.value,
+            list(
+                Factor.objects.filter(ware=ware, type="output")
+                .order_by("id")
+                .values_list("total_cost", flat=True)
+            ),
+            sorted(
+                CostLayer.objects.filter(ware=ware).values_list(
+                    "unit_cost", "remaining_quantity"
+                )
+            ),
+        )
+
+    def test_lifo_costs_the_newest_units_first(self):
+        ware, _ = self.build("lifo", "costs")
+        self.assertEqual(
+            self.state(ware)[2],
+            [Decimal(10), Decimal(44), Decimal(6), Decimal(4), Decimal(21)],
+        )
+
+    def test_periodic_average_costs_the_average_of_the_month(self):
+        ware, _ = self.build("periodic_average", "costs")
+        self.assertEqual(
+            self.state(ware)[2],
+            [
+                Decimal("7.50"),
+                Decimal("28.00"),
+                Decimal("7.00"),
+                Decimal("9.33"),
+                Decimal("33.17"),
+            ],
+        )
+
+    def test_single_batched_and_replayed_costs_agree(self):
+        for method, _ in cost_methods.choices():
+            with self.subTest(method):
+                single, _ = self.build(method, "single")
+                batched, _ = self.build(method, "batched", batched=True)
+                self.assertEqual(self.state(single), self.state(batched))
+                quantity, value, costs, _ = self.state(single)
+                self.assertEqual((quantity, value), (0, Decimal(0)))
+                self.assertEqual(sum(costs), Decimal(85))
+                for ware in (single, batched):
+                    self.assertEqual(recompute_costs(ware=ware), 0)
+                    self.assertEqual(self.state(ware), self.state(single))
+
+    def test_recosting_an_edit_matches_a_fresh_ledger(self):
+        for method, _ in cost_methods.choices():
+            with self.subTest(method):
+                edited, second = self.build(method, "edited")
+                update_factor(second.id, purchase_price=Decimal(5))
+                fresh, _ = self.build(method, "fresh", price=Decimal(5))
+                self.assertEqual(self.state(edited), self.state(fresh))
+
+    def test_switching_method_recosts_the_ware(self):
+        for method, _ in cost_methods.choices():
+            with self.subTest(method):
+                switched, _ = self.build("weighted_mean", f"switched to {method}")
+                update_ware(switched.id, cost_method=method)
+                native, _ = self.build(method, "native")
+                for ware in (switched, native):
+                    create_input(ware_id=ware.id, quantity=4, purchase_price=Decimal(2))
+                    create_output(ware_id=ware.id, quantity=3)
+                # Balance, every output cost and the layers.
+                self.assertEqual(self.state(switched), self.state(native))
+
+    def test_output_queries_do_not_grow_with_the_ledger(self):
+        for method, _ in cost_methods.choices():
+            with self.subTest(method):
+                counts = []
+                for inputs in (2, 60):
+                    ware = create_ware(name=f"{method} {inputs}", cost_method=method)
+                    create_inputs(
+                        lines=[
+                            {
+                                "ware_id": ware.id,
+                                "quantity": 10,
+                                "purchase_price": Decimal(index % 5 + 1),
+                            }
+                            for index in range(inputs)
+                        ]
+                    )
+                    create_outputs(
+                        lines=[{"ware_id": ware.id, "quantity": 5}] * (inputs // 2)
+                    )
+                    with CaptureQueriesContext(connection) as queries:
+                        create_output(ware_id=ware.id, quantity=1)
+                    counts.append(len(queries))
+                self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_method_is_refused(self):
+        with self.assertRaisesMessage(ValueError, "Unknown cost method 'hifo'."):
+            create_ware(name="hifo", cost_method="hifo")
+        response = self.client.get("/api/inventory/wares/", {"cost_method": "hifo"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CompactLedgerTest(TestCase):
+    def setUp(self) -> None:
+        self.twins = {}
+        for method, _ in cost_methods.choices():
+            self.twins[method] = [
+                create_ware(name=f"{method} {role}", cost_method=method)
+                for role in ("compacted", "kept")
+            ]
+        for compacted, kept in self.twins.values():
+            for ware in (compacted, kept):
+                create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal(1))
+                create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal(2))
+                create_output(ware_id=ware.id, quantity=15)
+        take_snapshots()
+        self.cutoff = timezone.now()
+        self.late = {}
+        for compacted, kept in self.twins.values():
+            for ware in (compacted, kept):
+                self.late[ware.id] = create_input(
+                    ware_id=ware.id, quantity=5, purchase_price=Decimal(3)
+                )
+                create_output(ware_id=ware.id, quantity=3)
+
+    def state(self, ware) -> tuple:
+        balance = StockBalance.objects.get(ware=ware)
+        return (
+            balance.quantity,
+            balance.value,
+            balance.average_cost,
+            list(
+                Factor.objects.filter(
+                    ware=ware, type="output", created_at__gte=self.cutoff
+                )
+                .order_by("id")
+                .values_list("total_cost", flat=True)
+            ),
+        )
+
+    def test_results_match_the_uncompacted_ledger(self):
+        for method, (compacted, kept) in self.twins.items():
+            with self.subTest(method):
+                self.assertEqual(compact_ledger(ware=compacted, before=self.cutoff), 3)
+                self.assertEqual(self.state(compacted), self.state(kept))
+
+                for ware in (compacted, kept):
+                    create_output(ware_id=ware.id, quantity=4)
+                    update_factor(self.late[ware.id].id, purchase_price=Decimal(4))
+                    create_output(ware_id=ware.id, quantity=2)
+                    self.assertEqual(recompute_costs(ware=ware), 0)
+                self.assertEqual(self.state(compacted), self.state(kept))
+
+        out = StringIO()
+        call_command("check_stock_balances", stdout=out)
+        self.assertIn("All balances match the ledger.", out.getvalue())
+
+    def test_fifo_opening_keeps_the_open_layer(self):
+        compacted, _ = self.twins["fifo"]
+        compact_ledger(ware=compacted, before=self.cutoff)
+        opening = Factor.objects.get(ware=compacted, type="opening")
+        self.assertEqual((opening.quantity, opening.total_cost), (5, Decimal(10)))
+        self.assertEqual(opening.cost_layer.quantity, 5)
+        self.assertEqual(opening.cost_layer.remaining_quantity, 2)
+        self.assertEqual(
+            list(
+                ArchivedFactor.objects.filter(ware=compacted)
+                .order_by("id")
+                .values_list("type", flat=True)
+            ),
+            ["input", "input", "output"],
+        )
+        with self.assertRaisesMessage(ValueError, "Opening balances can not"):
+            update_factor(opening.id, quantity=1)
+        with self.assertRaisesMessage(ValueError, "Opening balances can not"):
+            create_factor(
+                ware_id=compacted.id,
+                quantity=5,
+                purchase_price=Decimal(2),
+                type="opening",
+                total_cost="10.00",
+            )
+        response = self.client.post(
+            "/api/inventory/factor/",
+            {
+                "ware_id": compacted.id,
+                "quantity": 5,
+                "purchase_price": "2.00",
+                "type": "opening",
+                "total_cost": "10.00",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compaction_is_written_to_the_change_feed(self):
+        compacted, _ = self.twins["fifo"]
+        last = Change.objects.order_by("-id").first().id
+        compact_ledger(ware=compacted, before=self.cutoff)
+        opening = Factor.objects.get(ware=compacted, type="opening")
+        archived = ArchivedFactor.objects.filter(ware=compacted).exclude(
+            factor_id=opening.id
+        )
+        self.assertCountEqual(
+            Change.objects.filter(id__gt=last).values_list(
+                "action", "ware_id", "factor_id"
+            ),
+            [("updated", compacted.id, opening.id)]
+            + [("deleted", compacted.id, row.factor_id) for row in archived],
+        )
+
+    def test_as_of_before_compaction_is_refused(self):
+        compacted, _ = self.twins["weighted_mean"]
+        compact_ledger(ware=compacted, before=self.cutoff)
+        url = f"/api/inventory/inventory/valuation/{compacted.id}/"
+        as_of = self.cutoff - timezone.timedelta(days=1)
+        response = self.client.get(url, {"as_of": as_of.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"as_of": timezone.now().isoformat()})
+        self.assertEqual(response.json()["quantity_in_stock"], 7)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "compact_ledger",
+            f"--before={self.cutoff.isoformat()}",
+            f"--ware={self.twins['fifo'][0].id}",
+            stdout=out,
+        )
+        self.assertIn("Archived 3 factor(s).", out.getvalue())
+        self.assertEqual(ArchivedFactor.objects.count(), 3)
+
+
+class StockBalanceTest(TestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(name="balance", cost_method="fifo")
+        self.input = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("100.00")
+        )
+
+    def test_balance_follows_ledger(self):
+        output = create_output(ware_id=self.ware.id, quantity=4)
+        balance = StockBalance.objects.get(ware=self.ware)
+        self.assertEqual(balance.quantity, 6)
+        self.assertEqual(balance.value, Decimal(600))
+        self.assertEqual(balance.last_factor_id, output.id)
+
+        update_factor(self.input.id, purchase_price=Decimal("50.00"))
+        delete_factor(output.id)
+        balance.refresh_from_db()
+        self.assertEqual(balance.quantity, 10)
+        self.assertEqual(balance.value, Decimal(500))
+        self.assertEqual(balance.last_factor_id, self.input.id)
+
+    def test_previous_outputs_reduce_available_stock(self):
+        create_output(ware_id=self.ware.id, quantity=8)
+        with self.assertRaisesMessage(ValueError, "Insufficient Stock."):
+            create_output(ware_id=self.ware.id, quantity=5)
+
+    def test_ledger_totals_in_one_query(self):
+        other = Ware.objects.create(name="ledger only", cost_method="weighted_mean")
+        Factor.objects.create(
+            ware=other, quantity=3, purchase_price=Decimal("10.01"), type="input"
+        )
+        Factor.objects.create(
+            ware=other, quantity=1, purchase_price=0, type="output", total_cost=10
+        )
+        with self.assertNumQueries(1):
+            totals = {row["ware_id"]: row for row in ledger_totals()}
+        self.assertEqual(totals[other.id]["quantity_in_stock"], 2)
+        self.assertEqual(totals[other.id]["total_inventory_value"], Decimal("20.03"))
+        self.assertEqual(valuation_stock(other.id)["quantity_in_stock"], 2)
+
+    def test_check_command_repairs_balances(self):
+        StockBalance.objects.filter(ware=self.ware).update(quantity=0, value=0)
+        out = StringIO()
+        call_command("check_stock_balances", "--repair", stdout=out)
+        self.assertIn("Repaired 1 balance(s).", out.getvalue())
+        balance = StockBalance.objects.get(ware=self.ware)
+        self.assertEqual(balance.quantity, 10)
+        self.assertEqual(balance.value, Decimal(1000))
+
+    def test_check_command_catches_a_drifted_average(self):
+        StockBalance.objects.filter(ware=self.ware).update(average_cost=Decimal(99))
+        out = StringIO()
+        call_command("check_stock_balances", "--repair", stdout=out)
+        self.assertIn("Repaired 1 balance(s).", out.getvalue())
+        balance = StockBalance.objects.get(ware=self.ware)
+        self.assertEqual(balance.average_cost, Decimal(100))
+
+
+class WeightedAverageTest(TestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(name="weighted", cost_method="weighted_mean")
+
+    def test_average_follows_remaining_stock(self):
+        create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("100.00")
+        )
+        create_output(ware_id=self.ware.id, quantity=5)
+        create_input(ware_id=self.ware.id, quantity=5, purchase_price=Decimal("400.00"))
+        balance = StockBalance.objects.get(ware=self.ware)
+        self.assertEqual(balance.average_cost, Decimal(250))
+
+        output = create_output(ware_id=self.ware.id, quantity=4)
+        self.assertEqual(output.total_cost, Decimal(1000))
+
+    def test_emptying_stock_takes_remaining_value(self):
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal("10.00"))
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal("10.01"))
+        create_output(ware_id=self.ware.id, quantity=4)
+        output = create_output(ware_id=self.ware.id, quantity=2)
+        balance = StockBalance.objects.get(ware=self.ware)
+        self.assertEqual(balance.quantity, 0)
+        self.assertEqual(balance.value, Decimal(0))
+        self.assertEqual(output.total_cost, Decimal("20.01"))
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked on SQLite")
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.ware = Ware.objects.create(name="plans", cost_method="fifo")
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("SCAN", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_ledger_replay_uses_ware_index(self):
+        self.assertUsesIndex(
+            Factor.objects.filter(ware=self.ware).order_by("created_at", "id"),
+            "factor_ware_created_idx",
+        )
+
+    def test_inputs_in_fifo_order_use_ware_type_index(self):
+        self.assertUsesIndex(
+            Factor.objects.filter(ware=self.ware, type="input").order_by(
+                "created_at", "id"
+            ),
+            "factor_ware_type_created_idx",
+        )
+
+    def test_fifo_consumption_uses_open_layer_index(self):
+        self.assertUsesIndex(
+            CostLayer.objects.filter(ware=self.ware, remaining_quantity__gt=0).order_by(
+                "created_at", "id"
+            ),
+            "costlayer_open_idx",
+        )
+
+    def test_lifo_consumption_reads_open_layer_index_backwards(self):
+        self.assertUsesIndex(
+            CostLayer.objects.filter(ware=self.ware, remaining_quantity__gt=0).order_by(
+                "-created_at", "-id"
+            ),
+            "costlayer_open_idx",
+        )
+
+    def test_factor_pages_use_created_index(self):
+        pagination = KeysetPagination(ordering=("created_at", "id"))
+        after = pagination.after([timezone.now(), 1])
+        self.assertUsesIndex(
+            Factor.objects.filter(after).order_by("created_at", "id")[:100],
+            "factor_created_idx",
+        )
+        self.assertUsesIndex(
+            Factor.objects.filter(after, ware=self.ware).order_by("created_at", "id")[
+                :100
+            ],
+            "factor_ware_created_idx",
+        )
+
+    def test_as_of_deltas_use_ware_indexes(self):
+        self.assertUsesIndex(
+            Factor.objects.filter(
+                ware=self.ware, id__gt=100, created_at__lte=timezone.now()
+            ),
+            "factor_ware_id_idx",
+        )
+        self.assertUsesIndex(
+            Factor.objects.filter(
+                ware=self.ware,
+                created_at__gt=timezone.now(),
+                created_at__lte=timezone.now(),
+                id__lte=100,
+            ),
+            "factor_ware_created_idx",
+        )
+
+    def test_valuation_reads_balance_by_primary_key(self):
+        plan = StockBalance.objects.filter(ware=self.ware).explain()
+        self.assertIn("USING INTEGER PRIMARY KEY", plan)
+
+
+class BulkInputApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware_fifo = create_ware(name="bulk fifo", cost_method="fifo")
+        self.ware_weighted = create_ware(
+            name="bulk weighted", cost_method="weighted_mean"
+        )
+
+    def test_bulk_input_success(self):
+        url = "/api/inventory/input/bulk/"
+        data = {
+            "lines": [
+                {
+                    "ware_id": self.ware_fifo.id,
+                    "quantity": 10,
+                    "purchase_price": "100.00",
+                },
+                {
+                    "ware_id": self.ware_fifo.id,
+                    "quantity": 5,
+                    "purchase_price": "200.00",
+                },
+                {
+                    "ware_id": self.ware_weighted.id,
+                    "quantity": 4,
+                    "purchase_price": "50.00",
+                },
+            ]
+        }
+        with self.assertNumQueries(12):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([line["index"] for line in response.json()], [0, 1, 2])
+        self.assertEqual(Factor.objects.count(), 3)
+        self.assertEqual(CostLayer.objects.filter(ware=self.ware_fifo).count(), 2)
+        balance = StockBalance.objects.get(ware=self.ware_fifo)
+        self.assertEqual(balance.quantity, 15)
+        self.assertEqual(balance.value, Decimal(2000))
+
+    def test_bulk_input_reports_failed_lines(self):
+        url = "/api/inventory/input/bulk/"
+        data = {
+            "lines": [
+                {
+                    "ware_id": self.ware_fifo.id,
+                    "quantity": 10,
+                    "purchase_price": "100.00",
+                },
+                {
+                    "ware_id": self.ware_fifo.id,
+                    "quantity": 0,
+                    "purchase_price": "100.00",
+                },
+                {"ware_id": 9999, "quantity": 10, "purchase_price": "100.00"},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.json()
+        self.assertEqual(results[0]["factor"]["quantity"], 10)
+        self.assertIn("quantity", results[1]["errors"])
+        self.assertEqual(results[2]["errors"], {"ware_id": ["Ware not found."]})
+        self.assertEqual(Factor.objects.count(), 1)
+
+    def test_bulk_input_benchmark(self):
+        result = bench_bulk_input(lines=5)
+        self.assertEqual(result["lines"], 5)
+        self.assertFalse(Ware.objects.filter(name__startswith="bench-").exists())
+        # Created and deleted through the services.
+        changes = Change.objects.filter(factor_id=None).exclude(
+            ware_id__in=[self.ware_fifo.id, self.ware_weighted.id]
+        )
+        self.assertEqual(
+            list(changes.values_list("action", flat=True)), ["created", "deleted"]
+        )
+
+
+class BulkOutputApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware_fifo = create_ware(name="bulk fifo", cost_method="fifo")
+        self.ware_weighted = create_ware(
+            name="bulk weighted", cost_method="weighted_mean"
+        )
+        for ware in (self.ware_fifo, self.ware_weighted):
+            create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal("100.00"))
+            create_input(ware_id=ware.id, quantity=10, purchase_price=Decimal("200.00"))
+
+    def test_bulk_output_allocates_costs_in_line_order(self):
+        url = "/api/inventory/output/bulk/"
+        data = {
+            "lines": [
+                {"ware_id": self.ware_fifo.id, "quantity": 5},
+                {"ware_id": self.ware_weighted.id, "quantity": 15},
+                {"ware_id": self.ware_fifo.id, "quantity": 10},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        costs = [Decimal(line["factor"]["total_cost"]) for line in response.json()]
+        self.assertEqual(costs, [Decimal(500), Decimal(2250), Decimal(1500)])
+        self.assertEqual(
+            CostLayer.objects.get(
+                ware=self.ware_fifo, remaining_quantity__gt=0
+            ).remaining_quantity,
+            5,
+        )
+        self.assertEqual(FifoCursor.objects.get(ware=self.ware_fifo).head.quantity, 10)
+        self.assertEqual(StockBalance.objects.get(ware=self.ware_fifo).quantity, 5)
+        self.assertEqual(StockBalance.objects.get(ware=self.ware_weighted).quantity, 5)
+
+    def test_bulk_output_is_all_or_nothing_by_default(self):
+        url = "/api/inventory/output/bulk/"
+        data = {
+            "lines": [
+                {"ware_id": self.ware_fifo.id, "quantity": 15},
+                {"ware_id": self.ware_fifo.id, "quantity": 15},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()[1]["errors"], {"detail": ["Insufficient Stock."]}
+        )
+        self.assertEqual(Factor.objects.filter(type="output").count(), 0)
+        self.assertEqual(StockBalance.objects.get(ware=self.ware_fifo).quantity, 20)
+
+    def test_bulk_output_refuses_layers_short_of_the_balance(self):
+        CostLayer.objects.filter(ware=self.ware_fifo).update(remaining_quantity=5)
+        results = create_outputs(lines=[{"ware_id": self.ware_fifo.id, "quantity": 15}])
+        self.assertEqual(results, [(None, "Insufficient Stock.")])
+        self.assertEqual(Factor.objects.filter(type="output").count(), 0)
+        self.assertEqual(StockBalance.objects.get(ware=self.ware_fifo).quantity, 20)
+
+    def test_bulk_output_partial(self):
+        url = "/api/inventory/output/bulk/"
+        data = {
+            "lines": [
+                {"ware_id": self.ware_fifo.id, "quantity": 15},
+                {"ware_id": self.ware_fifo.id, "quantity": 15},
+                {"ware_id": self.ware_weighted.id, "quantity": 1},
+            ],
+            "partial": True,
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn("factor", response.json()[0])
+        self.assertIn("errors", response.json()[1])
+        self.assertIn("factor", response.json()[2])
+        self.assertEqual(Factor.objects.filter(type="output").count(), 2)
+
+    def test_bulk_output_benchmark(self):
+        result = bench_bulk_output(wares=2, lines_per_ware=2)
+        self.assertEqual(result["lines"], 4)
+        self.assertEqual(Factor.objects.filter(type="output").count(), 0)
+
+
+class ListPaginationTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware_fifo = create_ware(name="pages fifo", cost_method="fifo")
+        self.ware_weighted = create_ware(
+            name="pages weighted", cost_method="weighted_mean"
+        )
+        for ware in (self.ware_fifo, self.ware_weighted):
+            for _ in range(3):
+                create_input(
+                    ware_id=ware.id, quantity=1, purchase_price=Decimal("1.00")
+                )
+
+    def test_factor_pages_follow_cursor(self):
+        url = "/api/inventory/factor/"
+        seen = []
+        response = self.client.get(url, {"limit": 4})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [factor["id"] for factor in response.json()["results"]]
+            if response.json()["next"] is None:
+                break
+            response = self.client.get(
+                url, {"limit": 4, "cursor": response.json()["next"]}
+            )
+        self.assertEqual(
+            seen,
+            list(
+                Factor.objects.order_by("created_at", "id").values_list("id", flat=True)
+            ),
+        )
+
+    def test_factor_filters(self):
+        url = "/api/inventory/factor/"
+        response = self.client.get(url, {"ware_id": self.ware_fifo.id, "type": "input"})
+        self.assertEqual(len(response.json()["results"]), 3)
+        response = self.client.get(url, {"type": "output"})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/inventory/factor/", {"cursor": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ware_pages(self):
+        url = "/api/inventory/wares/"
+        response = self.client.get(url, {"limit": 1})
+        self.assertEqual(response.json()["results"][0]["id"], self.ware_fifo.id)
+        response = self.client.get(url, {"limit": 1, "cursor": response.json()["next"]})
+        self.assertEqual(response.json()["results"][0]["id"], self.ware_weighted.id)
+        self.assertIsNone(response.json()["next"])
+
+
+class FactorExportApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware = create_ware(name="export", cost_method="fifo")
+        self.other = create_ware(name="export other", cost_method="fifo")
+        create_input(ware_id=self.ware.id, quantity=10, purchase_price=Decimal("1.50"))
+        create_input(ware_id=self.other.id, quantity=1, purchase_price=Decimal("2.00"))
+        create_output(ware_id=self.ware.id, quantity=4)
+
+    def test_export_ndjson(self):
+        response = self.client.get(
+            "/api/inventory/factor/export/", {"ware_id": self.ware.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        listed = self.client.get(
+            "/api/inventory/factor/", {"ware_id": self.ware.id}
+        ).json()["results"]
+        self.assertEqual(rows, listed)
+
+    def test_export_csv(self):
+        response = self.client.get(
+            "/api/inventory/factor/export/", {"export_format": "csv"}
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0][:3], ["id", "ware", "quantity"])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][3], "1.50")
+
+    async def test_export_streams_pages_under_asgi(self):
+        url = "/api/inventory/factor/export/"
+        with mock.patch.object(FactorExportApi, "page_size", 2):
+            response = await self.async_client.get(url, {"export_format": "csv"})
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        # The header, then a chunk per page.
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(b"".join(chunks).decode().splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(len({row[0] for row in rows}), 4)
+
+
+class ConcurrentOutputTest(TransactionTestCase):
+    def test_hot_ware_never_goes_negative(self):
+        result = bench_contention(threads=4, operations=20, cold_wares=2, stock=30)
+        self.assertEqual(result["failed"], 0)
+        self.assertEqual(result["succeeded"], 30 + 2 * 20)
+        self.assertEqual(result["lowest_balance"], 0)
+        self.assertTrue(result["consistent"])
+
+
+@override_settings(INVENTORY_COALESCING={"ENABLED": True, "WINDOW_MS": 50})
+class CoalescingTest(TransactionTestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(name="hot", cost_method="fifo")
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal("1.00"))
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal("2.00"))
+
+    def concurrently(self, calls: list) -> list:
+        results = [None] * len(calls)
+
+        def run(index, call):
+            try:
+                results[index] = call()
+            except Exception as ex:
+                results[index] = ex
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(index, call))
+            for index, call in enumerate(calls)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_outputs_share_a_batch(self):
+        before = coalesce.stats()
+        results = self.concurrently(
+            [
+                lambda: coalesce.create_output(ware_id=self.ware.id, quantity=2)
+                for _ in range(4)
+            ]
+        )
+        self.assertEqual(coalesce.stats()["batches"] - before["batches"], 1)
+        factors = [result for result in results if isinstance(result, Factor)]
+        errors = [result for result in results if isinstance(result, Exception)]
+        self.assertEqual(len(factors), 3)
+        self.assertEqual([str(error) for error in errors], ["Insufficient Stock."])
+        # Every caller gets the cost of its own units.
+        self.assertEqual(
+            sorted(factor.total_cost for factor in factors),
+            [Decimal("2.00"), Decimal("3.00"), Decimal("4.00")],
+        )
+        self.assertEqual(StockBalance.objects.get(ware=self.ware).quantity, 0)
+
+    def test_inputs_and_outputs_share_a_batch(self):
+        results = self.concurrently(
+            [
+                lambda: coalesce.create_output(ware_id=self.ware.id, quantity=8),
+                lambda: coalesce.create_input(
+                    ware_id=self.ware.id, quantity=2, purchase_price=Decimal("3.00")
+                ),
+                lambda: coalesce.create_output(ware_id=999, quantity=1),
+            ]
+        )
+        self.assertEqual(results[0].total_cost, Decimal("15.00"))
+        self.assertEqual(results[1].type, "input")
+        self.assertIsInstance(results[2], Ware.DoesNotExist)
+
+    def test_atomic_callers_are_not_coalesced(self):
+        before = coalesce.stats()
+        with transaction.atomic():
+            coalesce.create_output(ware_id=self.ware.id, quantity=1)
+        self.assertEqual(coalesce.stats(), before)
+
+    def test_benchmark(self):
+        result = bench_coalescing(concurrency=(1, 4), operations=3)
+        for modes in result.values():
+            for row in modes.values():
+                self.assertEqual(row["failed"], 0)
+                self.assertTrue(row["consistent"])
+        self.assertEqual(result[1]["coalesced"]["batches"], 3)
+
+
+class BenchInventoryTest(TestCase):
+    def test_seeded_state_matches_ledger(self):
+        wares = seed_wares(wares=4, factors_per_ware=7, fifo_ratio=0.5)
+        out = StringIO()
+        call_command("check_stock_balances", stdout=out)
+        self.assertIn("All balances match the ledger.", out.getvalue())
+        for ware in wares:
+            self.assertEqual(StockBalance.objects.get(ware=ware).quantity, 40)
+            if ware.cost_method == "fifo":
+                # Both withdrawals come out of the first restock.
+                layers = CostLayer.objects.filter(ware=ware).order_by("id")
+                self.assertEqual(layers[0].remaining_quantity, 0)
+                self.assertEqual(ware.fifo_cursor.head, layers[1])
+
+    def test_command_reports_every_operation(self):
+        out = StringIO()
+        call_command(
+            "bench_inventory",
+            "--wares=4",
+            "--factors-per-ware=6",
+            "--fifo-ratio=0.5",
+            "--operations=3",
+            "--seed=1",
+            "--format=json",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["database"], connection.vendor)
+        self.assertIn("create_input", report["operations"])
+        self.assertIn("GET factor/", report["operations"])
+        self.assertEqual(report["operations"]["valuation_stock"]["calls"], 3)
+        self.assertFalse(Ware.objects.filter(name__startswith="bench-").exists())
+
+
+class MetricsTest(APITestCase):
+    def setUp(self):
+        metrics.reset()
+        self.ware = Ware.objects.create(name="Ware", cost_method="fifo")
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.get("/api/inventory/wares/")
+        self.client.get("/api/inventory/wares/")
+        self.client.get("/api/inventory/wares/999/")
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn(
+            'http_requests_total{view="ware api",method="GET",status="200"} 2', body
+        )
+        self.assertIn('http_request_duration_seconds_count{view="ware api"} 2', body)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="ware api",le="+Inf"} 2', body
+        )
+        self.assertIn('db_queries_total{view="ware api"} 2', body)
+        self.assertIn('db_query_duration_seconds_total{view="ware api"}', body)
+        self.assertIn("inventory_cache_hits_total", body)
+
+    async def test_queries_are_counted_under_asgi(self):
+        # The queries run in other threads than the async middleware.
+        await self.async_client.get("/api/inventory/wares/")
+        with override_settings(ROOT_URLCONF=AsyncReadUrls):
+            await self.async_client.get(f"/api/inventory/wares/{self.ware.id}/")
+        body = metrics.render()
+        self.assertIn('db_queries_total{view="ware api"} 1', body)
+        self.assertIn('db_queries_total{view="ware detail api"} 2', body)
+
+
+class FastSerializationTest(TestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(
+            name='Wäre \u2028 "quoted" 🧱', cost_method="weighted_mean"
+        )
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal("0.10"))
+        create_input(
+            ware_id=self.ware.id, quantity=1, purchase_price=Decimal("99999999.99")
+        )
+        create_output(ware_id=self.ware.id, quantity=2)
+        Factor.objects.create(ware=self.ware, quantity=1, type="input")
+
+    def assertSameBytes(self, view, queryset):
+        expected = JSONRenderer().render(
+            view.OutputSerializer(queryset, many=True).data
+        )
+        fast = view.fast.to_representation(view.fast.values(queryset))
+        self.assertEqual(FastJSONRenderer().render(fast), expected)
+
+    def test_fast_path_matches_model_serializer(self):
+        self.assertSameBytes(WareApi, Ware.objects.order_by("id"))
+        self.assertSameBytes(FactorApi, Factor.objects.order_by("id"))
+        with timezone.override("Asia/Tehran"):
+            self.assertSameBytes(FactorApi, Factor.objects.order_by("id"))
+
+    def test_benchmark_renders_identical_bytes(self):
+        result = bench_serialization(rows=30, repeat=1)
+        self.assertTrue(result["identical"])
+
+
+class AsyncReadUrls:
+    urlpatterns = [path("api/inventory/", include(get_urlpatterns(async_reads=True)))]
+
+
+class AsyncReadTest(TestCase):
+    def setUp(self) -> None:
+        self.ware = Ware.objects.create(name="async", cost_method="fifo")
+        self.input = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("2.50")
+        )
+        create_output(ware_id=self.ware.id, quantity=4)
+        take_snapshots()
+
+    async def test_async_reads_match_sync_reads(self):
+        urls = [
+            "/api/inventory/wares/?limit=1",
+            f"/api/inventory/wares/{self.ware.id}/",
+            f"/api/inventory/factor/?ware_id={self.ware.id}",
+            f"/api/inventory/factor/{self.input.id}/",
+            f"/api/inventory/inventory/valuation/?ware_id={self.ware.id}",
+            f"/api/inventory/inventory/valuation/{self.ware.id}/",
+            f"/api/inventory/inventory/valuation/{self.ware.id}/"
+            "?as_of=2000-01-01T00:00:00Z",
+            "/api/inventory/wares/999/",
+            "/api/inventory/factor/?cursor=invalid",
+        ]
+        for url in urls:
+            expected = await self.async_client.get(url)
+            with override_settings(ROOT_URLCONF=AsyncReadUrls):
+                response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(response.content, expected.content, url)
+            self.assertEqual(response.get("ETag"), expected.get("ETag"), url)
+
+    async def test_writes_fall_through_to_sync_views(self):
+        with override_settings(ROOT_URLCONF=AsyncReadUrls):
+            response = await self.async_client.post(
+                "/api/inventory/wares/",
+                {"name": "created", "cost_method": "fifo"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Ware.objects.filter(name="created").aexists())
+
+    async def test_async_reads_check_permissions(self):
+        url = "/api/inventory/wares/"
+        with mock.patch.object(WareApi, "permission_classes", [IsAuthenticated]):
+            expected = await self.async_client.get(url)
+            with override_settings(ROOT_URLCONF=AsyncReadUrls):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+                self.assertEqual(response.content, expected.content)
+                user = await User.objects.acreate(username="reader")
+                await self.async_client.aforce_login(user)
+                response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncReadBenchmarkTest(TransactionTestCase):
+    @override_settings(ALLOWED_HOSTS=["localhost"])
+    def test_both_modes_answer_every_request(self):
+        result = bench_async_reads(connections=4, requests=12)
+        self.assertEqual(result["sync"]["errors"], 0)
+        self.assertEqual(result["async"]["errors"], 0)
+        self.assertEqual(result["async"]["requests"], 12)
+
+
+class ValuationListApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.wares = [
+            create_ware(name=f"valuation {n}", cost_method="fifo") for n in range(3)
+        ]
+        for n, ware in enumerate(self.wares):
+            create_input(
+                ware_id=ware.id, quantity=n + 1, purchase_price=Decimal("10.00")
+            )
+        self.unbalanced = Ware.objects.create(name="no balance", cost_method="fifo")
+        Factor.objects.create(
+            ware=self.unbalanced,
+            quantity=7,
+            purchase_price=Decimal("2.00"),
+            type="input",
+        )
+
+    def test_valuation_of_all_wares(self):
+        url = "/api/inventory/inventory/valuation/"
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["ware"], row["quantity_in_stock"], row["total_inventory_value"])
+                for row in response.json()["results"]
+            ],
+            [
+                (self.wares[0].id, 1, 10),
+                (self.wares[1].id, 2, 20),
+                (self.wares[2].id, 3, 30),
+                (self.unbalanced.id, 7, 14),
+            ],
+        )
+
+    def test_valuation_of_selected_wares_paginated(self):
+        url = "/api/inventory/inventory/valuation/"
+        params = {"ware_id": [self.wares[2].id, self.wares[0].id], "limit": 1}
+        response = self.client.get(url, params)
+        self.assertEqual(response.json()["results"][0]["ware"], self.wares[0].id)
+        response = self.client.get(url, {**params, "cursor": response.json()["next"]})
+        self.assertEqual(response.json()["results"][0]["ware"], self.wares[2].id)
+        self.assertIsNone(response.json()["next"])
+
+
+class AsOfValuationTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware = create_ware(name="as of", cost_method="fifo")
+        self.first = self.backdate(
+            create_input(ware_id=self.ware.id, quantity=10, purchase_price="1.00"),
+            day=1,
+        )
+        take_snapshots()
+        StockSnapshot.objects.update(taken_at=self.day(2))
+        self.backdate(
+            create_input(ware_id=self.ware.id, quantity=5, purchase_price="2.00"),
+            day=3,
+        )
+        self.backdate(create_output(ware_id=self.ware.id, quantity=3), day=5)
+
+    def day(self, day):
+        return timezone.make_aware(timezone.datetime(2024, 1, day))
+
+    def backdate(self, factor, *, day):
+        Factor.objects.filter(id=factor.id).update(created_at=self.day(day))
+        return factor
+
+    def valuation(self, as_of):
+        url = f"/api/inventory/inventory/valuation/{self.ware.id}/"
+        response = self.client.get(url, {"as_of": as_of.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return (
+            response.json()["quantity_in_stock"],
+            response.json()["total_inventory_value"],
+        )
+
+    def test_replays_deltas_around_snapshot(self):
+        self.assertEqual(self.valuation(self.day(1)), (10, 10))
+        self.assertEqual(self.valuation(self.day(4)), (15, 20))
+        self.assertEqual(self.valuation(self.day(6)), (12, 17))
+
+    def test_before_first_factor(self):
+        self.assertEqual(
+            self.valuation(self.day(1) - timezone.timedelta(hours=1)), (0, 0)
+        )
+
+    def test_edits_shift_snapshots(self):
+        update_factor(self.first.id, purchase_price=Decimal("3.00"))
+        snapshot = StockSnapshot.objects.get(ware=self.ware)
+        self.assertEqual(snapshot.value, Decimal(30))
+        self.assertEqual(self.valuation(self.day(2)), (10, 30))
+
+
+@override_settings(INVENTORY_CACHE={"ENABLED": True, "ALIAS": "default", "TIMEOUT": 60})
+class CacheTest(APITestCase):
+    def setUp(self) -> None:
+        caches["default"].clear()
+        self.ware = create_ware(name="cached", cost_method="fifo")
+        self.factor = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("1.00")
+        )
+
+    def test_valuation_is_served_from_cache_until_stock_changes(self):
+        url = f"/api/inventory/inventory/valuation/{self.ware.id}/"
+        before = cache.stats()
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["quantity_in_stock"], 10)
+        # The valuation and the version behind its ETag are cached apart.
+        after = cache.stats()
+        self.assertEqual(after["misses"] - before["misses"], 2)
+        self.assertEqual(after["hits"] - before["hits"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_output(ware_id=self.ware.id, quantity=4)
+        self.assertEqual(self.client.get(url).json()["quantity_in_stock"], 6)
+
+    def test_detail_entries_are_invalidated_by_their_writers(self):
+        ware_url = f"/api/inventory/wares/{self.ware.id}/"
+        factor_url = f"/api/inventory/factor/{self.factor.id}/"
+        self.client.get(ware_url)
+        self.client.get(factor_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_ware(self.ware.id, name="renamed")
+            update_factor(self.factor.id, quantity=12)
+        self.assertEqual(self.client.get(ware_url).json()["name"], "renamed")
+        self.assertEqual(self.client.get(factor_url).json()["quantity"], 12)
+
+    def test_recosted_outputs_are_invalidated(self):
+        output = create_output(ware_id=self.ware.id, quantity=5)
+        url = f"/api/inventory/factor/{output.id}/"
+        before = self.client.get(url)
+        self.assertEqual(before.json()["total_cost"], "5.00")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_factor(self.factor.id, purchase_price=Decimal("3.00"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["total_cost"], "15.00")
+        self.assertNotEqual(response["ETag"], before["ETag"])
+
+    def test_other_wares_stay_cached(self):
+        other = create_ware(name="cached other", cost_method="fifo")
+        url = f"/api/inventory/inventory/valuation/{other.id}/"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_input(ware_id=self.ware.id, quantity=1, purchase_price=Decimal(1))
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_reads_racing_an_invalidation_do_not_store_stale_values(self):
+        key = cache.valuation_key(self.ware.id)
+
+        def stale():
+            # The writer commits while the read computes.
+            cache.invalidate(ware_ids=[self.ware.id])
+            return "stale"
+
+        self.assertEqual(cache.get_or_compute(key, stale), "stale")
+        self.assertEqual(cache.get_or_compute(key, lambda: "fresh"), "fresh")
+
+    def test_created_wares_are_invalidated(self):
+        url = f"/api/inventory/wares/{self.ware.id + 1}/"
+        self.assertFalse(self.client.get(url).has_header("ETag"))
+        with self.captureOnCommitCallbacks(execute=True):
+            ware = create_ware(name="cached new", cost_method="fifo")
+        self.assertEqual(ware.id, self.ware.id + 1)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_stats_endpoint(self):
+        response = self.client.get("/api/inventory/cache/stats/")
+        self.assertTrue(response.json()["enabled"])
+        self.assertIn("hits", response.json())
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self) -> None:
+        self.ware = create_ware(name="conditional", cost_method="fifo")
+        self.factor = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("1.00")
+        )
+        self.urls = [
+            f"/api/inventory/wares/{self.ware.id}/",
+            f"/api/inventory/factor/{self.factor.id}/",
+            f"/api/inventory/inventory/valuation/{self.ware.id}/",
+        ]
+
+    def test_matching_etag_is_answered_with_304(self):
+        for url in self.urls:
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        etags = [self.client.get(url)["ETag"] for url in self.urls]
+        create_output(ware_id=self.ware.id, quantity=4)
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        url = self.urls[0]
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_unknown_ware_has_no_etag(self):
+        response = self.client.get("/api/inventory/wares/999/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.has_header("ETag"))
+
+    async def test_async_views_answer_304(self):
+        for url in self.urls:
+            etag = (await self.async_client.get(url))["ETag"]
+            with override_settings(ROOT_URLCONF=AsyncReadUrls):
+                response = await self.async_client.get(
+                    url, headers={"If-None-Match": etag}
+                )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ChangeFeedTest(APITestCase):
+    url = "/api/inventory/changes/"
+
+    def setUp(self) -> None:
+        self.ware = create_ware(name="feed", cost_method="fifo")
+
+    def feed(self, **params) -> dict:
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def entries(self, page) -> list:
+        return [(row["factor_id"], row["action"]) for row in page["results"]]
+
+    def test_services_record_their_writes(self):
+        first = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("1.00")
+        )
+        output = create_output(ware_id=self.ware.id, quantity=4)
+        update_factor(first.id, purchase_price=Decimal("2.00"))
+        update_ware(self.ware.id, name="renamed")
+        delete_factor(output.id)
+
+        self.assertEqual(
+            self.entries(self.feed()),
+            [
+                (None, "created"),
+                (first.id, "created"),
+                (output.id, "created"),
+                # The output re-costed by the edit of the input, which is
+                # recorded at the end of the edit.
+                (output.id, "updated"),
+                (first.id, "updated"),
+                (None, "updated"),
+                (output.id, "deleted"),
+            ],
+        )
+
+    def test_since_returns_only_later_changes(self):
+        create_input(ware_id=self.ware.id, quantity=1, purchase_price=Decimal(1))
+        page = self.feed(limit=1)
+        self.assertTrue(page["has_more"])
+        self.assertEqual(self.entries(page), [(None, "created")])
+
+        page = self.feed(since=page["next"])
+        self.assertFalse(page["has_more"])
+        self.assertEqual(len(page["results"]), 1)
+
+        tail = self.feed(since=page["next"])
+        self.assertEqual(tail["results"], [])
+        self.assertEqual(tail["next"], page["next"])
+
+        delete_ware(self.ware.id)
+        self.assertEqual(
+            self.entries(self.feed(since=tail["next"])),
+            [(page["results"][0]["factor_id"], "deleted"), (None, "deleted")],
+        )
+
+    def test_page_is_one_query(self):
+        create_inputs(
+            lines=[
+                {"ware_id": self.ware.id, "quantity": 1, "purchase_price": Decimal(1)}
+            ]
+            * 5
+        )
+        self.assertEqual(Change.objects.count(), 6)
+        with self.assertNumQueries(1):
+            self.feed(since=1, limit=3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"since": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHANGE_FEED_LAG=60)
+    def test_recent_changes_are_held_back(self):
+        page = self.feed()
+        self.assertEqual((page["results"], page["next"]), ([], 0))
+        Change.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.entries(self.feed()), [(None, "created")])
+
+
+@skipUnless(connection.vendor != "sqlite", "SQLite runs one writer at a time")
+class ChangeFeedConcurrencyTest(TransactionTestCase):
+    def test_writers_to_different_wares_do_not_wait_for_each_other(self):
+        first = create_ware(name="first", cost_method="fifo")
+        second = create_ware(name="second", cost_method="fifo")
+        recorded, release = threading.Event(), threading.Event()
+
+        def hold():
+            try:
+                with transaction.atomic():
+                    create_input(ware_id=first.id, quantity=1, purchase_price=1)
+                    recorded.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        def write():
+            try:
+                create_input(ware_id=second.id, quantity=1, purchase_price=1)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold)
+        writer = threading.Thread(target=write)
+        holder.start()
+        try:
+            self.assertTrue(recorded.wait(10))
+            writer.start()
+            # The first writer has recorded its change and not committed yet.
+            writer.join(5)
+            self.assertFalse(writer.is_alive())
+        finally:
+            release.set()
+            holder.join()
+            writer.join()
+        self.assertEqual(Change.objects.filter(factor_id__isnull=False).count(), 2)
+
+
+class MovementReportTest(APITestCase):
+    url = "/api/inventory/reports/movements/"
+
+    def setUp(self) -> None:
+        self.ware = create_ware(name="moving", cost_method="fifo")
+
+    def rollups(self) -> list:
+        return list(
+            DailyMovement.objects.filter(ware=self.ware)
+            .order_by("day")
+            .values_list("day", "qty_in", "qty_out", "value_in", "cogs")
+        )
+
+    def test_services_keep_rollups_equal_to_backfill(self):
+        first = create_input(
+            ware_id=self.ware.id, quantity=10, purchase_price=Decimal("2.00")
+        )
+        create_inputs(
+            lines=[
+                {"ware_id": self.ware.id, "quantity": 5, "purchase_price": Decimal(4)}
+            ]
+        )
+        output = create_output(ware_id=self.ware.id, quantity=12)
+        create_outputs(lines=[{"ware_id": self.ware.id, "quantity": 1}])
+        # Re-costs both outputs.
+        update_factor(first.id, purchase_price=Decimal("3.00"))
+        delete_factor(output.id)
+
+        maintained = self.rollups()
+        self.assertEqual(
+            maintained,
+            [(timezone.localdate(), 15, 1, Decimal(50), Decimal(3))],
+        )
+        self.assertEqual(backfill_movements(ware_ids=[self.ware.id]), 1)
+        self.assertEqual(self.rollups(), maintained)
+
+    def test_report_buckets(self):
+        for day, quantity in (("2024-01-30", 1), ("2024-01-31", 2), ("2024-02-01", 4)):
+            DailyMovement.objects.create(
+                ware=self.ware, day=day, qty_in=quantity, value_in=quantity
+            )
+        params = {"ware": self.ware.id, "from": "2024-01-01", "to": "2024-12-31"}
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.json()), 3)
+
+        response = self.client.get(self.url, {**params, "bucket": "month"})
+        self.assertEqual(
+            [(row["period"], row["qty_in"]) for row in response.json()],
+            [("2024-01-01", 3), ("2024-02-01", 4)],
+        )
+        response = self.client.get(self.url, {**params, "bucket": "week"})
+        self.assertEqual(
+            [(row["period"], row["qty_in"]) for row in response.json()],
+            [("2024-01-29", 7)],
+        )
+
+    def test_invalid_range(self):
+        response = self.client.get(
+            self.url, {"ware": self.ware.id, "from": "2024-02-01", "to": "2024-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_is_capped(self):
+        params = {"ware": self.ware.id, "from": "2024-01-01"}
+        response = self.client.get(self.url, {**params, "to": "2024-12-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {**params, "to": "2025-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_command_includes_the_archive(self):
+        create_input(ware_id=self.ware.id, quantity=3, purchase_price=Decimal(1))
+        compact_ledger(ware=self.ware, before=timezone.now())
+        DailyMovement.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_movements", f"--ware={self.ware.id}", stdout=out)
+        self.assertIn("Wrote 1 daily movement(s).", out.getvalue())
+        self.assertEqual(self.rollups()[0][1:3], (3, 0))
+
+
 class WareApiTest(APITestCase):
     def setUp(self) -> None:
         self.ware = Ware.objects.create(name="test", cost_method="fifo")
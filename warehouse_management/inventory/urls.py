@@ -1,24 +1,87 @@
+from django.conf import settings
 from django.urls import path
 
+from inventory.apis.async_read import (
+    AsyncFactorApi,
+    AsyncFactorDetailApi,
+    AsyncValuationApi,
+    AsyncValuationListApi,
+    AsyncWareApi,
+    AsyncWareDetailApi,
+)
+
+from inventory.apis.change import ChangeApi
 from inventory.apis.factor import (
     InputApi,
+    BulkInputApi,
     OutputApi,
+    BulkOutputApi,
     FactorApi,
+    FactorExportApi,
     FactorDetailApi,
     ValuationApi,
+    ValuationListApi,
+    CacheStatsApi,
 )
+from inventory.apis.report import MovementReportApi
 from inventory.apis.ware import WareApi, WareDetailApi
 
-urlpatterns = [
-    path("wares/", WareApi.as_view(), name="ware api"),
-    path("factor/", FactorApi.as_view(), name="factor api"),
-    path("wares/<int:id>/", WareDetailApi.as_view(), name="ware detail api"),
-    path("factor/<int:id>/", FactorDetailApi.as_view(), name="factor detail api"),
-    path("input/", InputApi.as_view(), name="add_ware"),
-    path("output/", OutputApi.as_view(), name="remove_ware"),
-    path(
-        "inventory/valuation/<int:id>/",
-        ValuationApi.as_view(),
-        name="inventory_valuation",
-    ),
-]
+
+def read_view(view, async_view, async_reads: bool):
+    """
+    The view of a URL whose GET is served by `async_view` in async mode, with
+    its other methods still going to `view`.
+    """
+    if async_reads:
+        return async_view.as_view(sync_view=view.as_view())
+    return view.as_view()
+
+
+def get_urlpatterns(*, async_reads: bool = False) -> list:
+    return [
+        path(
+            "wares/",
+            read_view(WareApi, AsyncWareApi, async_reads),
+            name="ware api",
+        ),
+        path(
+            "factor/",
+            read_view(FactorApi, AsyncFactorApi, async_reads),
+            name="factor api",
+        ),
+        path("factor/export/", FactorExportApi.as_view(), name="factor export api"),
+        path(
+            "wares/<int:id>/",
+            read_view(WareDetailApi, AsyncWareDetailApi, async_reads),
+            name="ware detail api",
+        ),
+        path(
+            "factor/<int:id>/",
+            read_view(FactorDetailApi, AsyncFactorDetailApi, async_reads),
+            name="factor detail api",
+        ),
+        path("input/", InputApi.as_view(), name="add_ware"),
+        path("input/bulk/", BulkInputApi.as_view(), name="add_wares"),
+        path("output/", OutputApi.as_view(), name="remove_ware"),
+        path("output/bulk/", BulkOutputApi.as_view(), name="remove_wares"),
+        path(
+            "inventory/valuation/",
+            read_view(ValuationListApi, AsyncValuationListApi, async_reads),
+            name="inventory_valuation_list",
+        ),
+        path(
+            "inventory/valuation/<int:id>/",
+            read_view(ValuationApi, AsyncValuationApi, async_reads),
+            name="inventory_valuation",
+        ),
+        path("cache/stats/", CacheStatsApi.as_view(), name="cache stats api"),
+        path("changes/", ChangeApi.as_view(), name="change feed api"),
+        path(
+            "reports/movements/",
+            MovementReportApi.as_view(),
+            name="movement report api",
+        ),
+    ]
+
+
+urlpatterns = get_urlpatterns(async_reads=settings.INVENTORY_ASYNC_READS)
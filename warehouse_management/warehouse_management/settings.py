@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,9 +91,55 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Take the write lock when a transaction starts, so concurrent writers
+        # queue on the busy timeout instead of failing with "database is
+        # locked" when they upgrade a read transaction.
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        # A file keeps SQLite's real locking in tests; the shared-cache
+        # in-memory database fails concurrent writers without waiting.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Seconds the change feed holds back its newest changes, so writers that
+# took lower ids have committed before a consumer reads past them. SQLite
+# runs one writer at a time, which commits ids in order.
+CHANGE_FEED_LAG = 0 if DATABASES["default"]["ENGINE"].endswith("sqlite3") else 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Read-through cache for valuation, ware detail and factor detail responses.
+# Point ALIAS at a shared backend (e.g. Redis) when running several workers.
+INVENTORY_CACHE = {
+    "ENABLED": False,
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# Serve the ware, factor and valuation reads from async views. Only pays off
+# when the project runs under an ASGI server; under WSGI keep it off.
+INVENTORY_ASYNC_READS = False
+
+# Write single inputs and outputs to the same ware that arrive within
+# WINDOW_MS of each other in one transaction. Helps hot wares under a
+# threaded server; batches never span processes.
+INVENTORY_COALESCING = {
+    "ENABLED": False,
+    "WINDOW_MS": 2,
+    "MAX_BATCH": 100,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -132,6 +179,10 @@ STATIC_URL = "static/"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "common.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 # Default primary key field type
@@ -6,10 +6,13 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from common.metrics import metrics_view
+
 urlpatterns = [
     path("schema/", SpectacularAPIView.as_view(api_version="v1"), name="schema"),
     path("", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path("admin/", admin.site.urls),
     path("api/", include(("api.urls", "api"))),
+    path("metrics", metrics_view, name="metrics"),
 ]